@@ -0,0 +1,191 @@
+# backend/app/admission.py
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from .limits import LIMITS, throttle
+from .metrics import Counter, Histogram, CallbackGauge
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# Agent runs in flight per worker process; the rest wait in a bounded queue.
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", str(LIMITS["gemini"])))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+# Text-only requests up to this length are served before the others.
+ADMISSION_SHORT_TEXT_CHARS = int(os.getenv("ADMISSION_SHORT_TEXT_CHARS", "200"))
+
+HIGH, LOW = "high", "low"
+
+ADMISSION_WAIT_SECONDS = Histogram("agri_admission_wait_seconds", "Time admitted requests spent queued.", ("priority",))
+ADMISSION_SHED = Counter(
+    "agri_admission_shed_total", "Requests refused by admission control; reason is queue_full, displaced or timeout.",
+    ("reason", "priority"),
+)
+
+
+class Overloaded(Exception):
+    """The agent is saturated: the request was not admitted (HTTP 503 with Retry-After)."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"The assistant is busy ({reason.replace('_', ' ')}); please retry in {retry_after}s.")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def request_priority(text, has_image: bool) -> str:
+    """Short text-only questions go first: they are the cheapest agent runs."""
+    return HIGH if not has_image and len(text or "") <= ADMISSION_SHORT_TEXT_CHARS else LOW
+
+
+class Ticket:
+    """An admitted request's slot; `release()` is idempotent."""
+
+    def __init__(self, controller, admitted_at: float):
+        self._controller = controller
+        self._admitted_at = admitted_at
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(time.perf_counter() - self._admitted_at)
+
+
+class AdmissionController:
+    """
+    Bounds concurrent agent runs. Requests over the limit wait in a bounded
+    two-level queue (short text-only requests first) for at most
+    `max_wait_seconds`; when the queue is full, or the wait runs out, they are
+    refused at once with a Retry-After estimate instead of piling up behind
+    Gemini. A short request arriving at a full queue displaces the newest
+    low-priority waiter.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        max_wait_seconds: float = ADMISSION_MAX_WAIT_SECONDS,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_wait_seconds = max_wait_seconds
+        self.active = 0
+        self._queues = {HIGH: deque(), LOW: deque()}
+        # Moving average of how long an admitted run holds its slot
+        self._service_seconds = 5.0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._service_seconds * (self.queue_depth + 1) / self.max_concurrency))
+
+    def _shed(self, reason: str, priority: str) -> Overloaded:
+        ADMISSION_SHED.inc(reason=reason, priority=priority)
+        logger.warning(
+            f"Shed {priority}-priority request: {reason} (in flight={self.active}, queued={self.queue_depth})",
+            extra={"stage": "admission", "reason": reason, "priority": priority},
+        )
+        return Overloaded(reason, self.retry_after())
+
+    async def acquire(self, priority: str = LOW) -> Ticket:
+        """
+        Waits for a slot.
+
+        Raises:
+            Overloaded: if the queue is full or no slot frees up within the max wait.
+        """
+        if self.active < self.max_concurrency and not self.queue_depth:
+            self.active += 1
+            ADMISSION_WAIT_SECONDS.observe(0.0, priority=priority)
+            return Ticket(self, time.perf_counter())
+
+        if self.queue_depth >= self.max_queue:
+            if priority == HIGH and self._queues[LOW]:
+                displaced, _ = self._queues[LOW].pop()
+                if not displaced.done():
+                    displaced.set_exception(self._shed("displaced", LOW))
+            else:
+                raise self._shed("queue_full", priority)
+
+        waiter = asyncio.get_running_loop().create_future()
+        enqueued = time.perf_counter()
+        self._queues[priority].append((waiter, enqueued))
+        try:
+            await asyncio.wait_for(waiter, self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            self._remove(priority, waiter)
+            raise self._shed("timeout", priority)
+        except asyncio.CancelledError:
+            # Client went away; hand the slot on if it had already been granted
+            self._remove(priority, waiter)
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self._release(0.0)
+            raise
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - enqueued, priority=priority)
+        return Ticket(self, time.perf_counter())
+
+    def _remove(self, priority: str, waiter):
+        queue = self._queues[priority]
+        for entry in list(queue):
+            if entry[0] is waiter:
+                queue.remove(entry)
+                break
+
+    def _release(self, held_seconds: float):
+        if held_seconds > 0:
+            self._service_seconds = 0.8 * self._service_seconds + 0.2 * held_seconds
+        self.active -= 1
+        # Hand freed slots to the oldest waiter, high priority first
+        while self.active < self.max_concurrency:
+            queue = self._queues[HIGH] or self._queues[LOW]
+            if not queue:
+                break
+            waiter, _ = queue.popleft()
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
+
+    def get_stats(self) -> dict:
+        return {
+            "in_flight": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queued": {priority: len(queue) for priority, queue in self._queues.items()},
+            "max_queue": self.max_queue,
+            "max_wait_seconds": self.max_wait_seconds,
+            "avg_service_seconds": round(self._service_seconds, 2),
+        }
+
+
+admission = AdmissionController()
+
+CallbackGauge(
+    "agri_admission_queue_depth", "Requests waiting for an agent slot.",
+    lambda: {(priority,): len(queue) for priority, queue in admission._queues.items()}, ("priority",),
+)
+CallbackGauge("agri_admission_in_flight", "Agent runs in progress.", lambda: admission.active)
+
+
+class GeminiThrottle(AsyncCallbackHandler):
+    """
+    Takes a token from the shared Gemini budget before every model call of an
+    agent run, failing the run with RateLimited (HTTP 429) when the budget
+    will not recover within THROTTLE_MAX_WAIT_SECONDS.
+    """
+
+    # Awaited before the call, and errors propagate instead of being logged
+    run_inline = True
+    raise_error = True
+
+    async def on_chat_model_start(self, serialized, messages, **kwargs):
+        await throttle("gemini")
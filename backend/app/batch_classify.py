@@ -0,0 +1,219 @@
+# backend/app/batch_classify.py
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import zipfile
+from collections import Counter
+
+from .imaging import decode_image, prepare_image, dhash
+from .limits import offload
+from .uploads import MAX_UPLOAD_BYTES
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "200"))
+BATCH_MAX_TOTAL_BYTES = int(os.getenv("BATCH_MAX_TOTAL_BYTES", str(200 * 1024 * 1024)))
+# Images of one survey queued on the classifier at a time, so interactive
+# /chat classifications still get into the next batches.
+BATCH_MAX_IN_FLIGHT = int(os.getenv("BATCH_MAX_IN_FLIGHT", "32"))
+# Predictions below this confidence are flagged for a second look.
+BATCH_LOW_CONFIDENCE = float(os.getenv("BATCH_LOW_CONFIDENCE", "0.5"))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".jfif", ".png", ".webp", ".bmp")
+
+
+class BatchTooLarge(Exception):
+    """The batch exceeds BATCH_MAX_IMAGES, BATCH_MAX_TOTAL_BYTES or the per-image limit."""
+
+
+def _check_limits(items: list):
+    if len(items) > BATCH_MAX_IMAGES:
+        raise BatchTooLarge(f"At most {BATCH_MAX_IMAGES} images per batch ({len(items)} sent).")
+    if sum(len(data) for _, data in items) > BATCH_MAX_TOTAL_BYTES:
+        raise BatchTooLarge(f"Batch exceeds {BATCH_MAX_TOTAL_BYTES // (1024 * 1024)} MB.")
+    for name, data in items:
+        if len(data) > MAX_UPLOAD_BYTES:
+            raise BatchTooLarge(f"'{name}' exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB per-image limit.")
+
+
+def read_zip(data: bytes) -> list:
+    """
+    Returns `(name, bytes)` for every image in a zip archive, checking the
+    declared sizes before extracting anything.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise ValueError("The archive is not a valid zip file.")
+    members = [
+        info for info in archive.infolist()
+        if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+        and not os.path.basename(info.filename).startswith(".")
+    ]
+    if len(members) > BATCH_MAX_IMAGES:
+        raise BatchTooLarge(f"At most {BATCH_MAX_IMAGES} images per batch ({len(members)} in the archive).")
+    if sum(info.file_size for info in members) > BATCH_MAX_TOTAL_BYTES:
+        raise BatchTooLarge(f"Archive expands beyond {BATCH_MAX_TOTAL_BYTES // (1024 * 1024)} MB.")
+    return [(info.filename, archive.read(info)) for info in sorted(members, key=lambda info: info.filename)]
+
+
+def read_paths(paths: list) -> list:
+    """`(name, bytes)` for image files, directories (recursively) and zip archives."""
+    items = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for file_name in sorted(files):
+                    if file_name.lower().endswith(IMAGE_EXTENSIONS) and not file_name.startswith("."):
+                        full_path = os.path.join(root, file_name)
+                        with open(full_path, "rb") as f:
+                            items.append((os.path.relpath(full_path, path), f.read()))
+        elif path.lower().endswith(".zip"):
+            with open(path, "rb") as f:
+                items.extend(read_zip(f.read()))
+        else:
+            with open(path, "rb") as f:
+                items.append((os.path.basename(path), f.read()))
+    _check_limits(items)
+    return items
+
+
+async def read_uploads(images: list = None, archive=None) -> list:
+    """`(name, bytes)` from a multipart batch of image files and/or one zip archive."""
+    items = []
+    for upload in images or []:
+        data = await upload.read(MAX_UPLOAD_BYTES + 1)
+        items.append((upload.filename or f"image-{len(items) + 1}", data))
+    if archive is not None:
+        items.extend(read_zip(await archive.read(BATCH_MAX_TOTAL_BYTES + 1)))
+    _check_limits(items)
+    return items
+
+
+def _decode(data: bytes) -> tuple:
+    # Decoded at reduced JPEG scale and cropped to 224px in the worker thread
+    image = prepare_image(decode_image(data))
+    return image, hashlib.sha256(data).hexdigest(), dhash(image)
+
+
+def summarize(results: list, elapsed: float) -> dict:
+    """Field-level view: how many plants show each condition, and how confidently."""
+    classified = [r for r in results if "label" in r]
+    counts = Counter(r["label"] for r in classified)
+    diseases = {
+        label: {
+            "count": count,
+            "share": round(count / len(classified), 3),
+            "mean_confidence": round(sum(r["score"] for r in classified if r["label"] == label) / count, 3),
+        }
+        for label, count in counts.most_common()
+    }
+    healthy = sum(count for label, count in counts.items() if "healthy" in label.lower())
+    diseased = [label for label in counts if "healthy" not in label.lower()]
+    return {
+        "type": "summary",
+        "images": len(results),
+        "classified": len(classified),
+        "failed": len(results) - len(classified),
+        "healthy": healthy,
+        "diseased": len(classified) - healthy,
+        "most_common_disease": max(diseased, key=counts.get) if diseased else None,
+        "low_confidence": [r["name"] for r in classified if r["score"] < BATCH_LOW_CONFIDENCE],
+        "conditions": diseases,
+        "elapsed_ms": round(elapsed * 1000, 1),
+    }
+
+
+async def classify_stream(items: list, engine, top_k: int = 3, cache=None, model_id: str = None):
+    """
+    Classifies a survey's images and yields one result dict per image as it
+    completes (in completion order), then a summary. Images are decoded in
+    parallel on the classifier executor; the engine groups them into batched
+    forward passes. With a `cache`, known photos skip the model.
+    """
+    started = time.perf_counter()
+    in_flight = asyncio.Semaphore(max(1, BATCH_MAX_IN_FLIGHT))
+
+    async def one(index: int, name: str, data: bytes) -> dict:
+        try:
+            image, sha256, phash = await offload("classifier", _decode, data)
+            result = await asyncio.to_thread(cache.get, sha256, model_id) if cache is not None else None
+            if result is None:
+                async with in_flight:
+                    result = await asyncio.wrap_future(engine.submit(image))
+                if cache is not None:
+                    await asyncio.to_thread(cache.put, sha256, phash, model_id, result)
+            return {
+                "type": "image",
+                "index": index,
+                "name": name,
+                "label": result["label"],
+                "score": result["score"],
+                "top_k": result.get("top_k", [])[:top_k],
+            }
+        except Exception as e:
+            logger.warning(f"Batch image '{name}' failed: {e}")
+            return {"type": "error", "index": index, "name": name, "error": str(e)}
+
+    tasks = [asyncio.ensure_future(one(i, name, data)) for i, (name, data) in enumerate(items)]
+    results = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            results.append(result)
+            yield result
+    finally:
+        # The client went away: stop the remaining decodes
+        for task in tasks:
+            task.cancel()
+
+    summary = summarize(results, time.perf_counter() - started)
+    logger.info(
+        f"Classified {summary['classified']}/{summary['images']} survey images in {summary['elapsed_ms']}ms",
+        extra={"stage": "batch_classify", "images": summary["images"], "ms": summary["elapsed_ms"]},
+    )
+    yield summary
+
+
+async def ndjson_lines(results):
+    async for result in results:
+        yield json.dumps(result, ensure_ascii=False) + "\n"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .inference import InferenceEngine
+
+    parser = argparse.ArgumentParser(
+        description="Classify a field survey: image files, directories or zip archives."
+    )
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--ndjson", action="store_true", help="Print one JSON object per line instead of a table.")
+    args = parser.parse_args()
+
+    async def main():
+        items = read_paths(args.paths)
+        engine = InferenceEngine()
+        try:
+            async for result in classify_stream(items, engine, args.top_k):
+                if args.ndjson:
+                    print(json.dumps(result, ensure_ascii=False))
+                elif result["type"] == "image":
+                    print(f"{result['name']:<40} {result['label']:<45} {result['score']:.2f}")
+                elif result["type"] == "error":
+                    print(f"{result['name']:<40} ERROR: {result['error']}", file=sys.stderr)
+                else:
+                    print(json.dumps(result, indent=2, ensure_ascii=False))
+        finally:
+            engine.shutdown()
+
+    asyncio.run(main())
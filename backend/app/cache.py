@@ -0,0 +1,289 @@
+# backend/app/cache.py
+import os
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+from datetime import datetime
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "cache.db")
+
+
+class TTLCache:
+    """
+    Bounded, thread-safe in-memory LRU cache whose entries expire after `ttl_seconds`.
+    Values are stored with the time they were produced so callers can apply
+    additional freshness rules.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Returns `(value, stored_at)` or None if missing/expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[1] >= self.ttl_seconds:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value, stored_at: float = None):
+        with self._lock:
+            self._data[key] = (value, stored_at if stored_at is not None else time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteStore:
+    """
+    Persistent key/value store with one row per (namespace, key). Each write is
+    a single transaction, so concurrent writers never clobber each other's
+    entries the way rewriting a whole JSON file does.
+    """
+
+    def __init__(self, path: str = CACHE_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_age ON cache (namespace, stored_at)")
+
+    def get(self, namespace: str, key: str):
+        """Returns `(value, stored_at)` or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, namespace: str, key: str, value, stored_at: float = None, max_entries: int = None):
+        payload = json.dumps(value, separators=(",", ":"))
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, stored_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, payload, stored_at if stored_at is not None else time.time()),
+                )
+                if max_entries:
+                    # Evict the oldest rows beyond the bound for this namespace.
+                    self._conn.execute(
+                        "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                        " SELECT key FROM cache WHERE namespace = ?"
+                        " ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                        (namespace, namespace, max_entries),
+                    )
+
+    def count(self, namespace: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM cache WHERE namespace = ?", (namespace,)
+            ).fetchone()[0]
+
+    def purge_expired(self, namespace: str, ttl_seconds: float) -> int:
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND stored_at < ?",
+                    (namespace, time.time() - ttl_seconds),
+                )
+        return cursor.rowcount
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store() -> SQLiteStore:
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = SQLiteStore(CACHE_DB_PATH)
+        return _default_store
+
+
+class ToolCache:
+    """
+    Two-tier cache for a tool's upstream lookups: an in-memory LRU/TTL tier in
+    front of the shared SQLite store, with single-flight de-duplication so
+    concurrent misses on the same key trigger exactly one upstream fetch.
+
+    Args:
+        namespace (str): Name of the tool, used to partition the store.
+        ttl_seconds (float): Maximum age of a cached value.
+        max_memory_entries (int): Size bound of the in-memory tier.
+        max_store_entries (int): Size bound of the persistent tier.
+        is_fresh (callable): Optional extra check `is_fresh(value) -> bool`.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl_seconds: float,
+        max_memory_entries: int = 256,
+        max_store_entries: int = 5000,
+        is_fresh=None,
+        store: SQLiteStore = None,
+    ):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_store_entries = max_store_entries
+        self.is_fresh = is_fresh
+        self.memory = TTLCache(max_memory_entries, ttl_seconds)
+        self.store = store or get_default_store()
+        self._inflight = weakref.WeakKeyDictionary()
+        self._stats_lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "store_hits": 0, "misses": 0, "coalesced": 0, "fetch_errors": 0, "refreshes": 0}
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _usable(self, entry) -> bool:
+        if entry is None:
+            return False
+        value, stored_at = entry
+        if time.time() - stored_at >= self.ttl_seconds:
+            return False
+        return self.is_fresh is None or self.is_fresh(value)
+
+    def get(self, key: str):
+        """Looks up `key` in memory, then in the store. Returns the value or None."""
+        entry = self.memory.get(key)
+        if self._usable(entry):
+            self._count("memory_hits")
+            return entry[0]
+
+        entry = self.store.get(self.namespace, key)
+        if self._usable(entry):
+            self.memory.set(key, entry[0], entry[1])
+            self._count("store_hits")
+            return entry[0]
+        return None
+
+    def set(self, key: str, value):
+        stored_at = time.time()
+        self.store.set(self.namespace, key, value, stored_at, self.max_store_entries)
+        self.memory.set(key, value, stored_at)
+
+    def age(self, key: str):
+        """Seconds since the usable cached value for `key` was stored, or None."""
+        entry = self.memory.get(key) or self.store.get(self.namespace, key)
+        if not self._usable(entry):
+            return None
+        return time.time() - entry[1]
+
+    async def get_or_fetch(self, key: str, fetch, force: bool = False):
+        """
+        Returns the cached value for `key`, or awaits `fetch()` to produce it.
+
+        `fetch` is a zero-argument coroutine function. If it returns None the
+        result is not cached. Concurrent callers for the same key share a single
+        in-flight fetch. `force=True` skips the lookup and refreshes the entry.
+        """
+        if not force:
+            value = await asyncio.to_thread(self.get, key)
+            if value is not None:
+                return value
+
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight.setdefault(loop, {})
+        task = inflight.get(key)
+        if task is not None:
+            self._count("coalesced")
+        else:
+            self._count("refreshes" if force else "misses")
+            # The fetch runs in its own task that every caller awaits through a
+            # shield: one caller timing out or disconnecting cancels only its
+            # own wait, never the fetch the others are sharing.
+            task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+            inflight[key] = task
+            task.add_done_callback(lambda done: self._fetch_done(inflight, key, done))
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, key: str, fetch):
+        try:
+            value = await fetch()
+        except Exception:
+            self._count("fetch_errors")
+            raise
+        if value is not None:
+            await asyncio.to_thread(self.set, key, value)
+        return value
+
+    @staticmethod
+    def _fetch_done(inflight: dict, key: str, task):
+        if inflight.get(key) is task:
+            del inflight[key]
+        # Mark the exception as retrieved when every caller had already gone.
+        if not task.cancelled():
+            task.exception()
+
+    def import_legacy_json(self, path: str) -> int:
+        """
+        One-time import of a legacy `{key: {"timestamp", "data"}}` JSON file into
+        the store, used when the namespace is still empty.
+        """
+        if not os.path.exists(path) or self.store.count(self.namespace) > 0:
+            return 0
+        try:
+            with open(path, "r") as f:
+                legacy = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Could not import legacy cache '{path}': {e}")
+            return 0
+
+        imported = 0
+        for key, entry in legacy.items():
+            try:
+                stored_at = datetime.fromisoformat(entry["timestamp"]).timestamp()
+                self.store.set(self.namespace, key, entry["data"], stored_at)
+                imported += 1
+            except (KeyError, TypeError, ValueError):
+                continue
+        logger.info(f"Imported {imported} legacy '{self.namespace}' cache entries from '{path}'.")
+        return imported
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats["memory_hits"] + stats["store_hits"] + stats["misses"] + stats["coalesced"]
+        hits = stats["memory_hits"] + stats["store_hits"] + stats["coalesced"]
+        stats["hit_ratio"] = round(hits / lookups, 3) if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        return stats
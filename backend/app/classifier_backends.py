@@ -0,0 +1,196 @@
+# backend/app/classifier_backends.py
+import os
+import logging
+
+import numpy as np
+
+from .imaging import prepare_image
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+MODEL_PATH = "app/mobilenet_plant_disease"
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+# "torch" (float32 eager), "onnx" (ONNX Runtime, float32) or "onnx-int8" (ONNX Runtime, quantized)
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "torch")
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+class TorchBackend:
+    """The original float32 PyTorch eager-mode model."""
+
+    name = "torch"
+
+    def __init__(self, model_path: str = MODEL_PATH, threads: int = None):
+        import torch
+        from transformers import AutoModelForImageClassification
+
+        self._torch = torch
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = AutoModelForImageClassification.from_pretrained(model_path)
+        self.model.eval()
+        self.id2label = self.model.config.id2label
+
+    def forward(self, pixel_values: np.ndarray) -> np.ndarray:
+        with self._torch.inference_mode():
+            return self.model(pixel_values=self._torch.from_numpy(pixel_values)).logits.numpy()
+
+
+class OnnxBackend:
+    """ONNX Runtime CPU session over an exported (optionally int8) graph."""
+
+    def __init__(self, model_path: str = MODEL_PATH, quantized: bool = False, threads: int = None):
+        import onnxruntime as ort
+        from transformers import AutoConfig
+
+        self.name = "onnx-int8" if quantized else "onnx"
+        onnx_path = os.path.join(model_path, ONNX_INT8_FILE if quantized else ONNX_FILE)
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(
+                f"'{onnx_path}' not found. Run `python -m app.classifier_backends export` first."
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.id2label = AutoConfig.from_pretrained(model_path).id2label
+
+    def forward(self, pixel_values: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: pixel_values.astype(np.float32)})[0]
+
+
+def load_backend(name: str = CLASSIFIER_BACKEND, model_path: str = MODEL_PATH, threads: int = None):
+    if name == "torch":
+        return TorchBackend(model_path, threads)
+    if name in ("onnx", "onnx-int8"):
+        return OnnxBackend(model_path, quantized=name == "onnx-int8", threads=threads)
+    raise ValueError(f"Unknown classifier backend '{name}'. Choose one of {BACKENDS}.")
+
+
+# --- Export / Quantization ---
+def export_onnx(model_path: str = MODEL_PATH, opset: int = 17) -> str:
+    """Exports the PyTorch model to `model.onnx` with a dynamic batch axis."""
+    import torch
+    from transformers import AutoModelForImageClassification
+
+    model = AutoModelForImageClassification.from_pretrained(model_path)
+    model.eval()
+    onnx_path = os.path.join(model_path, ONNX_FILE)
+    dummy = torch.zeros(1, 3, 224, 224)
+    torch.onnx.export(
+        model,
+        (dummy,),
+        onnx_path,
+        input_names=["pixel_values"],
+        output_names=["logits"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset,
+    )
+    logger.info(f"Exported ONNX model to '{onnx_path}'.")
+    return onnx_path
+
+
+def quantize_onnx(model_path: str = MODEL_PATH, calibration_images: list = None) -> str:
+    """
+    Writes `model.int8.onnx`. With calibration images, weights and activations
+    are statically quantized (QDQ, per-channel), which is what speeds up the
+    convolutions that dominate MobileNetV2; otherwise weights are quantized
+    dynamically.
+    """
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_dynamic,
+        quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    source = os.path.join(model_path, ONNX_FILE)
+    target = os.path.join(model_path, ONNX_INT8_FILE)
+    prepared = os.path.join(model_path, "model.preprocessed.onnx")
+    quant_pre_process(source, prepared)
+
+    try:
+        if calibration_images:
+            pixel_batches = [preprocess(calibration_images[i:i + 8], model_path) for i in range(0, len(calibration_images), 8)]
+
+            class CalibrationReader(CalibrationDataReader):
+                """Feeds pre-processed sample images to the static quantizer."""
+
+                def __init__(self):
+                    self._batches = iter({"pixel_values": batch} for batch in pixel_batches)
+
+                def get_next(self):
+                    return next(self._batches, None)
+
+            reader = CalibrationReader()
+            quantize_static(
+                prepared,
+                target,
+                reader,
+                quant_format=QuantFormat.QDQ,
+                per_channel=True,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+            )
+            mode = f"static, {len(calibration_images)} calibration images"
+        else:
+            quantize_dynamic(prepared, target, weight_type=QuantType.QInt8)
+            mode = "dynamic"
+    finally:
+        if os.path.exists(prepared):
+            os.remove(prepared)
+
+    logger.info(f"Wrote int8 model to '{target}' ({mode}).")
+    return target
+
+
+_processors = {}
+
+
+def preprocess(images: list, model_path: str = MODEL_PATH) -> np.ndarray:
+    """Resizes/crops and normalizes PIL images into a float32 NCHW batch."""
+    from transformers import AutoImageProcessor
+
+    if model_path not in _processors:
+        _processors[model_path] = AutoImageProcessor.from_pretrained(model_path)
+    prepared = [prepare_image(image) for image in images]
+    return _processors[model_path](
+        images=prepared, do_resize=False, do_center_crop=False, return_tensors="np"
+    )["pixel_values"].astype(np.float32)
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+
+    from .imaging import decode_image
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Export the disease classifier to ONNX and int8.")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument(
+        "--calibration-dir",
+        default=None,
+        help="Directory of sample leaf images for static int8 quantization (e.g. uploads).",
+    )
+    parser.add_argument("--calibration-count", type=int, default=64)
+    args = parser.parse_args()
+
+    export_onnx(args.model_path)
+    calibration = None
+    if args.calibration_dir:
+        paths = sorted(
+            p for p in glob.glob(os.path.join(args.calibration_dir, "*"))
+            if not p.endswith((".part", ".thumb.png"))
+        )[: args.calibration_count]
+        calibration = [decode_image(p) for p in paths]
+    quantize_onnx(args.model_path, calibration)
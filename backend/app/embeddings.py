@@ -0,0 +1,171 @@
+# backend/app/embeddings.py
+import os
+import re
+import time
+import queue
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", text.strip().lower())
+
+
+def _settle(future: Future, result=None, error: Exception = None):
+    # The caller may have cancelled its future already (e.g. a tool timeout)
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class EmbeddingService(Embeddings):
+    """
+    Query-embedding front end for the shared MiniLM model.
+
+    - Query embeddings are cached in an LRU keyed on normalized text.
+    - Concurrent cache misses are coalesced: identical texts share one
+      computation, and different texts arriving within `max_wait_ms` of each
+      other are embedded together in a single `embed_documents` call.
+    - Every caller gets its own future, so one caller cancelling its wait
+      (a tool timeout, a client disconnect) never affects the others.
+
+    It implements LangChain's `Embeddings` interface, so it can be handed to the
+    vector stores directly. Document embeddings (index builds) bypass the cache.
+
+    Args:
+        model_resource (LazyResource): Handle to the underlying embedding model.
+    """
+
+    def __init__(
+        self,
+        model_resource,
+        cache_size: int = EMBED_CACHE_SIZE,
+        max_batch_size: int = EMBED_MAX_BATCH_SIZE,
+        max_wait_ms: float = EMBED_MAX_WAIT_MS,
+    ):
+        self.model_resource = model_resource
+        self.cache_size = cache_size
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._cache = OrderedDict()
+        self._pending = {}  # normalized text -> [Future of each waiting caller]
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._scheduler = None
+        self.stats = {"cache_hits": 0, "cache_misses": 0, "coalesced": 0, "batches": 0, "embedded": 0}
+
+    # --- LangChain Embeddings interface ---
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model_resource.get().embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.submit(text))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    # --- Batching ---
+    def submit(self, text: str) -> Future:
+        """Returns a future for the embedding of `text`, served from cache when possible."""
+        key = normalize_text(text)
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                future = Future()
+                future.set_result(vector)
+                return future
+            future = Future()
+            if key in self._pending:
+                self.stats["coalesced"] += 1
+                self._pending[key].append(future)
+                return future
+            self.stats["cache_misses"] += 1
+            self._pending[key] = [future]
+            self._ensure_scheduler()
+        self._queue.put(key)
+        return future
+
+    def _ensure_scheduler(self):
+        if self._scheduler is None:
+            self._scheduler = threading.Thread(target=self._schedule, name="embedding-batcher", daemon=True)
+            self._scheduler.start()
+
+    def _schedule(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                # This thread serves every query: never let one batch stop it
+                logger.error(f"Embedding batcher failed on a batch of {len(batch)}: {e}", exc_info=True)
+                self._fail(batch, e)
+
+    def _fail(self, keys: list, error: Exception):
+        with self._lock:
+            waiters = [self._pending.pop(key, []) for key in keys]
+        for futures in waiters:
+            for future in futures:
+                _settle(future, error=error)
+
+    def _run_batch(self, keys: list):
+        try:
+            vectors = self.model_resource.get().embed_documents(keys)
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(keys)} failed: {e}", exc_info=True)
+            self._fail(keys, e)
+            return
+
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["embedded"] += len(keys)
+            waiters = []
+            for key, vector in zip(keys, vectors):
+                self._cache[key] = vector
+                self._cache.move_to_end(key)
+                waiters.append(self._pending.pop(key, []))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        for futures, vector in zip(waiters, vectors):
+            for future in futures:
+                _settle(future, vector)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["cached"] = len(self._cache)
+        lookups = stats["cache_hits"] + stats["cache_misses"] + stats["coalesced"]
+        stats["hit_ratio"] = round((stats["cache_hits"] + stats["coalesced"]) / lookups, 3) if lookups else 0.0
+        stats["avg_batch_size"] = round(stats["embedded"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
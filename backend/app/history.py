@@ -0,0 +1,298 @@
+# backend/app/history.py
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "memory")  # "memory" or "sqlite"
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "history.db")
+HISTORY_MAX_SESSIONS = int(os.getenv("HISTORY_MAX_SESSIONS", "10000"))
+HISTORY_IDLE_TTL_SECONDS = float(os.getenv("HISTORY_IDLE_TTL_SECONDS", "86400"))
+# Turns kept per session in the store (older ones are dropped or summarized)
+HISTORY_MAX_STORED_TURNS = int(os.getenv("HISTORY_MAX_STORED_TURNS", "40"))
+# Budget for the history actually sent to the agent on each turn
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "6"))
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "1500"))
+HISTORY_SUMMARIZE = os.getenv("HISTORY_SUMMARIZE", "false").lower() == "true"
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting Gemini prompts
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class SessionHistory:
+    """A session's turns as `(user_message, ai_message)` pairs, oldest first."""
+
+    turns: List[Tuple[str, str]] = field(default_factory=list)
+    summary: str = ""
+    # Store-assigned id of each turn, parallel to `turns`
+    turn_ids: List[int] = field(default_factory=list)
+
+
+class InMemoryHistoryStore:
+    """
+    Per-process LRU of session histories. Sessions idle for longer than
+    `idle_ttl_seconds` are evicted, as are the least recently used ones beyond
+    `max_sessions`, so memory stays flat however many sessions come and go.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = HISTORY_MAX_SESSIONS,
+        idle_ttl_seconds: float = HISTORY_IDLE_TTL_SECONDS,
+        max_stored_turns: int = HISTORY_MAX_STORED_TURNS,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_stored_turns = max_stored_turns
+        self._sessions = OrderedDict()  # session_id -> (SessionHistory, last_seen)
+        self._lock = threading.Lock()
+        self._next_turn_id = 0
+        self.evicted = 0
+
+    def _evict(self):
+        cutoff = time.time() - self.idle_ttl_seconds
+        while self._sessions:
+            oldest_id, (_, last_seen) = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and last_seen >= cutoff:
+                break
+            del self._sessions[oldest_id]
+            self.evicted += 1
+
+    def load(self, session_id: str) -> SessionHistory:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return SessionHistory()
+            history, _ = entry
+            self._sessions[session_id] = (history, time.time())
+            self._sessions.move_to_end(session_id)
+            return SessionHistory(list(history.turns), history.summary, list(history.turn_ids))
+
+    def append(self, session_id: str, user_message: str, ai_message: str):
+        with self._lock:
+            history, _ = self._sessions.pop(session_id, (SessionHistory(), None))
+            history.turns.append((user_message, ai_message))
+            history.turn_ids.append(self._next_turn_id)
+            self._next_turn_id += 1
+            del history.turns[:-self.max_stored_turns]
+            del history.turn_ids[:-self.max_stored_turns]
+            self._sessions[session_id] = (history, time.time())
+            self._evict()
+
+    def replace_summary(self, session_id: str, summary: str, summarized_ids: list):
+        """Stores `summary` and drops the turns (by id) it covers."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return
+            history, _ = entry
+            history.summary = summary
+            summarized = set(summarized_ids)
+            kept = [(turn, turn_id) for turn, turn_id in zip(history.turns, history.turn_ids) if turn_id not in summarized]
+            history.turns = [turn for turn, _ in kept]
+            history.turn_ids = [turn_id for _, turn_id in kept]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "evicted": self.evicted,
+            }
+
+
+class SQLiteHistoryStore:
+    """
+    History persisted in SQLite (WAL mode), shared by all uvicorn workers on the
+    host and kept across restarts. Idle sessions are purged periodically.
+    """
+
+    PURGE_INTERVAL_SECONDS = 300
+
+    def __init__(
+        self,
+        path: str = HISTORY_DB_PATH,
+        idle_ttl_seconds: float = HISTORY_IDLE_TTL_SECONDS,
+        max_stored_turns: int = HISTORY_MAX_STORED_TURNS,
+    ):
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_stored_turns = max_stored_turns
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " session_id TEXT NOT NULL,"
+            " user_message TEXT NOT NULL,"
+            " ai_message TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS turns_session ON turns (session_id, id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " summary TEXT NOT NULL DEFAULT '',"
+            " last_seen REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_idle ON sessions (last_seen)")
+
+    def load(self, session_id: str) -> SessionHistory:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            turns = self._conn.execute(
+                "SELECT id, user_message, ai_message FROM turns WHERE session_id = ? ORDER BY id",
+                (session_id,),
+            ).fetchall()
+        return SessionHistory([(u, a) for _, u, a in turns], row[0] if row else "", [t[0] for t in turns])
+
+    def append(self, session_id: str, user_message: str, ai_message: str):
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute(
+                    "INSERT INTO turns (session_id, user_message, ai_message) VALUES (?, ?, ?)",
+                    (session_id, user_message, ai_message),
+                )
+                self._conn.execute(
+                    "INSERT INTO sessions (session_id, last_seen) VALUES (?, ?)"
+                    " ON CONFLICT(session_id) DO UPDATE SET last_seen = excluded.last_seen",
+                    (session_id, now),
+                )
+                self._conn.execute(
+                    "DELETE FROM turns WHERE session_id = ? AND id NOT IN ("
+                    " SELECT id FROM turns WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                    (session_id, session_id, self.max_stored_turns),
+                )
+            if now - self._last_purge > self.PURGE_INTERVAL_SECONDS:
+                self._purge_idle(now)
+
+    def _purge_idle(self, now: float):
+        cutoff = now - self.idle_ttl_seconds
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "DELETE FROM turns WHERE session_id IN (SELECT session_id FROM sessions WHERE last_seen < ?)",
+                (cutoff,),
+            )
+            self._conn.execute("DELETE FROM sessions WHERE last_seen < ?", (cutoff,))
+        self._last_purge = now
+
+    def replace_summary(self, session_id: str, summary: str, summarized_ids: list):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute(
+                    "UPDATE sessions SET summary = ? WHERE session_id = ?", (summary, session_id)
+                )
+                self._conn.executemany(
+                    "DELETE FROM turns WHERE session_id = ? AND id = ?",
+                    [(session_id, turn_id) for turn_id in summarized_ids],
+                )
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            turns = self._conn.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+        return {"backend": "sqlite", "sessions": sessions, "turns": turns}
+
+
+def create_history_store(backend: str = HISTORY_BACKEND):
+    if backend == "sqlite":
+        return SQLiteHistoryStore()
+    if backend != "memory":
+        logger.warning(f"Unknown HISTORY_BACKEND '{backend}', falling back to in-memory history.")
+    return InMemoryHistoryStore()
+
+
+def to_agent_messages(
+    history: SessionHistory,
+    max_turns: int = HISTORY_MAX_TURNS,
+    max_tokens: int = HISTORY_MAX_TOKENS,
+) -> list:
+    """
+    Converts the newest turns that fit in `max_turns` / `max_tokens` into chat
+    messages for the agent, preceded by the running summary of older turns.
+    """
+    selected = []
+    budget = max_tokens
+    if history.summary:
+        budget -= estimate_tokens(history.summary)
+    for user_message, ai_message in reversed(history.turns[-max_turns:] if max_turns > 0 else []):
+        cost = estimate_tokens(user_message) + estimate_tokens(ai_message)
+        if cost > budget and not selected and budget > estimate_tokens(user_message):
+            # Keep at least the latest exchange, with a long answer cut to fit
+            ai_message = ai_message[: (budget - estimate_tokens(user_message)) * 4].rsplit(" ", 1)[0] + " …"
+            cost = budget
+        if cost > budget:
+            break
+        budget -= cost
+        selected.append((user_message, ai_message))
+
+    messages = []
+    if history.summary:
+        messages.append(SystemMessage(content=f"Summary of the earlier conversation: {history.summary}"))
+    for user_message, ai_message in reversed(selected):
+        messages.append(HumanMessage(content=user_message))
+        messages.append(AIMessage(content=ai_message))
+    return messages
+
+
+# Sessions with a summarization in progress in this process
+_summarizing = set()
+
+
+async def summarize_overflow(store, session_id: str, llm, max_turns: int = HISTORY_MAX_TURNS) -> Optional[str]:
+    """
+    Folds turns that no longer fit in the agent's history window into the
+    session's running summary, using one short LLM call. At most one runs per
+    session at a time, and only the turns it actually summarized are removed.
+    """
+    if session_id in _summarizing:
+        return None
+    _summarizing.add(session_id)
+    try:
+        return await _summarize_overflow(store, session_id, llm, max_turns)
+    finally:
+        _summarizing.discard(session_id)
+
+
+async def _summarize_overflow(store, session_id: str, llm, max_turns: int) -> Optional[str]:
+    history = await asyncio.to_thread(store.load, session_id)
+    overflow = len(history.turns) - max_turns
+    # Summarize in blocks of at least `max_turns` turns to amortize the LLM call
+    if overflow < max(1, max_turns):
+        return None
+
+    transcript = "\n".join(f"Farmer: {u}\nAssistant: {a}" for u, a in history.turns[:overflow])
+    prompt = (
+        "Summarize this conversation between a farmer and an agricultural assistant in at most "
+        "5 short sentences. Keep crops, locations, diseases and advice given.\n\n"
+        f"Earlier summary: {history.summary or 'none'}\n\n{transcript}"
+    )
+    try:
+        result = await llm.ainvoke(prompt)
+    except Exception as e:
+        logger.warning(f"History summarization failed for session {session_id}: {e}")
+        return None
+    summary = result.content if isinstance(result.content, str) else str(result.content)
+    await asyncio.to_thread(store.replace_summary, session_id, summary, history.turn_ids[:overflow])
+    return summary
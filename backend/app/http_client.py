@@ -0,0 +1,136 @@
+# backend/app/http_client.py
+import os
+import random
+import asyncio
+import logging
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_SECONDS = float(os.getenv("HTTP_BACKOFF_SECONDS", "0.3"))
+HTTP_MAX_BACKOFF_SECONDS = float(os.getenv("HTTP_MAX_BACKOFF_SECONDS", "5"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Per-host timeouts (connect, read, write, pool) so a hung upstream can't pin a worker.
+HOST_TIMEOUTS = {
+    "api.openweathermap.org": httpx.Timeout(float(os.getenv("WEATHER_HTTP_TIMEOUT", "5")), connect=3.0),
+    "api.data.gov.in": httpx.Timeout(float(os.getenv("MARKET_HTTP_TIMEOUT", "15")), connect=5.0),
+}
+
+# One pooled AsyncClient per event loop: httpx clients cannot be shared across
+# loops, and the sync tool path runs each call in its own short-lived loop.
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Returns the shared, keep-alive `httpx.AsyncClient` for the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            ),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def aclose_async_client():
+    """Closes the client bound to the running event loop, if any."""
+    loop = asyncio.get_running_loop()
+    client = _clients.pop(loop, None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def run_sync(coro_fn, *args):
+    """
+    Runs an async tool implementation from synchronous code (e.g. `AgentExecutor.invoke`),
+    closing the loop-local HTTP client afterwards.
+    """
+    async def _main():
+        try:
+            return await coro_fn(*args)
+        finally:
+            await aclose_async_client()
+
+    return asyncio.run(_main())
+
+
+def _backoff_delay(attempt: int, response: httpx.Response = None) -> float:
+    # Honour a numeric Retry-After from the upstream, otherwise exponential backoff with jitter.
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), HTTP_MAX_BACKOFF_SECONDS)
+    delay = HTTP_BACKOFF_SECONDS * (2 ** attempt)
+    return min(delay + random.uniform(0, delay / 2), HTTP_MAX_BACKOFF_SECONDS)
+
+
+async def get_with_retries(url: str, params: dict = None, retries: int = HTTP_MAX_RETRIES) -> httpx.Response:
+    """
+    GET `url` on the pooled client with the host's timeout, retrying transport
+    errors and retryable status codes (429/5xx) with bounded exponential backoff.
+
+    Returns:
+        httpx.Response: the last response; callers decide how to treat its status.
+    """
+    client = get_async_client()
+    timeout = HOST_TIMEOUTS.get(httpx.URL(url).host, HTTP_TIMEOUT_SECONDS)
+    for attempt in range(retries + 1):
+        try:
+            response = await client.get(url, params=params, timeout=timeout)
+        except httpx.TransportError as e:
+            if attempt >= retries:
+                raise
+            delay = _backoff_delay(attempt)
+            logger.warning(f"GET {httpx.URL(url).host} failed ({e.__class__.__name__}); retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            delay = _backoff_delay(attempt, response)
+            logger.warning(f"GET {httpx.URL(url).host} returned {response.status_code}; retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+        return response
+
+
+_sync_session = None
+
+
+def get_sync_session() -> requests.Session:
+    """
+    Shared keep-alive `requests.Session` for the remaining blocking call sites,
+    with the same retry policy mounted on its adapters.
+    """
+    global _sync_session
+    if _sync_session is None:
+        retry = Retry(
+            total=HTTP_MAX_RETRIES,
+            backoff_factor=HTTP_BACKOFF_SECONDS,
+            status_forcelist=sorted(RETRY_STATUSES),
+            allowed_methods=["GET"],
+        )
+        adapter = HTTPAdapter(pool_connections=HTTP_MAX_KEEPALIVE, pool_maxsize=HTTP_MAX_CONNECTIONS, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _sync_session = session
+    return _sync_session
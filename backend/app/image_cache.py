@@ -0,0 +1,136 @@
+# backend/app/image_cache.py
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+
+from .cache import CACHE_DB_PATH
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+CLASSIFICATION_CACHE_MAX_ENTRIES = int(os.getenv("CLASSIFICATION_CACHE_MAX_ENTRIES", "50000"))
+# Max Hamming distance between perceptual hashes to count as the same photo.
+# Must stay below PHASH_BANDS so the banded lookup below is exact.
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "3"))
+PHASH_BANDS = 4
+# The entry cap is enforced every this many writes, trimming the oldest 10%
+# in one go, so a write never pays for a scan of the whole table.
+EVICT_CHECK_INTERVAL = 100
+
+
+def _bands(phash: int) -> list:
+    # Split the 64-bit hash into 16-bit bands. Two hashes within distance < 4
+    # must agree exactly on at least one band (pigeonhole), so candidates can
+    # be found with indexed equality lookups instead of a full scan.
+    return [(phash >> (16 * i)) & 0xFFFF for i in range(PHASH_BANDS)]
+
+
+class ClassificationCache:
+    """
+    Persistent map from image content hash (and perceptual hash) to the
+    classifier's label and top-k scores, so re-sent photos skip the forward pass.
+    Entries are tagged with the model that produced them.
+    """
+
+    def __init__(
+        self,
+        path: str = CACHE_DB_PATH,
+        max_entries: int = CLASSIFICATION_CACHE_MAX_ENTRIES,
+        max_distance: int = NEAR_DUPLICATE_MAX_DISTANCE,
+    ):
+        self.max_entries = max_entries
+        self.max_distance = min(max_distance, PHASH_BANDS - 1)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS classifications ("
+            " sha256 TEXT NOT NULL,"
+            " model TEXT NOT NULL,"
+            " phash TEXT NOT NULL,"
+            " band0 INTEGER, band1 INTEGER, band2 INTEGER, band3 INTEGER,"
+            " result TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (sha256, model))"
+        )
+        for i in range(PHASH_BANDS):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS classifications_band{i} ON classifications (band{i})")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS classifications_created ON classifications (created_at)")
+        self._writes_until_check = 0
+        self.stats = {"exact_hits": 0, "near_hits": 0, "misses": 0}
+
+    def get(self, sha256: str, model: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM classifications WHERE sha256 = ? AND model = ?", (sha256, model)
+            ).fetchone()
+            if row is None:
+                return None
+            self.stats["exact_hits"] += 1
+        return json.loads(row[0])
+
+    def find_similar(self, phash: int, model: str):
+        """Returns the cached result of the closest near-duplicate image, or None."""
+        if self.max_distance <= 0:
+            return None
+        bands = _bands(phash)
+        where = " OR ".join(f"band{i} = ?" for i in range(PHASH_BANDS))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT phash, result FROM classifications WHERE model = ? AND ({where})",
+                (model, *bands),
+            ).fetchall()
+        best = None
+        for candidate, result in rows:
+            distance = bin(int(candidate, 16) ^ phash).count("1")
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, result)
+        if best is None:
+            return None
+        with self._lock:
+            self.stats["near_hits"] += 1
+        return json.loads(best[1])
+
+    def record_miss(self):
+        with self._lock:
+            self.stats["misses"] += 1
+
+    def put(self, sha256: str, phash: int, model: str, result: dict):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO classifications VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (sha256, model, f"{phash:016x}", *_bands(phash), json.dumps(result), time.time()),
+                )
+            self._writes_until_check -= 1
+            if self._writes_until_check <= 0:
+                self._writes_until_check = EVICT_CHECK_INTERVAL
+                self._evict()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        excess = count - self.max_entries + self.max_entries // 10
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            # Walks the created_at index from the oldest entry; no sort
+            self._conn.execute(
+                "DELETE FROM classifications WHERE rowid IN ("
+                " SELECT rowid FROM classifications ORDER BY created_at LIMIT ?)",
+                (excess,),
+            )
+        logger.info(f"Evicted {excess} old classification cache entries.")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+        lookups = stats["exact_hits"] + stats["near_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["exact_hits"] + stats["near_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
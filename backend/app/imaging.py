@@ -0,0 +1,59 @@
+# backend/app/imaging.py
+import io
+
+from PIL import Image, ImageOps
+
+# --- Configuration ---
+# Must match app/mobilenet_plant_disease/preprocessor_config.json
+RESIZE_SHORTEST_EDGE = 256
+CROP_SIZE = 224
+
+
+def decode_image(source, min_edge: int = RESIZE_SHORTEST_EDGE) -> Image.Image:
+    """
+    Decodes an image file path or bytes into RGB, without materializing the
+    full-resolution bitmap when it isn't needed: for JPEGs, `draft` makes
+    libjpeg decode directly at the smallest 1/2, 1/4 or 1/8 scale that still
+    keeps both edges at least `min_edge` pixels.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    image = Image.open(source)
+    image.draft("RGB", (min_edge, min_edge))
+    image = ImageOps.exif_transpose(image)
+    return image.convert("RGB")
+
+
+def prepare_image(image: Image.Image) -> Image.Image:
+    """
+    Resizes the shortest edge to 256 and center-crops to 224x224, the same
+    geometry the classifier's processor applies. Images that are already
+    224x224 are returned unchanged, so prepared thumbnails skip this step.
+    """
+    if image.size == (CROP_SIZE, CROP_SIZE):
+        return image
+    width, height = image.size
+    scale = RESIZE_SHORTEST_EDGE / min(width, height)
+    resized = image.resize(
+        (max(CROP_SIZE, round(width * scale)), max(CROP_SIZE, round(height * scale))),
+        Image.BILINEAR,
+    )
+    left = (resized.width - CROP_SIZE) // 2
+    top = (resized.height - CROP_SIZE) // 2
+    return resized.crop((left, top, left + CROP_SIZE, top + CROP_SIZE))
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """
+    Difference hash: a 64-bit perceptual fingerprint that survives re-encoding,
+    resizing and small edits (e.g. WhatsApp re-compression), so near-identical
+    photos end up within a few bits of each other.
+    """
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
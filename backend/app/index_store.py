@@ -0,0 +1,280 @@
+# backend/app/index_store.py
+import os
+import json
+import logging
+import sqlite3
+import threading
+from typing import Any, List
+
+import faiss
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+FAISS_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.sqlite"
+# "flat" (exact), "ivf-flat", "hnsw" or "ivf-pq"; see `create_index`.
+INDEX_TYPES = ("flat", "ivf-flat", "hnsw", "ivf-pq")
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+INDEX_NLIST = int(os.getenv("INDEX_NLIST", "0"))  # 0 = derived from the corpus size
+INDEX_PQ_M = int(os.getenv("INDEX_PQ_M", "48"))  # sub-quantizers; must divide the embedding dim
+INDEX_HNSW_M = int(os.getenv("INDEX_HNSW_M", "32"))
+# Search-time knobs, applied when the index is loaded
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+# faiss wants ~39 training points per centroid; PQ needs 256 per sub-quantizer codebook
+_MIN_POINTS_PER_LIST = 39
+_PQ_CODEBOOK_SIZE = 256
+
+
+def default_nlist(n_vectors: int) -> int:
+    """About 4*sqrt(n) inverted lists, capped so each has enough training points."""
+    return max(1, min(int(4 * np.sqrt(n_vectors)), n_vectors // _MIN_POINTS_PER_LIST))
+
+
+def create_index(
+    index_type: str,
+    vectors: np.ndarray,
+    nlist: int = INDEX_NLIST,
+    pq_m: int = INDEX_PQ_M,
+    hnsw_m: int = INDEX_HNSW_M,
+):
+    """
+    Creates an empty (but trained) L2 FAISS index of `index_type` for vectors
+    like `vectors`, training IVF/PQ quantizers on them. Falls back to "flat"
+    when the corpus is too small to train the requested type.
+
+    Returns:
+        tuple: (faiss index, effective index type)
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'. Choose one of {INDEX_TYPES}.")
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim), "flat"
+    if index_type == "hnsw":
+        return faiss.IndexHNSWFlat(dim, hnsw_m), "hnsw"
+
+    nlist = nlist or default_nlist(n)
+    min_points = nlist * _MIN_POINTS_PER_LIST
+    if index_type == "ivf-pq":
+        min_points = max(min_points, _PQ_CODEBOOK_SIZE * _MIN_POINTS_PER_LIST)
+        if dim % pq_m:
+            raise ValueError(f"INDEX_PQ_M={pq_m} must divide the embedding dimension {dim}.")
+    if n < min_points:
+        logger.warning(f"{n} vectors are too few to train a '{index_type}' index (need {min_points}); using 'flat'.")
+        return faiss.IndexFlatL2(dim), "flat"
+
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf-flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, 8)
+    index.train(vectors)
+    logger.info(f"Trained '{index_type}' index on {n} vectors (nlist={nlist}).")
+    return index, index_type
+
+
+def tune_index(index, nprobe: int = FAISS_NPROBE, ef_search: int = FAISS_EF_SEARCH):
+    """
+    Applies search-time parameters to a loaded index: `nprobe` for IVF
+    indexes, `efSearch` for HNSW. IVF indexes also get a direct map so
+    vectors can be reconstructed for MMR.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+        ivf.make_direct_map()
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+    return index
+
+
+def _json_default(value):
+    # numpy scalars (e.g. soil averages) are not JSON serializable as-is
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def export_compact_docstore(db, index_path: str) -> str:
+    """
+    Writes the chunks of a LangChain FAISS store into `docstore.sqlite`, one
+    row per FAISS position, so they can be fetched lazily by id. The FAISS
+    index itself is already saved as `index.faiss` by `save_local`.
+
+    Returns:
+        str: path of the written docstore.
+    """
+    path = os.path.join(index_path, DOCSTORE_FILE)
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute(
+            "CREATE TABLE chunks ("
+            " position INTEGER PRIMARY KEY,"
+            " doc_id TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " metadata TEXT NOT NULL)"
+        )
+        rows = []
+        for position, doc_id in db.index_to_docstore_id.items():
+            doc = db.docstore.search(doc_id)
+            rows.append((position, doc_id, doc.page_content, json.dumps(doc.metadata, default=_json_default)))
+        conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote {len(rows)} chunks to '{path}'.")
+    return path
+
+
+def has_compact_docstore(index_path: str) -> bool:
+    return os.path.exists(os.path.join(index_path, DOCSTORE_FILE)) and os.path.exists(
+        os.path.join(index_path, FAISS_FILE)
+    )
+
+
+class CompactFAISSStore:
+    """
+    Read-only vector store over a memory-mapped FAISS index and a SQLite docstore.
+
+    The index is opened read-only with `IO_FLAG_MMAP_IFC` (faiss >= 1.10), which
+    maps flat code arrays ("flat", the "hnsw" storage) as well as IVF inverted
+    lists, so uvicorn workers share the vectors through the OS page cache.
+    Older faiss builds fall back to `IO_FLAG_MMAP`, which maps IVF inverted
+    lists only: "flat" and "hnsw" vectors are then copied into every worker's
+    heap. "ivf-pq" also keeps per-process precomputed distance tables (about
+    nlist * M KB) whatever the mode. `mmap_mode` records which mode applied;
+    `benchmarks/index_memory.py` measures the per-worker cost of each.
+    Chunk texts/metadata are read from SQLite only for the ids a search
+    actually returns.
+    """
+
+    def __init__(self, index_path: str, embeddings):
+        self.index_path = index_path
+        self.embeddings = embeddings
+        self.index, self.mmap_mode = self._open_index(os.path.join(index_path, FAISS_FILE))
+        self._docstore_uri = f"file:{os.path.abspath(os.path.join(index_path, DOCSTORE_FILE))}?mode=ro"
+        self._local = threading.local()
+
+    @staticmethod
+    def _open_index(path: str) -> tuple:
+        """Returns `(index, mode)`, mode being "mmap-ifc", "mmap" or "heap"."""
+        attempts = []
+        if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+            attempts.append(("mmap-ifc", faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY))
+        attempts.append(("mmap", faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY))
+        for mode, flags in attempts:
+            try:
+                index = faiss.read_index(path, flags)
+                logger.info(f"Opened '{path}' ({type(index).__name__}) with {mode}.")
+                return index, mode
+            except RuntimeError as e:
+                # Older FAISS builds only support mmap for some index types.
+                logger.warning(f"Opening '{path}' with {mode} is not supported ({e}).")
+        logger.warning(f"Reading '{path}' into memory; each worker holds its own copy.")
+        return faiss.read_index(path), "heap"
+
+    def _conn(self) -> sqlite3.Connection:
+        # SQLite connections are per thread; retrieval runs on executor threads.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._docstore_uri, uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def fetch(self, positions: List[int]) -> dict:
+        """Returns `{position: Document}` for the given FAISS positions."""
+        positions = [int(p) for p in positions if p >= 0]
+        if not positions:
+            return {}
+        placeholders = ",".join("?" * len(positions))
+        rows = self._conn().execute(
+            f"SELECT position, doc_id, content, metadata FROM chunks WHERE position IN ({placeholders})",
+            positions,
+        ).fetchall()
+        return {
+            position: Document(page_content=content, metadata=json.loads(metadata), id=doc_id)
+            for position, doc_id, content, metadata in rows
+        }
+
+    def _search(self, vector, k: int, filter=None, fetch_k: int = 20) -> list:
+        # Returns [(position, Document, distance)]. With a metadata filter,
+        # `fetch_k` candidates are retrieved and filtered down to `k`.
+        query = np.asarray([vector], dtype=np.float32)
+        distances, positions = self.index.search(query, max(k, fetch_k) if filter else k)
+        docs = self.fetch(positions[0].tolist())
+        hits = [
+            (int(p), docs[int(p)], float(d))
+            for p, d in zip(positions[0], distances[0])
+            if int(p) in docs
+        ]
+        if filter is not None:
+            hits = [hit for hit in hits if filter(hit[1].metadata)]
+        return hits[:k]
+
+    def similarity_search_with_score_by_vector(self, vector, k: int = 4, filter=None, fetch_k: int = 20) -> list:
+        return [(doc, distance) for _, doc, distance in self._search(vector, k, filter, fetch_k)]
+
+    def max_marginal_relevance_search_with_score_by_vector(
+        self, vector, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5, filter=None
+    ) -> list:
+        """Picks `k` of the `fetch_k` nearest chunks, trading relevance against diversity."""
+        from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+        candidates = self._search(vector, fetch_k, filter, fetch_k * 2 if filter else fetch_k)
+        if not candidates:
+            return []
+        vectors = np.vstack([self.index.reconstruct(position) for position, _, _ in candidates])
+        selected = maximal_marginal_relevance(
+            np.asarray(vector, dtype=np.float32), vectors, k=k, lambda_mult=lambda_mult
+        )
+        return [(candidates[i][1], candidates[i][2]) for i in selected]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter=None, fetch_k: int = 20) -> list:
+        return self.similarity_search_with_score_by_vector(self.embeddings.embed_query(query), k, filter, fetch_k)
+
+    def similarity_search(self, query: str, k: int = 4, filter=None) -> list:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def as_retriever(self, search_kwargs: dict = None) -> "CompactRetriever":
+        return CompactRetriever(store=self, k=(search_kwargs or {}).get("k", 4))
+
+
+class CompactRetriever(BaseRetriever):
+    """LangChain retriever wrapper around `CompactFAISSStore`."""
+
+    store: Any
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.store.similarity_search(query, self.k)
+
+
+if __name__ == "__main__":
+    # Convert an existing pickled LangChain index into the compact format.
+    import argparse
+    from langchain_community.vectorstores import FAISS
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Export the docstore of a FAISS index to SQLite.")
+    parser.add_argument("--index-path", default=os.path.join(os.path.dirname(__file__), "data", "faiss_index"))
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    args = parser.parse_args()
+
+    db = FAISS.load_local(args.index_path, HuggingFaceEmbeddings(model_name=args.model), allow_dangerous_deserialization=True)
+    export_compact_docstore(db, args.index_path)
@@ -0,0 +1,252 @@
+# backend/app/inference.py
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+
+import numpy as np
+
+from .classifier_backends import CLASSIFIER_BACKEND, load_backend, preprocess
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# All knobs can be overridden from the environment (.env) without touching code.
+MODEL_PATH = "app/mobilenet_plant_disease"
+MAX_BATCH_SIZE = int(os.getenv("CLASSIFIER_MAX_BATCH_SIZE", "16"))
+MAX_WAIT_MS = float(os.getenv("CLASSIFIER_MAX_WAIT_MS", "15"))
+NUM_WORKERS = int(os.getenv("CLASSIFIER_WORKERS", "2"))
+TOP_K = int(os.getenv("CLASSIFIER_TOP_K", "3"))
+
+
+class _Request:
+    """A single image waiting in the queue, plus the future its caller blocks on."""
+
+    __slots__ = ("image", "future", "enqueued_at")
+
+    def __init__(self, image):
+        self.image = image
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+def _settle(future: Future, result=None, error: Exception = None):
+    # The caller may have cancelled the future already (e.g. an awaiting task timed out)
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class InferenceStats:
+    """
+    Thread-safe throughput/latency counters for the inference engine.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.batches = 0
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self.total_queue_wait_ms = 0.0
+        self.total_forward_ms = 0.0
+
+    def record_submit(self):
+        with self._lock:
+            self.submitted += 1
+
+    def record_batch(self, queue_wait_ms: float, forward_ms: float, latencies_ms: list, failed: int = 0):
+        """`latencies_ms` holds one entry per request that completed; `failed` counts the others."""
+        with self._lock:
+            self.batches += 1
+            self.total_queue_wait_ms += queue_wait_ms
+            self.total_forward_ms += forward_ms
+            self.failed += failed
+            self.completed += len(latencies_ms)
+            self.total_latency_ms += sum(latencies_ms)
+            self.max_latency_ms = max([self.max_latency_ms] + latencies_ms)
+
+    def snapshot(self, queue_depth: int = 0) -> dict:
+        with self._lock:
+            elapsed = max(time.time() - self.started_at, 1e-9)
+            processed = self.completed + self.failed
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "queue_depth": queue_depth,
+                "batches": self.batches,
+                "avg_batch_size": round(processed / self.batches, 2) if self.batches else 0.0,
+                "avg_latency_ms": round(self.total_latency_ms / self.completed, 2) if self.completed else 0.0,
+                "max_latency_ms": round(self.max_latency_ms, 2),
+                "avg_queue_wait_ms": round(self.total_queue_wait_ms / processed, 2) if processed else 0.0,
+                "avg_forward_ms": round(self.total_forward_ms / self.batches, 2) if self.batches else 0.0,
+                "throughput_per_sec": round(self.completed / elapsed, 3),
+            }
+
+
+class InferenceEngine:
+    """
+    Micro-batching inference service for the MobileNetV2 disease classifier,
+    running on the backend selected by CLASSIFIER_BACKEND (torch, onnx, onnx-int8).
+
+    Callers submit single PIL images. A scheduler thread drains the request queue
+    into batches of up to `max_batch_size` images (waiting at most `max_wait_ms`
+    for a batch to fill up) and hands each batch to a pool of CPU workers, which
+    run one pre-processing call and one forward pass for the whole batch.
+    """
+
+    def __init__(
+        self,
+        model_path: str = MODEL_PATH,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS,
+        num_workers: int = NUM_WORKERS,
+        top_k: int = TOP_K,
+        backend: str = CLASSIFIER_BACKEND,
+    ):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.num_workers = max(1, num_workers)
+        self.top_k = max(1, top_k)
+
+        logger.info(f"Loading classifier from '{model_path}' ({backend} backend)...")
+        self.model_path = model_path
+        # Split the CPU cores between the workers so concurrent batches don't
+        # oversubscribe the machine with intra-op threads.
+        self.backend = load_backend(backend, model_path, threads=max(1, (os.cpu_count() or 1) // self.num_workers))
+        self.id2label = self.backend.id2label
+
+        self.stats = InferenceStats()
+        self._queue = queue.Queue()
+        self._workers = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="classifier")
+        # Only dispatch a batch when a worker is free, so requests keep
+        # accumulating into the next batch while all workers are busy.
+        self._free_workers = threading.Semaphore(self.num_workers)
+        self._running = True
+        self._scheduler = threading.Thread(target=self._schedule, name="classifier-scheduler", daemon=True)
+        self._scheduler.start()
+        logger.info(
+            f"✅ Inference engine ready (backend={self.backend.name}, max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={max_wait_ms}, workers={self.num_workers})."
+        )
+
+    # --- Public API ---
+    def submit(self, image) -> Future:
+        """
+        Queues a PIL image for classification.
+
+        Returns:
+            Future: resolves to a dict with `label`, `score` and `top_k` predictions.
+        """
+        if not self._running:
+            raise RuntimeError("Inference engine has been shut down.")
+        request = _Request(image)
+        self.stats.record_submit()
+        self._queue.put(request)
+        return request.future
+
+    def classify(self, image, timeout: float = None) -> dict:
+        """Blocking convenience wrapper around `submit`."""
+        return self.submit(image).result(timeout=timeout)
+
+    def get_stats(self) -> dict:
+        return self.stats.snapshot(queue_depth=self._queue.qsize())
+
+    def shutdown(self):
+        self._running = False
+        self._queue.put(None)
+        self._scheduler.join(timeout=5)
+        self._workers.shutdown(wait=True)
+
+    # --- Scheduling ---
+    def _collect_batch(self, first: _Request) -> list:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Shutdown sentinel: put it back so the scheduler loop sees it.
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _schedule(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect_batch(first)
+            self._free_workers.acquire()
+            self._workers.submit(self._run_batch, batch)
+
+    def _predict(self, images: list) -> tuple:
+        # Resize/crop with PIL (a no-op for thumbnails prepared at upload),
+        # then one normalization call and one forward pass for the batch.
+        pixel_values = preprocess(images, self.model_path)
+        logits = self.backend.forward(pixel_values)
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=-1, keepdims=True)
+        k = min(self.top_k, probs.shape[-1])
+        indices = np.argsort(-probs, axis=-1)[:, :k]
+        scores = np.take_along_axis(probs, indices, axis=-1)
+        return scores.tolist(), indices.tolist()
+
+    def _resolve(self, request: _Request, row_scores: list, row_indices: list) -> float:
+        top_k = [
+            {"label": self.id2label[idx], "score": round(score, 4)}
+            for idx, score in zip(row_indices, row_scores)
+        ]
+        _settle(request.future, {"label": top_k[0]["label"], "score": top_k[0]["score"], "top_k": top_k})
+        return (time.perf_counter() - request.enqueued_at) * 1000
+
+    def _run_batch(self, batch: list):
+        started = time.perf_counter()
+        queue_wait_ms = sum((started - r.enqueued_at) * 1000 for r in batch)
+        latencies, failed = [], 0
+        try:
+            try:
+                scores, indices = self._predict([r.image for r in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    raise
+                # One bad image must not fail the unrelated requests batched
+                # with it: retry each on its own so only the culprit errors.
+                logger.warning(f"Classifier batch of {len(batch)} failed ({e}); retrying images one by one.")
+                for r in batch:
+                    try:
+                        row_scores, row_indices = self._predict([r.image])
+                    except Exception as item_error:
+                        logger.error(f"Classifier failed on one image: {item_error}", exc_info=True)
+                        _settle(r.future, error=item_error)
+                        failed += 1
+                    else:
+                        latencies.append(self._resolve(r, row_scores[0], row_indices[0]))
+            else:
+                for r, row_scores, row_indices in zip(batch, scores, indices):
+                    latencies.append(self._resolve(r, row_scores, row_indices))
+        except Exception as e:
+            logger.error(f"Classifier batch of {len(batch)} failed: {e}", exc_info=True)
+            for r in batch:
+                _settle(r.future, error=e)
+            failed = len(batch) - len(latencies)
+        finally:
+            self._free_workers.release()
+            forward_ms = (time.perf_counter() - started) * 1000
+            self.stats.record_batch(queue_wait_ms, forward_ms, latencies, failed)
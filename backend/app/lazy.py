@@ -0,0 +1,107 @@
+# backend/app/lazy.py
+import time
+import asyncio
+import logging
+import threading
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+# Every LazyResource registers itself here so /health can report readiness.
+RESOURCES = {}
+
+
+class LazyResource:
+    """
+    Thread-safe handle to an expensive object (model, index) that is built on
+    first use. Concurrent first callers block on the same load instead of each
+    loading their own copy; a failed load is retried on the next call.
+
+    Args:
+        name (str): Name reported by `readiness()`.
+        loader (callable): Zero-argument function that builds the object.
+    """
+
+    def __init__(self, name: str, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self.state = NOT_LOADED
+        self.error = None
+        self.load_seconds = None
+        RESOURCES[name] = self
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def get(self):
+        if self.state == READY:
+            return self._value
+        with self._lock:
+            if self.state == READY:
+                return self._value
+            self.state = LOADING
+            started = time.perf_counter()
+            try:
+                self._value = self._loader()
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                logger.error(f"Failed to load '{self.name}': {e}", exc_info=True)
+                raise
+            self.load_seconds = round(time.perf_counter() - started, 3)
+            self.state = READY
+            self.error = None
+            logger.info(f"✅ '{self.name}' loaded in {self.load_seconds}s.")
+            return self._value
+
+    async def aget(self):
+        """Like `get`, but loads off the event loop when not ready yet."""
+        if self.state == READY:
+            return self._value
+        return await asyncio.to_thread(self.get)
+
+    def peek(self):
+        """Returns the object if it is already loaded, without triggering a load."""
+        return self._value if self.state == READY else None
+
+    def status(self) -> dict:
+        status = {"state": self.state, "load_seconds": self.load_seconds}
+        if self.error:
+            status["error"] = self.error
+        return status
+
+
+def readiness() -> dict:
+    """Load state of every registered resource."""
+    return {name: resource.status() for name, resource in RESOURCES.items()}
+
+
+def all_ready() -> bool:
+    return all(resource.ready for resource in RESOURCES.values())
+
+
+def warm_up(names: list = None):
+    """Loads the given (default: all) resources in the calling thread."""
+    for name, resource in list(RESOURCES.items()):
+        if names is not None and name not in names:
+            continue
+        try:
+            resource.get()
+        except Exception:
+            # Already logged; the resource will retry on first real use.
+            pass
+
+
+def start_background_warm_up(names: list = None) -> threading.Thread:
+    """Starts `warm_up` on a daemon thread so startup isn't blocked by it."""
+    thread = threading.Thread(target=warm_up, args=(names,), name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
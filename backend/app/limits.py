@@ -0,0 +1,165 @@
+# backend/app/limits.py
+import os
+import time
+import asyncio
+import functools
+import threading
+import weakref
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import Counter, CallbackGauge
+
+# --- Configuration ---
+# Maximum number of in-flight calls per downstream dependency, per worker process.
+LIMITS = {
+    "gemini": int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+    "weather": int(os.getenv("WEATHER_MAX_CONCURRENCY", "10")),
+    "market": int(os.getenv("MARKET_MAX_CONCURRENCY", "5")),
+    "faiss": int(os.getenv("FAISS_MAX_CONCURRENCY", "4")),
+    "classifier": int(os.getenv("CLASSIFIER_MAX_CONCURRENCY", "8")),
+}
+
+# Request budget per upstream API, shared by every tool and background job
+# that calls it (0 disables). Defaults stay under the free-tier quotas.
+RATES_PER_MINUTE = {
+    "gemini": float(os.getenv("GEMINI_RATE_PER_MINUTE", "300")),
+    "weather": float(os.getenv("WEATHER_RATE_PER_MINUTE", "600")),
+    "market": float(os.getenv("MARKET_RATE_PER_MINUTE", "300")),
+}
+# Longest a call waits for its upstream's budget before failing fast.
+THROTTLE_MAX_WAIT_SECONDS = float(os.getenv("THROTTLE_MAX_WAIT_SECONDS", "2"))
+
+# asyncio primitives are bound to the loop they are first used on, so keep one
+# set of semaphores per event loop.
+_semaphores = weakref.WeakKeyDictionary()
+_executors = {}
+
+
+def limit(name: str) -> asyncio.Semaphore:
+    """
+    Returns the semaphore bounding concurrent calls to the dependency `name`.
+
+    Usage:
+        async with limit("weather"):
+            ...
+    """
+    loop = asyncio.get_running_loop()
+    per_loop = _semaphores.setdefault(loop, {})
+    if name not in per_loop:
+        per_loop[name] = asyncio.Semaphore(LIMITS[name])
+    return per_loop[name]
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """Dedicated thread pool for blocking work of the dependency `name`."""
+    if name not in _executors:
+        _executors[name] = ThreadPoolExecutor(max_workers=LIMITS[name], thread_name_prefix=name)
+    return _executors[name]
+
+
+async def offload(name: str, fn, *args, **kwargs):
+    """
+    Runs a blocking function on the dependency's executor without blocking the
+    event loop, bounded by the dependency's concurrency limit.
+    """
+    loop = asyncio.get_running_loop()
+    async with limit(name):
+        return await loop.run_in_executor(get_executor(name), functools.partial(fn, *args, **kwargs))
+
+
+# --- Upstream rate limits ---
+class RateLimited(Exception):
+    """An upstream's request budget is exhausted for longer than the caller may wait."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"The {name} request budget is exhausted; retry in {retry_after:.0f}s.")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at `rate_per_second` up to `burst`.
+    Callers reserve tokens ahead of time (the bucket may go into debt), so
+    concurrent waiters are served in order without polling.
+    """
+
+    def __init__(self, rate_per_second: float, burst: float):
+        self.rate = rate_per_second
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens: float = 1, max_wait: float = None) -> float:
+        """
+        Takes `tokens` and returns how long to wait before using them.
+
+        Raises:
+            RateLimited: if the wait would exceed `max_wait` (nothing is taken).
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = max(0.0, (tokens - self._tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                raise RateLimited("upstream", wait)
+            self._tokens -= tokens
+            return wait
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+_buckets = {
+    name: TokenBucket(per_minute / 60, per_minute / 6)
+    for name, per_minute in RATES_PER_MINUTE.items()
+    if per_minute > 0
+}
+
+RATE_LIMITED = Counter("agri_upstream_rate_limited_total", "Upstream calls refused by their request budget.", ("upstream",))
+CallbackGauge(
+    "agri_upstream_tokens", "Requests currently available in each upstream's budget.",
+    lambda: {(name,): round(bucket.available, 2) for name, bucket in _buckets.items()}, ("upstream",),
+)
+
+
+async def throttle(name: str, tokens: float = 1, max_wait: float = THROTTLE_MAX_WAIT_SECONDS):
+    """
+    Waits for `tokens` of the upstream's request budget. Pass `max_wait=None`
+    for background jobs that may wait as long as needed.
+
+    Raises:
+        RateLimited: if the budget will not allow the call within `max_wait`.
+    """
+    bucket = _buckets.get(name)
+    if bucket is None:
+        return
+    try:
+        wait = bucket.reserve(tokens, max_wait)
+    except RateLimited as e:
+        RATE_LIMITED.inc(upstream=name)
+        raise RateLimited(name, e.retry_after) from None
+    if wait > 0:
+        await asyncio.sleep(wait)
+
+
+@contextlib.asynccontextmanager
+async def upstream(name: str, tokens: float = 1, max_wait: float = THROTTLE_MAX_WAIT_SECONDS):
+    """
+    Budget and concurrency guard for calls to an external API.
+
+    Usage:
+        async with upstream("weather"):
+            ...
+    """
+    await throttle(name, tokens, max_wait)
+    async with limit(name):
+        yield
@@ -0,0 +1,157 @@
+# backend/app/locations.py
+import os
+import re
+import logging
+import threading
+from dataclasses import dataclass
+
+from .cache import ToolCache
+from .http_client import get_with_retries
+from .limits import upstream
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# Overridable so benchmarks can point the weather tool at a local stand-in
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org").rstrip("/")
+GEOCODE_URL = f"{OPENWEATHER_BASE_URL}/geo/1.0/direct"
+# Side of the grid cell coordinates are snapped to (0.1 degree is ~11 km):
+# every place inside one cell shares a single cached forecast.
+GEO_GRID_DEGREES = float(os.getenv("GEO_GRID_DEGREES", "0.1"))
+GEOCODE_CACHE_TTL_SECONDS = float(os.getenv("GEOCODE_CACHE_TTL_SECONDS", str(30 * 86400)))
+# ISO 3166 country code appended to geocoder queries ("hyderabad" -> "hyderabad,IN")
+# so ambiguous names resolve inside the country. Empty to search worldwide.
+GEOCODE_COUNTRY = os.getenv("GEOCODE_COUNTRY", "IN")
+
+_COORDINATES = re.compile(r"^\s*(-?\d{1,3}(?:\.\d+)?)\s*,\s*(-?\d{1,3}(?:\.\d+)?)\s*$")
+_NOISE = re.compile(r"[^\w\s,]", re.UNICODE)
+_WHITESPACE = re.compile(r"\s+")
+_COUNTRY_SUFFIX = re.compile(r"(,\s*)?\bindia$")
+
+geocode_cache = ToolCache(
+    "geocode",
+    ttl_seconds=GEOCODE_CACHE_TTL_SECONDS,
+    max_memory_entries=int(os.getenv("GEOCODE_CACHE_MEMORY_ENTRIES", "1024")),
+    max_store_entries=int(os.getenv("GEOCODE_CACHE_STORE_ENTRIES", "20000")),
+)
+
+
+@dataclass(frozen=True)
+class CanonicalLocation:
+    """A grid cell: `key` is the cache key shared by every alias of the place."""
+
+    key: str
+    lat: float
+    lon: float
+    name: str = None
+
+
+def parse_coordinates(text: str):
+    """Returns `(lat, lon)` for input like "22.34, 87.23", or None."""
+    match = _COORDINATES.match(text or "")
+    if not match:
+        return None
+    lat, lon = float(match.group(1)), float(match.group(2))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def normalize_place_name(text: str) -> str:
+    """"Kharagpur,  West Bengal, India!" -> "kharagpur, west bengal"."""
+    text = _WHITESPACE.sub(" ", _NOISE.sub(" ", (text or "").lower())).strip()
+    text = re.sub(r"\s*,\s*", ", ", text).strip(", ")
+    return _COUNTRY_SUFFIX.sub("", text).strip(", ")
+
+
+def snap_to_grid(lat: float, lon: float, grid: float = GEO_GRID_DEGREES) -> CanonicalLocation:
+    decimals = max(0, len(f"{grid:.6f}".rstrip("0").split(".")[1]))
+    cell_lat = round(round(lat / grid) * grid, decimals)
+    cell_lon = round(round(lon / grid) * grid, decimals)
+    return CanonicalLocation(key=f"{cell_lat:.{decimals}f},{cell_lon:.{decimals}f}", lat=cell_lat, lon=cell_lon)
+
+
+def geocoder_query(place: str) -> str:
+    """The normalized place name with the country qualifier the geocoder expects."""
+    return f"{place},{GEOCODE_COUNTRY}" if GEOCODE_COUNTRY else place
+
+
+async def _geocode(place: str, api_key: str):
+    async with upstream("weather"):
+        response = await get_with_retries(
+            GEOCODE_URL, params={"q": geocoder_query(place), "limit": 1, "appid": api_key}
+        )
+    response.raise_for_status()
+    data = response.json()
+    if not data:
+        # Unknown places are not cached
+        return None
+    place = data[0]
+    return {"name": place.get("name"), "state": place.get("state"), "lat": place["lat"], "lon": place["lon"]}
+
+
+async def resolve_location(text: str, api_key: str) -> CanonicalLocation:
+    """
+    Maps a free-form location ("Kharagpur", "kharagpur, West Bengal",
+    "22.34,87.23") to the grid cell it falls into. Place names are geocoded
+    once and cached; coordinates need no upstream call at all.
+
+    Raises:
+        LookupError: if the place name cannot be geocoded.
+    """
+    coordinates = parse_coordinates(text)
+    if coordinates is not None:
+        return snap_to_grid(*coordinates)
+
+    # The country-less name is only the cache key; the geocoder gets it qualified
+    key = normalize_place_name(text)
+    if not key:
+        raise LookupError("Please provide a location name or 'lat,lon' coordinates.")
+    place = await geocode_cache.get_or_fetch(key, lambda: _geocode(key, api_key))
+    if place is None:
+        raise LookupError(f"Could not find a location named '{text}'.")
+    cell = snap_to_grid(place["lat"], place["lon"])
+    return CanonicalLocation(key=cell.key, lat=cell.lat, lon=cell.lon, name=place["name"])
+
+
+class LocationDemand:
+    """
+    Request counts per canonical location with exponential decay, used to
+    pick the hot locations whose forecasts are prefetched.
+    """
+
+    def __init__(self, max_tracked: int = 1000):
+        self.max_tracked = max_tracked
+        self._counts = {}  # key -> [score, CanonicalLocation]
+        self._lock = threading.Lock()
+
+    def record(self, location: CanonicalLocation):
+        with self._lock:
+            entry = self._counts.setdefault(location.key, [0.0, location])
+            entry[0] += 1
+            if location.name and not entry[1].name:
+                entry[1] = location
+            if len(self._counts) > self.max_tracked:
+                coldest = min(self._counts, key=lambda key: self._counts[key][0])
+                self._counts.pop(coldest)
+
+    def hottest(self, n: int) -> list:
+        with self._lock:
+            ranked = sorted(self._counts.values(), key=lambda entry: entry[0], reverse=True)
+        return [location for _, location in ranked[:n]]
+
+    def decay(self, factor: float = 0.5):
+        with self._lock:
+            for key in list(self._counts):
+                self._counts[key][0] *= factor
+                if self._counts[key][0] < 0.01:
+                    self._counts.pop(key)
+
+    def snapshot(self, n: int = 10) -> list:
+        with self._lock:
+            ranked = sorted(self._counts.items(), key=lambda item: item[1][0], reverse=True)
+        return [
+            {"key": key, "name": location.name, "score": round(score, 2)}
+            for key, (score, location) in ranked[:n]
+        ]
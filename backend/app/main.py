@@ -1,10 +1,15 @@
 # backend/app/main.py
-from email.mime import image
 import os
+import json
+import math
+import time
+import asyncio
 import logging
 import base64
 from fastapi import FastAPI, Form, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
@@ -13,15 +18,30 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.agents import AgentExecutor, create_tool_calling_agent
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage
-from langchain_community.chat_message_histories import ChatMessageHistory
+from .history import create_history_store, to_agent_messages, summarize_overflow, HISTORY_SUMMARIZE
 from dotenv import load_dotenv
 load_dotenv()
 
 # Import both tools
-from .tools import crop_info_tool, weather_tool, market_info_tool, crop_disease_classifier
+from .tools import crop_info_tool, weather_tool, market_info_tool, crop_disease_classifier, soil_info_tool, classifier_resource, query_embeddings
+from .tools import weather_cache, market_cache, classification_cache, market_store, CLASSIFIER_MODEL_ID
+from .tools import geocode_cache, location_demand, prefetch_weather_periodically, WEATHER_PREFETCH_ENABLED, SOIL_INFO_ENABLED
+from .locations import normalize_place_name
+from .market_store import MARKET_INGEST_ENABLED, ingest_periodically
+from .semantic_cache import SemanticCache, SEMANTIC_CACHE_ENABLED, is_cacheable
+from .lazy import readiness, all_ready, start_background_warm_up
+from .limits import offload, RateLimited
+from .admission import admission, request_priority, Overloaded, GeminiThrottle
+from .http_client import aclose_async_client
+from .tool_runner import ParallelAgentExecutor, track_tool_runs
+from .token_budget import TokenUsageHandler, token_stats
+from .router import try_fast_path, router_stats
+from .batch_classify import read_uploads, classify_stream, ndjson_lines, BatchTooLarge
+from .metrics import configure_logging, RequestMetricsMiddleware, CallbackGauge, UPLOAD_BYTES, current_trace_id, render_metrics
 
 # --- Basic App Setup ---
-logging.basicConfig(level=logging.INFO)
+# Every log line carries the request's trace id (LOG_FORMAT=json for structured output)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
@@ -35,7 +55,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
+# Trace id per request (X-Trace-Id response header) and request latency histogram
+app.add_middleware(RequestMetricsMiddleware)
 
 # --- API Keys and Model/Pipeline Clients ---
 # Set your Google API key (replace with your actual key)
@@ -50,11 +73,17 @@ except Exception as e:
     logger.error(f"Failed to initialize ChatGoogleGenerativeAI LLM: {e}")
     llm = None
 
+# SoilInfo is described to the agent only when the tool is offered (soil table built)
+SOIL_INFO_TOOLKIT = """- **SoilInfo**:
+  - Description: Returns the average soil nitrogen, phosphorous, potassium and pH measured in a district. Use it instead of CropInfoRetriever whenever the question needs a district's soil data.
+  - Input: `{{\"district\": \"The district name\"}}`
+
+"""
+
 # --- CORRECTED PROMPT ---
 # This new system prompt is more direct and forceful, which helps the agent
 # make the correct decision when it sees the long base64 image string.
-prompt = ChatPromptTemplate.from_messages([
-    ("system", """
+SYSTEM_PROMPT = """
 You are an expert agricultural assistant bot. Your primary purpose is to provide comprehensive, data-driven, and actionable advice to farmers by strategically using a set of available tools.
 
 # TOOLKIT DEFINITION
@@ -62,6 +91,7 @@ You are an expert agricultural assistant bot. Your primary purpose is to provide
 - **CropInfoRetriever**:
   - Description: Provides detailed information on crop cultivation, farming techniques, pest and disease management (excluding image-based diagnosis), and general agricultural practices.
   - Input: `{{\"query\": \"The user's question about a specific crop or farming technique\"}}`
+  - Optional fields: `\"k\"` (number of passages, default 3), `\"mmr\": true` (more varied passages), `\"filter\": {{\"kind\": \"soil\", \"district\": \"District name\"}}` (only soil data for that district).
 
 - **WeatherInfo**:
   - Description: Retrieves current and forecasted weather conditions for a specific location. It is currently Monday, August 18, 2025. The user is in Kharagpur, West Bengal, India.
@@ -71,7 +101,7 @@ You are an expert agricultural assistant bot. Your primary purpose is to provide
   - Description: Fetches the latest market prices of agricultural commodities.
   - Input: `{{\"commodity\": \"The name of the crop or agricultural product\", \"location\": \"The state or district for market prices\"}}`
 
-- **crop_disease_classifier**:
+""" + (SOIL_INFO_TOOLKIT if SOIL_INFO_ENABLED else "") + """- **crop_disease_classifier**:
   - Description: Analyzes an input image to identify a potential crop disease. This tool MUST be used first if an image is provided.
   - Input: `{{\"image_path\": \"The path or reference to the user's image\"}}`
 
@@ -84,6 +114,7 @@ You are an expert agricultural assistant bot. Your primary purpose is to provide
 2.  **Analyze and Plan**:
     - **Thought**: Carefully break down the user's request. Identify the core questions and the entities involved (e.g., crop names, locations).
     - **Plan**: Formulate a step-by-step plan of which tools to use in what order. This plan is for your internal reasoning only.
+    - **Parallel calls**: When several tool calls do not depend on each other's results (e.g., weather, market prices and crop information for the same question), request them together in the same step so they run at the same time.
 
 3.  **Execute and Synthesize**:
     - **Crucially, you MUST continue executing your plan step-by-step until you have gathered all the information required to provide a complete and definitive answer to the user's query.** Do not stop after one step.
@@ -97,7 +128,31 @@ You are an expert agricultural assistant bot. Your primary purpose is to provide
     - **If the user's question is outside the scope of your tools** (e.g., it's a general greeting, a philosophical question, or unrelated to agriculture), answer it conversationally using your own knowledge without attempting to use any tools.
 
 Your ultimate goal is to provide a complete, final answer in a single response after using the tools.
-"""),
+"""
+
+# The same rules without the toolkit section: tool names, descriptions and
+# input schemas already reach Gemini through the tool declarations, so this
+# saves several hundred input tokens on every agent step.
+COMPACT_RULES = [
+    "If the user provides an image, call `crop_disease_classifier` first.",
+    "If the user query is not in English, you MUST respond in the same language.",
+    "Plan internally which tools you need. Request independent tool calls (e.g., weather, market prices and crop information for the same question) together in the same step so they run at the same time.",
+    *(["For a district's soil nutrients or pH use SoilInfo, not CropInfoRetriever."] if SOIL_INFO_ENABLED else []),
+    "The user is in Kharagpur, West Bengal, India, unless they say otherwise.",
+    "Keep calling tools until you have everything needed, then give one complete, well-structured Final Answer that synthesizes the results. Never show your plan.",
+    "If a tool fails or returns no relevant data, say that the data could not be retrieved and give general expert advice, stating that it is based on general principles rather than real-time data.",
+    "Answer greetings and questions unrelated to agriculture conversationally, without tools.",
+]
+COMPACT_SYSTEM_PROMPT = (
+    "\nYou are an expert agricultural assistant bot giving farmers data-driven, actionable advice using your tools.\n\nRules:\n"
+    + "".join(f"{number}. {rule}\n" for number, rule in enumerate(COMPACT_RULES, start=1))
+)
+
+# AGENT_PROMPT_STYLE=full restores the original prompt with the toolkit section.
+AGENT_PROMPT_STYLE = os.getenv("AGENT_PROMPT_STYLE", "compact").lower()
+
+prompt = ChatPromptTemplate.from_messages([
+    ("system", SYSTEM_PROMPT if AGENT_PROMPT_STYLE == "full" else COMPACT_SYSTEM_PROMPT),
     MessagesPlaceholder(variable_name="chat_history"),
     ("human", "{input}"),
     MessagesPlaceholder(variable_name="agent_scratchpad"),
@@ -105,45 +160,95 @@ Your ultimate goal is to provide a complete, final answer in a single response a
 
 # Add the new tool to the agent's toolkit
 tools = [crop_info_tool, weather_tool, market_info_tool, crop_disease_classifier]
+if SOIL_INFO_ENABLED:
+    tools.append(soil_info_tool)
 agent = create_tool_calling_agent(llm, tools, prompt)
 
-agent_executor = AgentExecutor(
+# Independent tool calls emitted in one model step run concurrently, each
+# with a timeout (TOOL_MAX_PARALLEL, TOOL_TIMEOUT_SECONDS).
+agent_executor = ParallelAgentExecutor(
     agent=agent,
     tools=tools,
-    verbose=True,
-    handle_parsing_errors=True
+    # Step-by-step agent output on stdout; the trace-id logs cover this in production
+    verbose=os.getenv("AGENT_VERBOSE", "false").lower() == "true",
+    handle_parsing_errors=True,
+    # Needed to know which tools produced an answer (semantic cache eligibility)
+    return_intermediate_steps=True
 )
 
-session_histories = {}
+# --- Session History ---
+# Bounded store (in-memory LRU or shared SQLite, see HISTORY_BACKEND); only the
+# newest turns within the history budget are sent to the agent.
+history_store = create_history_store()
 
-def get_session_history(session_id: str) -> ChatMessageHistory:
-    if session_id not in session_histories:
-        session_histories[session_id] = ChatMessageHistory()
-    return session_histories[session_id]
+async def get_agent_history(session_id: str) -> list:
+    history = await asyncio.to_thread(history_store.load, session_id)
+    return to_agent_messages(history)
 
 class ChatResponse(BaseModel):
     response: str
     session_id: str
+    cached: bool = False
+    # Route taken, tool timings, Gemini token usage and trace id of the run
+    metadata: Optional[dict] = None
+
+# --- Semantic Response Cache ---
+# Re-uses the MiniLM model already loaded for CropInfoRetriever. Enable with SEMANTIC_CACHE_ENABLED=true.
+semantic_cache = SemanticCache(query_embeddings) if SEMANTIC_CACHE_ENABLED else None
+
+def _cache_scope(location: Optional[str]) -> str:
+    # Answers depend on where the farmer is: only reuse them for the same place
+    return normalize_place_name(location) if location else ""
+
+async def _is_follow_up(session_id: str) -> bool:
+    # A follow-up ("what about wheat?") only makes sense within its own thread
+    history = await asyncio.to_thread(history_store.load, session_id)
+    return bool(history.turns or history.summary)
+
+async def lookup_cached_answer(
+    session_id: str, text: Optional[str], has_image: bool, location: Optional[str], use_cache: bool
+) -> Optional[str]:
+    if semantic_cache is None or not use_cache or has_image or not text:
+        return None
+    try:
+        if await _is_follow_up(session_id):
+            return None
+        hit = await offload("faiss", semantic_cache.lookup, text, _cache_scope(location))
+    except Exception as e:
+        logger.warning(f"Semantic cache lookup failed: {e}")
+        return None
+    if hit is None:
+        return None
+    answer, similarity = hit
+    logger.info(f"Semantic cache hit (similarity={similarity:.3f}) for '{text}'")
+    return answer
+
+async def remember_answer(
+    session_id: str, text: Optional[str], has_image: bool, location: Optional[str], use_cache: bool,
+    tools_used: list, answer: str, follow_up: bool,
+):
+    if semantic_cache is None or not use_cache or follow_up or not text or not is_cacheable(has_image, tools_used):
+        return
+    try:
+        await offload("faiss", semantic_cache.store, text, answer, _cache_scope(location))
+    except Exception as e:
+        logger.warning(f"Semantic cache store failed: {e}")
 from fastapi.staticfiles import StaticFiles
-import uuid
+from .uploads import UPLOAD_DIR, UPLOAD_PRUNE_INTERVAL_SECONDS, save_upload, prune_uploads, UploadTooLarge, InvalidImage
 
 # --- Mount static folder for serving uploaded images ---
-UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(
-    session_id: str = Form(...),
-    text: Optional[str] = Form(None),
-    image: Optional[UploadFile] = File(None),
-    location: Optional[str] = Form(None) 
-):
-    if not llm:
-        raise HTTPException(status_code=503, detail="LLM service is not available.")
-
-    logger.info(f"Received request for session {session_id}: text={bool(text)}, image={bool(image)}")
+async def build_user_input(text: Optional[str], image: Optional[UploadFile], location: Optional[str]) -> tuple:
+    """
+    Assembles the agent input from the form fields, saving any uploaded image
+    to UPLOAD_DIR and referencing it by URL.
 
+    Returns:
+        tuple: (agent input, URL of the stored image or None)
+    """
+    image_url = None
     user_input_parts = []
     today_str = datetime.now().strftime('%Y-%m-%d')
     user_input_parts.append(f"Today's date: {today_str}")
@@ -154,16 +259,19 @@ async def chat_endpoint(
         user_input_parts.append(f"\nUser's location: {location}")
     
     if image:
-        # Save uploaded image to disk
-        file_ext = os.path.splitext(image.filename)[1] or ".png"
-        file_name = f"{uuid.uuid4()}{file_ext}"
-        file_path = os.path.join(UPLOAD_DIR, file_name)
+        # Stream the upload to disk and keep a 224px classifier-ready copy in memory
+        try:
+            stored = await save_upload(image)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except InvalidImage as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        with open(file_path, "wb") as f:
-            f.write(await image.read())
+        UPLOAD_BYTES.observe(stored.size_bytes)
+        logger.info(f"Stored upload {stored.url} ({stored.size_bytes} bytes)", extra={"stage": "upload", "bytes": stored.size_bytes})
 
         # Generate public URL (served by FastAPI static mount)
-        image_url = f"/uploads/{file_name}"
+        image_url = stored.url
 
         # Append URL instead of base64
         user_input_parts.append(f"\n[Image available at: {image_url}]")
@@ -172,42 +280,399 @@ async def chat_endpoint(
     if not user_input_parts:
         raise HTTPException(status_code=400, detail="No input provided. Please send text or an image.")
 
-    user_input = "\n".join(user_input_parts)
-    ...
+    logger.debug(f"Agent input parts: {user_input_parts}")
+    return "\n".join(user_input_parts), image_url
+
+# The event loop keeps only weak references to tasks: hold them until they finish
+_background_tasks = set()
+
+def run_in_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def record_turn(session_id: str, text: Optional[str], ai_response: str):
+    # Keep the history clean by not storing the long base64 string
+    history_message = text if text else "Sent an image for analysis."
+    await asyncio.to_thread(history_store.append, session_id, history_message, ai_response)
+    if HISTORY_SUMMARIZE and llm:
+        # Fold turns beyond the agent's window into a running summary, off the request path
+        run_in_background(summarize_overflow(history_store, session_id, llm))
+
+def record_token_usage(session_id: str, usage: TokenUsageHandler) -> dict:
+    """Adds one request's Gemini token counts to the totals and logs them per step."""
+    summary = usage.summary()
+    token_stats.record(summary)
+    logger.info(
+        f"Tokens for session {session_id}: in={summary['input_tokens']} out={summary['output_tokens']} "
+        f"per step={[step['input_tokens'] for step in summary['steps']]}"
+    )
+    return summary
+
+async def admit(text: Optional[str], has_image: bool):
+    """Waits for an agent slot, or raises a 503 with Retry-After when the queue is saturated."""
+    try:
+        return await admission.acquire(request_priority(text, has_image))
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(
+    session_id: str = Form(...),
+    text: Optional[str] = Form(None),
+    image: Optional[UploadFile] = File(None),
+    location: Optional[str] = Form(None),
+    use_cache: bool = Form(True)
+):
+    if not llm:
+        raise HTTPException(status_code=503, detail="LLM service is not available.")
 
+    logger.info(f"Received request for session {session_id}: text={bool(text)}, image={bool(image)}")
+
+    cached_answer = await lookup_cached_answer(session_id, text, bool(image), location, use_cache)
+    if cached_answer is not None:
+        await record_turn(session_id, text, cached_answer)
+        return ChatResponse(response=cached_answer, session_id=session_id, cached=True)
+
+    user_input, image_url = await build_user_input(text, image, location)
+
+    # Single-tool intents (image only, plain weather question) skip the agent
+    fast = await try_fast_path(text, image_url, location)
+    if fast is not None:
+        fast_answer, metadata = fast
+        await record_turn(session_id, text, fast_answer)
+        metadata["trace_id"] = current_trace_id()
+        return ChatResponse(response=fast_answer, session_id=session_id, metadata=metadata)
+
+    # Bound concurrent agent runs so a traffic spike can't flood Gemini: excess
+    # requests queue briefly, then get a 503 with Retry-After.
+    ticket = await admit(text, bool(image))
     try:
-        chat_history = get_session_history(session_id)
-        print("DEBUG - Final user_input_parts:/", user_input_parts)
-        response = agent_executor.invoke({
+        started = time.perf_counter()
+        chat_history = await get_agent_history(session_id)
+        tracker = track_tool_runs()
+        usage = TokenUsageHandler()
+        response = await agent_executor.ainvoke({
             "input": user_input,
-            "chat_history": chat_history.messages
-        })
+            "chat_history": chat_history
+        }, config={"callbacks": [usage, GeminiThrottle()]})
 
         ai_response = response.get("output", "I'm sorry, I encountered an issue and can't respond right now.")
 
-        # Keep the history clean by not storing the long base64 string
-        history_message = text if text else "Sent an image for analysis."
-        chat_history.add_user_message(history_message)
-        chat_history.add_ai_message(ai_response)
-
+        await record_turn(session_id, text, ai_response)
+        tools_used = [action.tool for action, _ in response.get("intermediate_steps", [])]
+        await remember_answer(
+            session_id, text, bool(image), location, use_cache, tools_used, ai_response, follow_up=bool(chat_history)
+        )
+        router_stats.record_agent((time.perf_counter() - started) * 1000, tools_used)
+
+        metadata = tracker.summary()
+        metadata["route"] = "agent"
+        metadata["tokens"] = record_token_usage(session_id, usage)
+        metadata["trace_id"] = current_trace_id()
         logger.info(f"Agent response for session {session_id}: '{ai_response}'")
-        return ChatResponse(response=ai_response, session_id=session_id)
-
+        logger.info(
+            f"Tool time for session {session_id}: wall={metadata['tool_wall_ms']}ms, "
+            f"sum={metadata['tool_sum_ms']}ms over {len(metadata['tool_calls'])} calls"
+        )
+        return ChatResponse(response=ai_response, session_id=session_id, metadata=metadata)
+
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
     except Exception as e:
         logger.exception(f"Error processing chat for session {session_id}")
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
+    finally:
+        ticket.release()
+
+def sse_event(event: str, data: dict) -> str:
+    """Formats one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _chunk_text(chunk) -> str:
+    # Gemini chunks carry either a plain string or a list of content parts.
+    content = getattr(chunk, "content", "")
+    if isinstance(content, list):
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return content or ""
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(
+    session_id: str = Form(...),
+    text: Optional[str] = Form(None),
+    image: Optional[UploadFile] = File(None),
+    location: Optional[str] = Form(None),
+    use_cache: bool = Form(True)
+):
+    """
+    Same contract as /chat, but streams agent progress as Server-Sent Events:
+    `tool_start` / `tool_end` for every tool call, `token` for partial text of
+    the final answer (released once its model call turns out not to be a tool
+    step), and a final `done` (or `error`) event carrying the full response.
+    """
+    if not llm:
+        raise HTTPException(status_code=503, detail="LLM service is not available.")
+
+    logger.info(f"Received streaming request for session {session_id}: text={bool(text)}, image={bool(image)}")
+
+    cached_answer = await lookup_cached_answer(session_id, text, bool(image), location, use_cache)
+    if cached_answer is not None:
+        await record_turn(session_id, text, cached_answer)
+
+        async def cached_event():
+            yield sse_event("done", {"response": cached_answer, "session_id": session_id, "cached": True})
+
+        return StreamingResponse(cached_event(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    # The upload must be consumed before the response starts streaming.
+    user_input, image_url = await build_user_input(text, image, location)
+
+    fast = await try_fast_path(text, image_url, location)
+    if fast is not None:
+        fast_answer, metadata = fast
+        await record_turn(session_id, text, fast_answer)
+        metadata["trace_id"] = current_trace_id()
+
+        async def fast_event():
+            yield sse_event("done", {"response": fast_answer, "session_id": session_id, "metadata": metadata})
+
+        return StreamingResponse(fast_event(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    # Admitted before the response starts, so a saturated server answers 503
+    # rather than an open stream that stalls.
+    ticket = await admit(text, bool(image))
+    started = time.perf_counter()
+    try:
+        chat_history = await get_agent_history(session_id)
+    except Exception:
+        ticket.release()
+        raise
+
+    async def event_generator():
+        ai_response = None
+        tools_used = []
+        tracker = track_tool_runs()
+        usage = TokenUsageHandler()
+        pending = {}  # model run id -> buffered answer tokens, or None for a tool-calling step
+        try:
+            async for event in agent_executor.astream_events(
+                {"input": user_input, "chat_history": chat_history},
+                config={"callbacks": [usage, GeminiThrottle()]},
+                version="v2",
+            ):
+                kind = event["event"]
+                if kind == "on_tool_start":
+                    tools_used.append(event["name"])
+                    yield sse_event("tool_start", {
+                        "tool": event["name"],
+                        "input": event["data"].get("input"),
+                    })
+                elif kind == "on_tool_end":
+                    yield sse_event("tool_end", {"tool": event["name"]})
+                elif kind == "on_chat_model_stream":
+                    # Held per model call until it is known not to be a tool-calling
+                    # step, so intermediate reasoning never reaches the client.
+                    chunk = event["data"]["chunk"]
+                    buffered = pending.setdefault(event["run_id"], [])
+                    if getattr(chunk, "tool_call_chunks", None):
+                        pending[event["run_id"]] = None
+                    elif buffered is not None:
+                        token = _chunk_text(chunk)
+                        if token:
+                            buffered.append(token)
+                elif kind == "on_chat_model_end":
+                    buffered = pending.pop(event["run_id"], None)
+                    output = event["data"].get("output")
+                    if buffered and not getattr(output, "tool_calls", None):
+                        for token in buffered:
+                            yield sse_event("token", {"text": token})
+                elif kind == "on_chain_end" and event["name"] == agent_executor.get_name():
+                    output = event["data"].get("output") or {}
+                    ai_response = output.get("output")
+
+            if not ai_response:
+                ai_response = "I'm sorry, I encountered an issue and can't respond right now."
+
+            await record_turn(session_id, text, ai_response)
+            await remember_answer(
+                session_id, text, bool(image), location, use_cache, tools_used, ai_response, follow_up=bool(chat_history)
+            )
+            router_stats.record_agent((time.perf_counter() - started) * 1000, tools_used)
+
+            logger.info(f"Agent response for session {session_id}: '{ai_response}'")
+            metadata = tracker.summary()
+            metadata["route"] = "agent"
+            metadata["tokens"] = record_token_usage(session_id, usage)
+            metadata["trace_id"] = current_trace_id()
+            yield sse_event("done", {"response": ai_response, "session_id": session_id, "metadata": metadata})
+
+        except RateLimited as e:
+            yield sse_event("error", {"detail": str(e), "retry_after": math.ceil(e.retry_after)})
+        except Exception as e:
+            logger.exception(f"Error streaming chat for session {session_id}")
+            yield sse_event("error", {"detail": f"An internal error occurred: {str(e)}"})
+        finally:
+            ticket.release()
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Frees the slot even if the client disconnects before the stream starts
+        background=BackgroundTask(ticket.release),
+    )
+
+@app.post("/classify/batch")
+async def classify_batch_endpoint(
+    images: Optional[List[UploadFile]] = File(None),
+    archive: Optional[UploadFile] = File(None),
+    top_k: int = Form(3),
+):
+    """
+    Classifies a field survey in one call, without the agent: many `images`
+    and/or a zip `archive` of photos. Streams NDJSON, one line per image
+    (`label`, `score`, `top_k`) as results complete, then a `summary` line
+    with the disease counts for the field.
+    """
+    try:
+        items = await read_uploads(images, archive)
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not items:
+        raise HTTPException(status_code=400, detail="No images provided. Send `images` files or a zip `archive`.")
+
+    engine = await classifier_resource.aget()
+    results = classify_stream(items, engine, top_k, cache=classification_cache, model_id=CLASSIFIER_MODEL_ID)
+    return StreamingResponse(ndjson_lines(results), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
+# Load the embedding model, FAISS index and classifier in the background right
+# after startup, so the server accepts traffic immediately. Disable with MODEL_WARMUP=false.
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+
+@app.on_event("startup")
+async def warm_up_models():
+    if MODEL_WARMUP:
+        start_background_warm_up()
+
+async def _prune_uploads_periodically():
+    while True:
+        try:
+            await asyncio.to_thread(prune_uploads)
+        except Exception as e:
+            logger.warning(f"Upload retention run failed: {e}")
+        await asyncio.sleep(UPLOAD_PRUNE_INTERVAL_SECONDS)
+
+@app.on_event("startup")
+async def start_upload_retention():
+    run_in_background(_prune_uploads_periodically())
+
+@app.on_event("startup")
+async def start_weather_prefetch():
+    if WEATHER_PREFETCH_ENABLED:
+        run_in_background(prefetch_weather_periodically())
+
+@app.on_event("startup")
+async def start_market_ingestion():
+    # Keeps the local price table behind MarketInfo current. Disabled by default;
+    # enable with MARKET_INGEST_ENABLED=true or run `python -m app.market_store ingest` from cron.
+    if MARKET_INGEST_ENABLED:
+        run_in_background(ingest_periodically(market_store))
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await aclose_async_client()
 
 @app.get("/health")
 def health_check():
     return {
         "status": "active",
         "llm_model": "gemini-2.0-flash" if llm else "unavailable",
-        "tools": [tool.name for tool in tools]
+        "tools": [tool.name for tool in tools],
+        "ready": all_ready(),
+        "models": readiness()
+    }
+
+@app.get("/classifier/stats")
+def classifier_stats():
+    """Throughput and latency counters of the batched disease classifier."""
+    engine = classifier_resource.peek()
+    if engine is None:
+        return {"state": classifier_resource.state}
+    return engine.get_stats()
+
+# --- Metrics ---
+# Cache counters are read from the caches themselves at scrape time.
+def _cache_stats() -> dict:
+    stats = {
+        "weather": weather_cache.get_stats(),
+        "geocode": geocode_cache.get_stats(),
+        "market": market_cache.get_stats(),
+        "classification": classification_cache.get_stats(),
+        "query_embeddings": query_embeddings.get_stats(),
+    }
+    if semantic_cache:
+        semantic = semantic_cache.get_stats()
+        stats["semantic"] = {"hit_ratio": semantic["hit_rate"]}
+    return stats
+
+CallbackGauge(
+    "agri_cache_hit_ratio", "Share of lookups served from cache, per cache.",
+    lambda: {(name,): stats["hit_ratio"] for name, stats in _cache_stats().items()}, ("cache",),
+)
+CallbackGauge(
+    "agri_cache_entries", "Entries held in memory, per cache.",
+    lambda: {(name,): stats.get("memory_entries", stats.get("cached")) for name, stats in _cache_stats().items()}, ("cache",),
+)
+CallbackGauge("agri_router_routed_fraction", "Share of agent-eligible requests answered on the fast path.",
+              lambda: router_stats.get_stats()["routed_fraction"])
+CallbackGauge(
+    "agri_router_saved_ms_total", "Estimated latency saved by the fast path, per intent.",
+    lambda: {(intent,): s["saved_ms_total"] for intent, s in router_stats.get_stats()["by_intent"].items()}, ("intent",),
+)
+CallbackGauge("agri_agent_requests", "Agent runs completed since startup.", lambda: token_stats.get_stats()["requests"])
+CallbackGauge("agri_agent_steps", "Gemini calls made by agent runs since startup.", lambda: token_stats.get_stats()["steps"])
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus text format: request, Gemini step and tool latency histograms,
+    token counters, cache hit ratios and upload sizes.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admission/stats")
+def admission_statistics():
+    """Agent slots in use, queued requests per priority, and the service-time estimate behind Retry-After."""
+    return admission.get_stats()
+
+@app.get("/router/stats")
+def router_statistics():
+    """Share of requests answered on the fast path and the latency it saved."""
+    return router_stats.get_stats()
+
+@app.get("/tokens/stats")
+def tokens_stats():
+    """Gemini input/output tokens per request and per agent step since startup."""
+    return {"prompt_style": AGENT_PROMPT_STYLE, **token_stats.get_stats()}
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit/miss counters of the tool caches and the semantic response cache."""
+    return {
+        "weather": weather_cache.get_stats(),
+        "geocode": geocode_cache.get_stats(),
+        "hot_locations": location_demand.snapshot(),
+        "market": market_cache.get_stats(),
+        "market_store": market_store.get_stats(),
+        "semantic": semantic_cache.get_stats() if semantic_cache else {"enabled": False},
+        "history": history_store.stats(),
+        "classification": classification_cache.get_stats(),
+        "query_embeddings": query_embeddings.get_stats(),
     }
 
 if __name__ == "__main__":
     import uvicorn
-    if os.getenv("GOOGLE_API_KEY") is None or "YOUR_GOOGLE_API_KEY_HERE" in os.getenv("GOOGLE_API_KEY", ""):
-        print("WARNING: GOOGLE_API_KEY is not set correctly.")
-    
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
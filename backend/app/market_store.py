@@ -0,0 +1,313 @@
+# backend/app/market_store.py
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+import statistics
+import threading
+from datetime import datetime, timedelta
+
+from .http_client import get_with_retries
+from .limits import upstream
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+MARKET_API_KEY = os.getenv("DATA_GOV_IN_API_KEY", "579b464db66ec23bdd000001798dfe5b454546066ddae0d79944e04d")
+# Point this at a local stand-in (see benchmarks/mock_data_gov.py) to exercise the ingest offline.
+MARKET_DATA_URL = os.getenv("MARKET_DATA_URL", "https://api.data.gov.in/resource/9ef84268-d588-465a-a308-a864a43d0070")
+MARKET_DB_PATH = os.getenv("MARKET_DB_PATH", "market.db")
+MARKET_INGEST_PAGE_SIZE = int(os.getenv("MARKET_INGEST_PAGE_SIZE", "1000"))
+# Pages in flight during an ingest. Each one holds a single token of the shared
+# data.gov.in budget, so live MarketInfo calls queue behind at most this many.
+MARKET_INGEST_CONCURRENCY = int(os.getenv("MARKET_INGEST_CONCURRENCY", "2"))
+# Run the ingest on a schedule inside the API process (off by default; it can
+# also be run from cron with `python -m app.market_store ingest`).
+MARKET_INGEST_ENABLED = os.getenv("MARKET_INGEST_ENABLED", "false").lower() == "true"
+MARKET_INGEST_INTERVAL_SECONDS = float(os.getenv("MARKET_INGEST_INTERVAL_SECONDS", "21600"))  # 6 hours
+# Days of prices kept for trends; older rows are dropped after each ingest.
+MARKET_RETENTION_DAYS = int(os.getenv("MARKET_RETENTION_DAYS", "30"))
+# The table is trusted for answers only if the last successful ingest is this recent.
+MARKET_STORE_MAX_AGE_SECONDS = float(os.getenv("MARKET_STORE_MAX_AGE_SECONDS", "86400"))
+
+FILTER_COLUMNS = ("commodity", "state", "district", "market")
+SORTS = {
+    "price_asc": "modal_price ASC",
+    "price_desc": "modal_price DESC",
+    "market": "market ASC",
+}
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_iso_date(value: str):
+    # data.gov.in reports arrival dates as dd/mm/yyyy
+    try:
+        return datetime.strptime(value, "%d/%m/%Y").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_record(record: dict):
+    """Maps one API record to a table row, or None if it lacks a date or price."""
+    arrival_date = _to_iso_date(record.get("arrival_date"))
+    modal_price = _to_float(record.get("modal_price"))
+    if arrival_date is None or modal_price is None:
+        return None
+    return (
+        arrival_date,
+        (record.get("state") or "").strip(),
+        (record.get("district") or "").strip(),
+        (record.get("market") or "").strip(),
+        (record.get("commodity") or "").strip(),
+        (record.get("variety") or "").strip(),
+        (record.get("grade") or "").strip(),
+        _to_float(record.get("min_price")),
+        _to_float(record.get("max_price")),
+        modal_price,
+    )
+
+
+class MarketStore:
+    """
+    Local SQLite table of daily mandi prices, filled by `ingest` and queried
+    by the MarketInfo tool. Text columns compare case-insensitively and are
+    indexed for the filters the tool uses (commodity/state/district/market by date).
+    """
+
+    def __init__(self, path: str = MARKET_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS prices ("
+            " arrival_date TEXT NOT NULL,"
+            " state TEXT NOT NULL COLLATE NOCASE,"
+            " district TEXT NOT NULL COLLATE NOCASE,"
+            " market TEXT NOT NULL COLLATE NOCASE,"
+            " commodity TEXT NOT NULL COLLATE NOCASE,"
+            " variety TEXT NOT NULL COLLATE NOCASE,"
+            " grade TEXT NOT NULL COLLATE NOCASE,"
+            " min_price REAL, max_price REAL, modal_price REAL NOT NULL,"
+            " PRIMARY KEY (commodity, state, district, market, variety, grade, arrival_date))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS prices_state ON prices (state, district, arrival_date)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS prices_market ON prices (market, arrival_date)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS prices_date ON prices (arrival_date)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_runs ("
+            " started_at REAL NOT NULL, finished_at REAL, pages INTEGER, records INTEGER, status TEXT)"
+        )
+
+    def upsert(self, rows: list) -> int:
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany("INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def purge_older_than(self, days: int = MARKET_RETENTION_DAYS) -> int:
+        cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        with self._lock:
+            return self._conn.execute("DELETE FROM prices WHERE arrival_date < ?", (cutoff,)).rowcount
+
+    def record_run(self, started_at: float, pages: int, records: int, status: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ingest_runs VALUES (?, ?, ?, ?, ?)", (started_at, time.time(), pages, records, status)
+            )
+
+    def last_success(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(finished_at) FROM ingest_runs WHERE status = 'ok'"
+            ).fetchone()
+        return row[0] if row else None
+
+    def is_fresh(self, max_age_seconds: float = MARKET_STORE_MAX_AGE_SECONDS) -> bool:
+        last = self.last_success()
+        return last is not None and time.time() - last <= max_age_seconds
+
+    def _where(self, filters: dict) -> tuple:
+        clauses, args = [], []
+        for column in FILTER_COLUMNS:
+            value = filters.get(column)
+            if value:
+                clauses.append(f"{column} = ?")
+                args.append(str(value).strip())
+        return (" AND ".join(clauses) or "1"), args
+
+    def query(self, filters: dict, days: int = 7, sort: str = "price_desc", limit: int = 20) -> dict:
+        """
+        Answers a MarketInfo question from the table.
+
+        Returns:
+            dict: `latest_date`, a `summary` across mandis on that date
+            (min/max/modal prices), a per-day `trend` over the last `days`
+            days of data, and up to `limit` mandi `records` from the latest
+            date, or an empty dict if nothing matches.
+        """
+        where, args = self._where(filters)
+        order = SORTS.get(sort, SORTS["price_desc"])
+        with self._lock:
+            latest = self._conn.execute(f"SELECT MAX(arrival_date) FROM prices WHERE {where}", args).fetchone()[0]
+            if latest is None:
+                return {}
+            since = (datetime.strptime(latest, "%Y-%m-%d") - timedelta(days=max(days, 1) - 1)).strftime("%Y-%m-%d")
+            rows = self._conn.execute(
+                f"SELECT commodity, market, district, state, variety, min_price, max_price, modal_price"
+                f" FROM prices WHERE {where} AND arrival_date = ? ORDER BY {order}",
+                [*args, latest],
+            ).fetchall()
+            trend = self._conn.execute(
+                f"SELECT arrival_date, MIN(modal_price), MAX(modal_price), AVG(modal_price), COUNT(DISTINCT market)"
+                f" FROM prices WHERE {where} AND arrival_date >= ? GROUP BY arrival_date ORDER BY arrival_date",
+                [*args, since],
+            ).fetchall()
+
+        modal_prices = [row[7] for row in rows]
+        return {
+            "latest_date": latest,
+            "summary": {
+                "mandis": len({row[1] for row in rows}),
+                "min_price": min((row[5] for row in rows if row[5] is not None), default=None),
+                "max_price": max((row[6] for row in rows if row[6] is not None), default=None),
+                "modal_price_min": min(modal_prices),
+                "modal_price_max": max(modal_prices),
+                "modal_price_median": statistics.median(modal_prices),
+            },
+            "trend": [
+                {"date": date, "modal_min": lo, "modal_max": hi, "modal_avg": round(avg, 1), "mandis": count}
+                for date, lo, hi, avg, count in trend
+            ],
+            "records": [
+                {
+                    "commodity": commodity,
+                    "mandi": market,
+                    "district": district,
+                    "state": state,
+                    "variety": variety,
+                    "min_price": min_price,
+                    "max_price": max_price,
+                    "modal_price": modal_price,
+                }
+                for commodity, market, district, state, variety, min_price, max_price, modal_price in rows[:limit]
+            ],
+        }
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            rows, days, latest = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT arrival_date), MAX(arrival_date) FROM prices"
+            ).fetchone()
+        last = self.last_success()
+        return {
+            "rows": rows,
+            "days": days,
+            "latest_date": latest,
+            "last_ingest_age_seconds": round(time.time() - last) if last else None,
+        }
+
+
+async def _fetch_page(base_url: str, api_key: str, offset: int, page_size: int) -> dict:
+    params = {"format": "json", "api-key": api_key, "offset": offset, "limit": page_size}
+    # Ingest is a background job: wait for the shared data.gov.in budget rather than fail
+    async with upstream("market", max_wait=None):
+        response = await get_with_retries(base_url, params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+async def ingest(
+    store: MarketStore,
+    base_url: str = MARKET_DATA_URL,
+    api_key: str = MARKET_API_KEY,
+    page_size: int = MARKET_INGEST_PAGE_SIZE,
+    concurrency: int = MARKET_INGEST_CONCURRENCY,
+) -> dict:
+    """
+    Pages through the whole daily mandi-price dataset and upserts it into
+    `store`. The first page reports the total; the remaining pages are fetched
+    by `concurrency` workers, each taking the next offset only once its last
+    page is stored, so the ingest draws on the shared budget page by page
+    instead of reserving the whole run up front.
+
+    Returns:
+        dict: pages fetched, records stored and elapsed seconds.
+    """
+    started = time.time()
+    pages, stored = 0, 0
+    try:
+        first = await _fetch_page(base_url, api_key, 0, page_size)
+        total = int(first.get("total") or 0)
+        pages = 1
+        stored += await asyncio.to_thread(store.upsert, _rows(first))
+
+        offsets = iter(range(page_size, total, page_size))
+
+        async def worker() -> tuple:
+            fetched, count = 0, 0
+            for offset in offsets:
+                page = await _fetch_page(base_url, api_key, offset, page_size)
+                count += await asyncio.to_thread(store.upsert, _rows(page))
+                fetched += 1
+            return fetched, count
+
+        for fetched, count in await asyncio.gather(*(worker() for _ in range(max(1, concurrency)))):
+            pages += fetched
+            stored += count
+        purged = await asyncio.to_thread(store.purge_older_than)
+    except Exception:
+        await asyncio.to_thread(store.record_run, started, pages, stored, "failed")
+        raise
+
+    await asyncio.to_thread(store.record_run, started, pages, stored, "ok")
+    elapsed = time.time() - started
+    logger.info(f"Market ingest stored {stored} records from {pages} pages in {elapsed:.1f}s ({purged} expired rows removed).")
+    return {"pages": pages, "records": stored, "seconds": round(elapsed, 2)}
+
+
+def _rows(page: dict) -> list:
+    rows = (normalize_record(record) for record in page.get("records") or [])
+    return [row for row in rows if row is not None]
+
+
+async def ingest_periodically(store: MarketStore, interval_seconds: float = MARKET_INGEST_INTERVAL_SECONDS):
+    while True:
+        try:
+            await ingest(store)
+        except Exception as e:
+            logger.warning(f"Market ingest run failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Ingest the daily mandi-price dataset into the local market store.")
+    parser.add_argument("command", choices=["ingest", "stats"])
+    parser.add_argument("--base-url", default=MARKET_DATA_URL, help="API endpoint, e.g. a local stand-in.")
+    parser.add_argument("--db", default=MARKET_DB_PATH)
+    parser.add_argument("--page-size", type=int, default=MARKET_INGEST_PAGE_SIZE)
+    args = parser.parse_args()
+
+    async def run_ingest(store: MarketStore) -> dict:
+        from .http_client import aclose_async_client
+        try:
+            return await ingest(store, base_url=args.base_url, page_size=args.page_size)
+        finally:
+            await aclose_async_client()
+
+    market_store = MarketStore(args.db)
+    if args.command == "ingest":
+        print(asyncio.run(run_ingest(market_store)))
+    print(market_store.get_stats())
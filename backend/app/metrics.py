@@ -0,0 +1,253 @@
+# backend/app/metrics.py
+import os
+import json
+import math
+import time
+import uuid
+import logging
+import threading
+from contextvars import ContextVar
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# "text" (default) or "json": one JSON object per log line, with the trace id
+# and any `extra={...}` fields as keys.
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+SIZE_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 2 * 1024 ** 2, 5 * 1024 ** 2, 10 * 1024 ** 2)
+
+_REGISTRY = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Thread-safe histogram exported in the Prometheus text format: cumulative
+    `_bucket` counts per upper bound plus `_sum` and `_count`, per label set.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: {**value, "buckets": list(value["buckets"])} for key, value in self._series.items()}
+        for key, value in sorted(series.items()):
+            for bound, count in zip(self.buckets, value["buckets"]):
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {value['sum']:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {value['count']}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter per label set."""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class CallbackGauge:
+    """
+    Gauge read at scrape time from `read()`, which returns either a number or
+    a dict mapping label-value tuples to numbers. Used to export the counters
+    the caches and stores already keep, without double bookkeeping.
+    """
+
+    def __init__(self, name: str, documentation: str, read, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.read = read
+        _REGISTRY.append(self)
+
+    def render(self) -> list:
+        try:
+            values = self.read()
+        except Exception as e:
+            logger.warning(f"Metric {self.name} could not be read: {e}")
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(values.items()):
+            if value is not None:
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Pipeline metrics ---
+REQUEST_SECONDS = Histogram(
+    "agri_request_seconds", "HTTP request latency, until the last body byte is sent.", ("method", "path", "status")
+)
+LLM_STEP_SECONDS = Histogram(
+    "agri_llm_step_seconds", "Gemini call latency per agent step (step 1 is the first model call).", ("step", "status")
+)
+LLM_TOKENS = Counter("agri_llm_tokens_total", "Gemini tokens reported by the API.", ("direction",))
+TOOL_SECONDS = Histogram(
+    "agri_tool_seconds", "Tool call latency; status is ok, error or timeout.", ("tool", "status")
+)
+UPLOAD_BYTES = Histogram("agri_upload_bytes", "Size of uploaded images.", buckets=SIZE_BUCKETS)
+
+
+# --- Tracing ---
+_trace_id = ContextVar("trace_id", default="-")
+
+
+def start_trace(incoming: str = None) -> str:
+    """
+    Sets the trace id for the current request context: the caller's
+    X-Request-ID if it looks sane, otherwise a new random id. Every log line
+    written while handling the request carries it.
+    """
+    trace_id = incoming if incoming and len(incoming) <= 64 and incoming.isprintable() else uuid.uuid4().hex[:16]
+    _trace_id.set(trace_id)
+    return trace_id
+
+
+def current_trace_id() -> str:
+    return _trace_id.get()
+
+
+class TraceIdFilter(logging.Filter):
+    def filter(self, record):
+        record.trace_id = _trace_id.get()
+        return True
+
+
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "trace_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging():
+    """Root logging with the request trace id on every line (LOG_FORMAT, LOG_LEVEL)."""
+    handler = logging.StreamHandler()
+    handler.addFilter(TraceIdFilter())
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:[%(trace_id)s] %(message)s"))
+    # force: replace any root handler installed before this runs
+    logging.basicConfig(level=LOG_LEVEL, handlers=[handler], force=True)
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware that starts a trace per HTTP request, returns its id in
+    the X-Trace-Id header and records the request latency. Written as plain
+    ASGI so streamed (SSE) responses are timed until their last chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        trace_id = start_trace(headers.get(b"x-request-id", b"").decode("latin-1"))
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_trace(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", trace_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            elapsed = time.perf_counter() - started
+            # Route templates keep the label set bounded
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(elapsed, method=scope["method"], path=route, status=status)
+            logger.info(
+                f"{scope['method']} {route} -> {status} in {elapsed * 1000:.1f}ms",
+                extra={"stage": "request", "path": route, "status": status, "ms": round(elapsed * 1000, 1)},
+            )
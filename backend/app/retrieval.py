@@ -0,0 +1,137 @@
+# backend/app/retrieval.py
+import os
+import json
+import logging
+from dataclasses import dataclass, field, replace
+
+from .token_budget import relevant_window
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# Defaults for CropInfoRetriever; each can be overridden per call through the tool input.
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+# Minimum cosine similarity (0..1) for a chunk to be returned; 0 disables the cut-off.
+RETRIEVAL_SCORE_THRESHOLD = float(os.getenv("RETRIEVAL_SCORE_THRESHOLD", "0"))
+RETRIEVAL_MMR = os.getenv("RETRIEVAL_MMR", "false").lower() == "true"
+RETRIEVAL_MMR_LAMBDA = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.5"))
+RETRIEVAL_MAX_K = 20
+
+
+@dataclass
+class RetrievalOptions:
+    k: int = RETRIEVAL_K
+    score_threshold: float = RETRIEVAL_SCORE_THRESHOLD
+    mmr: bool = RETRIEVAL_MMR
+    fetch_k: int = RETRIEVAL_FETCH_K
+    lambda_mult: float = RETRIEVAL_MMR_LAMBDA
+    filter: dict = field(default_factory=dict)
+
+
+def parse_tool_input(raw: str) -> tuple:
+    """
+    Splits the CropInfoRetriever input into `(query, RetrievalOptions)`.
+
+    Plain text is used as the query with the default options. A JSON object may
+    carry `query` plus any of `k`, `score_threshold`, `mmr`, `fetch_k`,
+    `lambda_mult` and `filter`, e.g.
+    `{"query": "soil nitrogen", "k": 5, "filter": {"district": "Nadia"}}`.
+    """
+    options = RetrievalOptions()
+    text = (raw or "").strip()
+    if not text.startswith("{"):
+        return text, options
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError:
+        return text, options
+    if not isinstance(payload, dict):
+        return text, options
+
+    try:
+        options = replace(
+            options,
+            k=max(1, min(int(payload.get("k", options.k)), RETRIEVAL_MAX_K)),
+            score_threshold=float(payload.get("score_threshold", options.score_threshold)),
+            mmr=bool(payload.get("mmr", options.mmr)),
+            fetch_k=max(1, int(payload.get("fetch_k", options.fetch_k))),
+            lambda_mult=float(payload.get("lambda_mult", options.lambda_mult)),
+            filter=payload.get("filter") if isinstance(payload.get("filter"), dict) else {},
+        )
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring invalid retrieval options in tool input: {text}")
+    return str(payload.get("query", "")).strip(), options
+
+
+def doc_kind(metadata: dict) -> str:
+    """Soil-district chunks carry a `district` field; everything else is document text."""
+    return metadata.get("kind") or ("soil" if "district" in metadata else "document")
+
+
+def _matches(value, expected) -> bool:
+    if isinstance(expected, list):
+        return any(_matches(value, e) for e in expected)
+    if isinstance(value, str) and isinstance(expected, str):
+        return value.strip().lower() == expected.strip().lower()
+    return value == expected
+
+
+def metadata_filter(spec: dict):
+    """
+    Builds a predicate over chunk metadata from a filter dict. Keys are matched
+    by equality (case-insensitive for strings, a list means "any of"); the
+    special key `kind` selects "soil" or "document" chunks.
+
+    Returns:
+        callable or None: None when the filter is empty.
+    """
+    if not spec:
+        return None
+
+    def predicate(metadata: dict) -> bool:
+        for key, expected in spec.items():
+            value = doc_kind(metadata) if key == "kind" else metadata.get(key)
+            if not _matches(value, expected):
+                return False
+        return True
+
+    return predicate
+
+
+def to_relevance(distance: float) -> float:
+    # The index stores unit-length MiniLM vectors under squared L2 distance,
+    # so cosine similarity is 1 - d/2.
+    return 1.0 - distance / 2.0
+
+
+def search(db, query_vector, options: RetrievalOptions) -> list:
+    """
+    Runs a similarity or MMR search against a LangChain FAISS store or a
+    `CompactFAISSStore` (both expose the same `*_by_vector` methods).
+
+    Returns:
+        list: `(Document, relevance)` pairs, best first.
+    """
+    predicate = metadata_filter(options.filter)
+    fetch_k = max(options.fetch_k, options.k)
+    if options.mmr:
+        hits = db.max_marginal_relevance_search_with_score_by_vector(
+            query_vector, k=options.k, fetch_k=fetch_k, lambda_mult=options.lambda_mult, filter=predicate
+        )
+    else:
+        hits = db.similarity_search_with_score_by_vector(query_vector, k=options.k, filter=predicate, fetch_k=fetch_k)
+
+    results = [(doc, to_relevance(distance)) for doc, distance in hits]
+    if options.score_threshold > 0:
+        results = [(doc, score) for doc, score in results if score >= options.score_threshold]
+    return results
+
+
+def format_results(results: list, query: str = "") -> str:
+    # Each chunk is cut to the passage that best matches the query (RETRIEVAL_MAX_CHARS)
+    return "\n\n---\n\n".join([
+        f"Source: {os.path.basename(str(doc.metadata.get('source', 'N/A')))}\nContent: {relevant_window(doc.page_content, query)}"
+        for doc, _ in results
+    ])
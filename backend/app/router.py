@@ -0,0 +1,288 @@
+# backend/app/router.py
+import os
+import re
+import json
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from .lazy import LazyResource
+from .tools import query_embeddings, embeddings_resource, aget_weather_data, aclassify_image
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# Answer obvious single-tool requests without the agent. Disable with ROUTER_ENABLED=false.
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+# Cosine similarity to the closest weather example needed to route, and the
+# lead it must have over the closest "needs the agent" example.
+ROUTER_MIN_SIMILARITY = float(os.getenv("ROUTER_MIN_SIMILARITY", "0.55"))
+ROUTER_MARGIN = float(os.getenv("ROUTER_MARGIN", "0.05"))
+ROUTER_MAX_WORDS = int(os.getenv("ROUTER_MAX_WORDS", "12"))
+
+_WEATHER_WORDS = re.compile(r"\b(weather|forecast|rain|raining|rainfall|temperature|humidity|humid|wind|hot|cold)\b", re.I)
+# Anything asking for advice or a second kind of data needs the agent's synthesis
+_OTHER_INTENTS = re.compile(
+    r"\b(price|prices|market|mandi|soil|sow|sowing|plant|planting|spray|spraying|irrigat\w*|"
+    r"fertili[sz]\w*|disease|pest\w*|harvest\w*|should|advice|suggest|recommend)\b",
+    re.I,
+)
+_PLACE = re.compile(
+    r"\b(?:in|at|for|of|near)\s+([A-Za-z][\w .,-]{1,60}?)\s*"
+    r"(?:today|tomorrow|now|this week|next \w+|right now)?\s*[?.!]*$",
+    re.I,
+)
+_NOT_PLACES = {"today", "tomorrow", "now", "this week", "the week", "next week", "the weekend", "me", "my farm", "my area"}
+
+# Labelled examples for the nearest-neighbour intent classifier
+EXAMPLES = {
+    "weather": [
+        "weather in Kharagpur",
+        "what is the weather today",
+        "will it rain tomorrow",
+        "weather forecast for this week",
+        "how hot will it be in Patna",
+        "current temperature in Cuttack",
+        "is it going to rain in Bankura",
+        "humidity and wind in Midnapore now",
+    ],
+    "agent": [
+        "should I irrigate my paddy before the rain",
+        "is this weather good for spraying pesticide",
+        "best time to sow wheat given the forecast",
+        "how does heavy rain affect potato crops",
+        "what crops grow well in hot weather",
+        "market price of rice in West Bengal",
+        "how to control late blight in potato",
+        "soil nutrients in Paschim Medinipur",
+        "hello, who are you",
+    ],
+}
+
+
+@dataclass
+class RouteDecision:
+    intent: str  # "weather" or "classify"
+    argument: str  # location, or image URL
+    similarity: float = None
+
+
+def _load_prototypes():
+    labels, texts = [], []
+    for label, examples in EXAMPLES.items():
+        labels.extend([label] * len(examples))
+        texts.extend(examples)
+    vectors = np.asarray(query_embeddings.embed_documents(texts), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return labels, vectors
+
+
+prototypes_resource = LazyResource("router", _load_prototypes)
+
+
+def extract_place(text: str) -> Optional[str]:
+    match = _PLACE.search(text.strip())
+    if not match:
+        return None
+    place = match.group(1).strip(" ,.-")
+    return None if place.lower() in _NOT_PLACES else place
+
+
+def _has_non_latin_letters(text: str) -> bool:
+    # Templates are English; other languages go to the agent, which answers in kind
+    return any(ch.isalpha() and not ch.isascii() for ch in text)
+
+
+async def classify_intent(text: str) -> tuple:
+    """Returns `(label, similarity, margin)` from the nearest labelled example per intent."""
+    labels, vectors = await prototypes_resource.aget()
+    query = np.asarray(await query_embeddings.aembed_query(text), dtype=np.float32)
+    query /= np.linalg.norm(query) or 1.0
+    similarities = vectors @ query
+    best = {}
+    for label, similarity in zip(labels, similarities):
+        best[label] = max(best.get(label, -1.0), float(similarity))
+    label = max(best, key=best.get)
+    others = [value for key, value in best.items() if key != label]
+    return label, best[label], best[label] - max(others, default=-1.0)
+
+
+async def route(text: Optional[str], image_url: Optional[str], location: Optional[str]) -> Optional[RouteDecision]:
+    """
+    Decides whether a request is a single-tool intent the fast path can answer:
+    an image with no text (disease classification), or a plain weather
+    question for a known place. Returns None when the agent should handle it.
+    """
+    text = (text or "").strip()
+    if image_url:
+        return RouteDecision("classify", image_url) if not text else None
+    if not text or len(text.split()) > ROUTER_MAX_WORDS or _has_non_latin_letters(text):
+        return None
+    # Cheap rules first: only weather-looking, single-intent questions reach the classifier
+    if not _WEATHER_WORDS.search(text) or _OTHER_INTENTS.search(text):
+        return None
+    place = extract_place(text) or (location or "").strip()
+    if not place:
+        return None
+    # The embedding model is shared with retrieval; never load it on the request path
+    if not embeddings_resource.ready:
+        return None
+
+    label, similarity, margin = await classify_intent(text)
+    if label != "weather" or similarity < ROUTER_MIN_SIMILARITY or margin < ROUTER_MARGIN:
+        return None
+    return RouteDecision("weather", place, similarity)
+
+
+def _pretty_label(label: str) -> str:
+    return re.sub(r"\s+", " ", label.replace("___", ": ").replace("_", " ")).strip()
+
+
+def format_weather(data: dict) -> str:
+    current = data["current_weather"]
+    lines = [
+        f"Weather in {current.get('city') or 'your area'}: {current['description']}, "
+        f"{current['temperature']:.0f}°C (feels like {current['feels_like']:.0f}°C), "
+        f"humidity {current['humidity']}%, wind {current['wind_speed']} m/s.",
+        "",
+        "Forecast:",
+    ]
+    for day in data.get("five_day_forecast", []):
+        lines.append(
+            f"- {day['date']}: {day['weather']}, {day['temp_min']:.0f}–{day['temp_max']:.0f}°C, "
+            f"{day.get('pop', 0) * 100:.0f}% chance of rain"
+        )
+    return "\n".join(lines)
+
+
+def format_classification(result: dict) -> str:
+    label = _pretty_label(result["label"])
+    score = result.get("score")
+    lines = [f"Detected: {label}" + (f" (confidence {score:.0%})." if score is not None else ".")]
+    alternatives = [p for p in result.get("top_k", [])[1:] if p["score"] >= 0.05]
+    if alternatives:
+        lines.append("Other possibilities: " + ", ".join(f"{_pretty_label(p['label'])} ({p['score']:.0%})" for p in alternatives) + ".")
+    if "healthy" in label.lower():
+        lines.append("\nThe leaf looks healthy. Keep monitoring the crop regularly.")
+    else:
+        lines.append(f"\nAsk me how to manage {label.split(': ')[-1].lower()} for treatment and prevention advice.")
+    return "\n".join(lines)
+
+
+async def answer(decision: RouteDecision) -> Optional[str]:
+    """Runs the decision's tool and fills its template; None means fall back to the agent."""
+    try:
+        if decision.intent == "weather":
+            output = await aget_weather_data(decision.argument)
+            # Error messages are plain text: let the agent explain them
+            return format_weather(json.loads(output))
+        if decision.intent == "classify":
+            return format_classification(await aclassify_image(decision.argument))
+    except Exception as e:
+        logger.info(f"Fast path for '{decision.intent}' fell back to the agent: {e}")
+    return None
+
+
+class RouterStats:
+    """
+    Share of traffic answered on the fast path and the latency it saved,
+    estimated per intent against agent runs that called only that same tool.
+    """
+
+    BASELINE_TOOLS = {"WeatherInfo": "weather", "crop_disease_classifier": "classify"}
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.fallbacks = 0
+        self.routed = {}  # intent -> [count, total_ms]
+        self.agent = {}  # intent (or "all") -> [count, total_ms]
+
+    def record_routed(self, intent: str, ms: float):
+        with self._lock:
+            self.requests += 1
+            entry = self.routed.setdefault(intent, [0, 0.0])
+            entry[0] += 1
+            entry[1] += ms
+
+    def record_fallback(self):
+        with self._lock:
+            self.fallbacks += 1
+
+    def record_agent(self, ms: float, tools_used: list):
+        with self._lock:
+            self.requests += 1
+            keys = ["all"]
+            if len(tools_used) == 1 and tools_used[0] in self.BASELINE_TOOLS:
+                keys.append(self.BASELINE_TOOLS[tools_used[0]])
+            for key in keys:
+                entry = self.agent.setdefault(key, [0, 0.0])
+                entry[0] += 1
+                entry[1] += ms
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            routed = {intent: list(entry) for intent, entry in self.routed.items()}
+            agent = {key: list(entry) for key, entry in self.agent.items()}
+            requests, fallbacks = self.requests, self.fallbacks
+
+        by_intent, saved_total = {}, 0.0
+        for intent, (count, total_ms) in routed.items():
+            avg_ms = total_ms / count
+            baseline = agent.get(intent) or agent.get("all")
+            baseline_ms = baseline[1] / baseline[0] if baseline else None
+            saved = count * (baseline_ms - avg_ms) if baseline_ms is not None else None
+            saved_total += saved or 0.0
+            by_intent[intent] = {
+                "routed": count,
+                "avg_ms": round(avg_ms, 1),
+                "agent_baseline_ms": round(baseline_ms, 1) if baseline_ms is not None else None,
+                "saved_ms_total": round(saved, 1) if saved is not None else None,
+            }
+        routed_count = sum(entry[0] for entry in routed.values())
+        return {
+            "enabled": ROUTER_ENABLED,
+            "requests": requests,
+            "routed": routed_count,
+            "routed_fraction": round(routed_count / requests, 3) if requests else 0.0,
+            "fallbacks": fallbacks,
+            "saved_ms_total": round(saved_total, 1),
+            "by_intent": by_intent,
+        }
+
+
+router_stats = RouterStats()
+
+
+async def try_fast_path(text: Optional[str], image_url: Optional[str], location: Optional[str]) -> Optional[tuple]:
+    """
+    Returns `(answer, metadata)` when the request was answered on the fast
+    path, or None when the agent must handle it.
+    """
+    if not ROUTER_ENABLED:
+        return None
+    started = time.perf_counter()
+    try:
+        decision = await route(text, image_url, location)
+    except Exception as e:
+        logger.warning(f"Router failed, using the agent: {e}")
+        return None
+    if decision is None:
+        return None
+
+    reply = await answer(decision)
+    if reply is None:
+        router_stats.record_fallback()
+        return None
+    ms = (time.perf_counter() - started) * 1000
+    router_stats.record_routed(decision.intent, ms)
+    logger.info(
+        f"Fast path '{decision.intent}' answered in {ms:.1f}ms",
+        extra={"stage": "router", "intent": decision.intent, "ms": round(ms, 1)},
+    )
+    return reply, {"route": f"fast:{decision.intent}", "ms": round(ms, 1)}
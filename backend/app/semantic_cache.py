@@ -0,0 +1,150 @@
+# backend/app/semantic_cache.py
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+
+# Answers that used these tools depend on live data and are never cached.
+TIME_SENSITIVE_TOOLS = {"WeatherInfo", "MarketInfo"}
+
+_PUNCTUATION = re.compile(r"[^\w\s]", re.UNICODE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Lower-cases and strips punctuation/extra whitespace before embedding."""
+    text = _PUNCTUATION.sub(" ", text.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class SemanticCache:
+    """
+    Cache of agent answers keyed on query embeddings.
+
+    Normalized queries are embedded with the shared MiniLM model and kept in a
+    small inner-product FAISS index over unit vectors (cosine similarity). A
+    lookup returns the stored answer of the nearest previous query if its
+    similarity is at least `threshold` and it hasn't expired. Entries are
+    partitioned by `scope` (the normalized user location), with one index per
+    scope, so an answer is only reused for requests from the same place. The
+    cache holds at most `max_entries` answers and evicts the least recently used.
+
+    Args:
+        embedder (Embeddings): Query embedder, normally the shared `EmbeddingService`.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+    ):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._indexes = {}  # scope -> faiss index
+        self._entries = OrderedDict()  # id -> {"query", "scope", "answer", "created_at"}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embedder.embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).reshape(1, -1)
+
+    def _ensure_index(self, scope: str, dim: int):
+        if scope not in self._indexes:
+            import faiss
+            self._indexes[scope] = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        return self._indexes[scope]
+
+    def _remove(self, ids: list):
+        if not ids:
+            return
+        by_scope = {}
+        for entry_id in ids:
+            entry = self._entries.pop(entry_id, None)
+            if entry is not None:
+                by_scope.setdefault(entry["scope"], []).append(entry_id)
+        for scope, scope_ids in by_scope.items():
+            index = self._indexes[scope]
+            index.remove_ids(np.asarray(scope_ids, dtype=np.int64))
+            if index.ntotal == 0:
+                del self._indexes[scope]
+        self.stats["evictions"] += len(ids)
+
+    def _evict_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        self._remove([i for i, e in self._entries.items() if e["created_at"] < cutoff])
+
+    def lookup(self, query: str, scope: str = ""):
+        """
+        Returns `(answer, similarity)` for the closest cached query in `scope`, or None.
+        """
+        normalized = normalize_query(query)
+        if not normalized:
+            return None
+        vector = self._embed(normalized)
+
+        with self._lock:
+            self.stats["lookups"] += 1
+            self._evict_expired()
+            index = self._indexes.get(scope)
+            if index is None:
+                self.stats["misses"] += 1
+                return None
+            scores, ids = index.search(vector, 1)
+            entry_id, score = int(ids[0][0]), float(scores[0][0])
+            entry = self._entries.get(entry_id)
+            if entry is None or score < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(entry_id)
+            self.stats["hits"] += 1
+            return entry["answer"], score
+
+    def store(self, query: str, answer: str, scope: str = ""):
+        normalized = normalize_query(query)
+        if not normalized or not answer:
+            return
+        vector = self._embed(normalized)
+
+        with self._lock:
+            index = self._ensure_index(scope, vector.shape[1])
+            entry_id = self._next_id
+            self._next_id += 1
+            index.add_with_ids(vector, np.asarray([entry_id], dtype=np.int64))
+            self._entries[entry_id] = {"query": normalized, "scope": scope, "answer": answer, "created_at": time.time()}
+            self.stats["stores"] += 1
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self._remove(list(self._entries.keys())[:overflow])
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+            stats["scopes"] = len(self._indexes)
+        stats["hit_rate"] = round(stats["hits"] / stats["lookups"], 3) if stats["lookups"] else 0.0
+        return stats
+
+
+def is_cacheable(has_image: bool, tools_used) -> bool:
+    """Only text questions answered without live weather/market data are cached."""
+    return not has_image and not (set(tools_used) & TIME_SENSITIVE_TOOLS)
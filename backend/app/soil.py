@@ -0,0 +1,185 @@
+# backend/app/soil.py
+import os
+import re
+import bisect
+import difflib
+import logging
+import sqlite3
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+SOIL_CSV_DIR = os.path.join(os.path.dirname(__file__), "data", "csvs")
+SOIL_DB_PATH = os.getenv("SOIL_DB_PATH", os.path.join(os.path.dirname(__file__), "data", "soil.sqlite"))
+REQUIRED_COLUMNS = ["district", "Nitrogen", "Phosphorous", "Potassium", "pH"]
+NUTRIENT_COLUMNS = REQUIRED_COLUMNS[1:]
+# Minimum difflib similarity for a misspelled district name to count as a match
+SOIL_FUZZY_CUTOFF = float(os.getenv("SOIL_FUZZY_CUTOFF", "0.75"))
+
+_NON_ALNUM = re.compile(r"[^a-z0-9 ]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def district_key(name: str) -> str:
+    """Canonical form of a district name: lower-case, no punctuation or 'district' suffix."""
+    key = _WHITESPACE.sub(" ", _NON_ALNUM.sub(" ", str(name).lower())).strip()
+    return re.sub(r"\s+district$", "", key)
+
+
+def read_soil_csvs(files: list):
+    """Concatenates the soil CSVs into a DataFrame, keeping only the columns the store needs."""
+    # Imported here: pandas is only needed to build the table, not to serve lookups
+    import pandas as pd
+
+    dfs = []
+    for file in files:
+        try:
+            df = pd.read_csv(file)
+            logger.info(f"Loaded {len(df)} soil rows from '{file}'")
+        except Exception as e:
+            logger.error(f"Failed to read '{file}': {e}")
+            continue
+        missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+        if missing:
+            raise ValueError(f"Missing required column(s) {missing} in '{file}'")
+        dfs.append(df[REQUIRED_COLUMNS])
+    if not dfs:
+        return pd.DataFrame(columns=REQUIRED_COLUMNS)
+    return pd.concat(dfs, ignore_index=True)
+
+
+def aggregate_soil(df):
+    """
+    Averages the nutrient readings per district (spelling variants of the same
+    district are grouped together) and counts the samples behind each average.
+    """
+    import pandas as pd
+
+    df = df.dropna(subset=["district"]).copy()
+    df[NUTRIENT_COLUMNS] = df[NUTRIENT_COLUMNS].apply(pd.to_numeric, errors="coerce")
+    df["district_key"] = df["district"].astype(str).map(district_key)
+    aggregated = df.groupby("district_key", as_index=False).agg(
+        district=("district", "first"),
+        Nitrogen=("Nitrogen", "mean"),
+        Phosphorous=("Phosphorous", "mean"),
+        Potassium=("Potassium", "mean"),
+        pH=("pH", "mean"),
+        samples=("district", "size"),
+    )
+    return aggregated.sort_values("district_key", ignore_index=True)
+
+
+def build_soil_store(files: list = None, path: str = SOIL_DB_PATH) -> int:
+    """
+    Aggregates the soil CSVs and writes them to a SQLite table keyed by the
+    canonical district name.
+
+    Returns:
+        int: number of districts written.
+    """
+    if files is None:
+        files = sorted(
+            os.path.join(SOIL_CSV_DIR, f) for f in os.listdir(SOIL_CSV_DIR) if f.endswith(".csv")
+        ) if os.path.isdir(SOIL_CSV_DIR) else []
+    df = aggregate_soil(read_soil_csvs(files))
+
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute(
+            "CREATE TABLE soil ("
+            " district_key TEXT PRIMARY KEY,"
+            " district TEXT NOT NULL,"
+            " nitrogen REAL, phosphorous REAL, potassium REAL, ph REAL,"
+            " samples INTEGER NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.executemany(
+            "INSERT INTO soil VALUES (?, ?, ?, ?, ?, ?, ?)",
+            # astype(object) hands sqlite3 plain Python numbers instead of numpy scalars
+            df[["district_key", "district", *NUTRIENT_COLUMNS, "samples"]].astype(object).itertuples(index=False, name=None),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote soil data for {len(df)} districts to '{path}'.")
+    return len(df)
+
+
+def has_soil_data(path: str = SOIL_DB_PATH) -> bool:
+    """True if the soil table has been built and holds at least one district."""
+    if not os.path.exists(path):
+        return False
+    try:
+        conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+        try:
+            return conn.execute("SELECT 1 FROM soil LIMIT 1").fetchone() is not None
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+
+
+class SoilStore:
+    """
+    In-memory view of the per-district soil table.
+
+    Lookups try, in order: an exact match on the canonical name (dict, O(1)),
+    a unique prefix match (bisect over the sorted names, O(log n)), and finally
+    the closest spelling by difflib similarity.
+    """
+
+    def __init__(self, path: str = SOIL_DB_PATH):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+        try:
+            rows = conn.execute(
+                "SELECT district_key, district, nitrogen, phosphorous, potassium, ph, samples FROM soil"
+            ).fetchall()
+        finally:
+            conn.close()
+        self._records = {
+            key: {"district": district, "N": n, "P": p, "K": k, "pH": ph, "samples": samples}
+            for key, district, n, p, k, ph, samples in rows
+        }
+        self._keys = sorted(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def lookup(self, name: str):
+        """
+        Returns `(record, match)` where match is "exact", "prefix" or "fuzzy",
+        or `(None, None)` if no district is close enough.
+        """
+        key = district_key(name)
+        if not key:
+            return None, None
+        if key in self._records:
+            return self._records[key], "exact"
+
+        start = bisect.bisect_left(self._keys, key)
+        end = bisect.bisect_left(self._keys, key + "\uffff")
+        if end - start == 1:
+            return self._records[self._keys[start]], "prefix"
+
+        close = difflib.get_close_matches(key, self._keys, n=1, cutoff=SOIL_FUZZY_CUTOFF)
+        if close:
+            return self._records[close[0]], "fuzzy"
+        return None, None
+
+    def suggestions(self, name: str, n: int = 3) -> list:
+        key = district_key(name)
+        close = difflib.get_close_matches(key, self._keys, n=n, cutoff=0.5)
+        return [self._records[k]["district"] for k in close]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build_soil_store()
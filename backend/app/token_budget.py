@@ -0,0 +1,176 @@
+# backend/app/token_budget.py
+import os
+import re
+import json
+import time
+import logging
+import threading
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from .history import estimate_tokens
+from .metrics import LLM_STEP_SECONDS, LLM_TOKENS
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# Upper bound for any single tool observation handed back to Gemini.
+TOOL_OUTPUT_MAX_TOKENS = int(os.getenv("TOOL_OUTPUT_MAX_TOKENS", "800"))
+# Characters kept from each retrieved knowledge-base chunk.
+RETRIEVAL_MAX_CHARS = int(os.getenv("RETRIEVAL_MAX_CHARS", "600"))
+# Mandi rows returned by MarketInfo.
+MARKET_MAX_RECORDS = int(os.getenv("MARKET_MAX_RECORDS", "10"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def compact_json(data) -> str:
+    """JSON without indentation or spaces after separators."""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def clip_text(text: str, max_chars: int) -> str:
+    """Cuts `text` to at most `max_chars`, at a word boundary, marking the cut."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;:") + " …"
+
+
+def clip_tool_output(text: str, max_tokens: int = TOOL_OUTPUT_MAX_TOKENS) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return clip_text(text, max_tokens * 4)
+
+
+def relevant_window(text: str, query: str, max_chars: int = RETRIEVAL_MAX_CHARS) -> str:
+    """
+    Returns the run of consecutive sentences of `text`, at most `max_chars`
+    long, that mentions the most distinct query terms.
+    """
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    terms = {word for word in _WORD.findall(query.lower()) if len(word) > 2}
+    sentences = _SENTENCE_END.split(text)
+    hits = [terms & set(_WORD.findall(sentence.lower())) for sentence in sentences]
+
+    # Windows are scored by distinct query terms, so one term repeated in every
+    # sentence does not beat a passage that covers the whole question
+    best_start, best_score = 0, -1
+    for start in range(len(sentences)):
+        length, covered = 0, set()
+        for i in range(start, len(sentences)):
+            length += len(sentences[i]) + 1
+            if length > max_chars and i > start:
+                break
+            covered |= hits[i]
+        if len(covered) > best_score:
+            best_start, best_score = start, len(covered)
+
+    window, length = [], 0
+    for sentence in sentences[best_start:]:
+        if window and length + len(sentence) + 1 > max_chars:
+            break
+        window.append(sentence)
+        length += len(sentence) + 1
+    return clip_text(" ".join(window), max_chars)
+
+
+def factor_common_fields(records: list) -> dict:
+    """
+    Moves fields that have the same value in every record into `common`, so
+    e.g. commodity and state are not repeated on each mandi row.
+    """
+    if len(records) < 2:
+        return {"common": {}, "records": records}
+    common = {
+        key: value
+        for key, value in records[0].items()
+        if all(record.get(key) == value for record in records[1:])
+    }
+    rows = [{key: value for key, value in record.items() if key not in common} for record in records]
+    return {"common": common, "records": rows}
+
+
+class TokenUsageHandler(AsyncCallbackHandler):
+    """
+    Collects the latency and the input/output token counts Gemini reports for
+    every model call (one per agent step) of a single request, and feeds them
+    to the /metrics histograms.
+    """
+
+    def __init__(self):
+        self.steps = []
+        self._started = {}
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    async def on_llm_end(self, response, *, run_id=None, **kwargs):
+        usage = {"input_tokens": 0, "output_tokens": 0}
+        for generations in response.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                usage["input_tokens"] += metadata.get("input_tokens", 0)
+                usage["output_tokens"] += metadata.get("output_tokens", 0)
+        usage["ms"] = self._finish(run_id, "ok")
+        self.steps.append(usage)
+        LLM_TOKENS.inc(usage["input_tokens"], direction="input")
+        LLM_TOKENS.inc(usage["output_tokens"], direction="output")
+        logger.info(
+            f"Gemini step {len(self.steps)}: {usage['ms']}ms, in={usage['input_tokens']} out={usage['output_tokens']}",
+            extra={"stage": "llm", "step": len(self.steps), **usage},
+        )
+
+    async def on_llm_error(self, error, *, run_id=None, **kwargs):
+        ms = self._finish(run_id, "error")
+        logger.warning(f"Gemini step {len(self.steps) + 1} failed after {ms}ms: {error}", extra={"stage": "llm", "ms": ms})
+
+    def _finish(self, run_id, status: str) -> float:
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return 0.0
+        elapsed = time.perf_counter() - started
+        step = len(self.steps) + 1
+        LLM_STEP_SECONDS.observe(elapsed, step=step if step < 5 else "5+", status=status)
+        return round(elapsed * 1000, 1)
+
+    def summary(self) -> dict:
+        return {
+            "steps": self.steps,
+            "input_tokens": sum(step["input_tokens"] for step in self.steps),
+            "output_tokens": sum(step["output_tokens"] for step in self.steps),
+            "llm_ms": round(sum(step["ms"] for step in self.steps), 1),
+        }
+
+
+class TokenStats:
+    """Process-wide token counters across requests, for the stats endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "steps": 0, "input_tokens": 0, "output_tokens": 0, "max_step_input_tokens": 0}
+
+    def record(self, usage: dict):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["steps"] += len(usage["steps"])
+            self.stats["input_tokens"] += usage["input_tokens"]
+            self.stats["output_tokens"] += usage["output_tokens"]
+            for step in usage["steps"]:
+                self.stats["max_step_input_tokens"] = max(self.stats["max_step_input_tokens"], step["input_tokens"])
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        requests = stats["requests"] or 1
+        stats["avg_input_tokens_per_request"] = round(stats["input_tokens"] / requests, 1)
+        stats["avg_output_tokens_per_request"] = round(stats["output_tokens"] / requests, 1)
+        stats["avg_steps_per_request"] = round(stats["steps"] / requests, 2)
+        return stats
+
+
+token_stats = TokenStats()
@@ -0,0 +1,158 @@
+# backend/app/tool_runner.py
+import os
+import time
+import asyncio
+import logging
+import contextlib
+import threading
+from contextvars import ContextVar
+
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentStep
+
+from .metrics import TOOL_SECONDS
+from .token_budget import clip_tool_output
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# Max tool calls of one chat request running at the same time.
+TOOL_MAX_PARALLEL = int(os.getenv("TOOL_MAX_PARALLEL", "4"))
+# Default per-call timeout; override per tool with TOOL_TIMEOUT_<TOOL NAME>, e.g. TOOL_TIMEOUT_WEATHERINFO=10.
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "20"))
+
+
+# Tools report failures as observations starting with this prefix instead of
+# raising, so the model can explain them; build them with `tool_error`.
+TOOL_ERROR_PREFIX = "Error:"
+
+
+def tool_error(message: str) -> str:
+    return f"{TOOL_ERROR_PREFIX} {message}"
+
+
+def is_tool_error(observation) -> bool:
+    return isinstance(observation, str) and observation.startswith(TOOL_ERROR_PREFIX)
+
+
+def tool_timeout(tool_name: str) -> float:
+    return float(os.getenv(f"TOOL_TIMEOUT_{tool_name.upper()}", TOOL_TIMEOUT_SECONDS))
+
+
+class ToolRunTracker:
+    """
+    Per-request record of tool calls: bounds how many run concurrently and
+    keeps their timings, so the response can report the wall-clock time spent
+    in tools against the sum of the individual tool latencies.
+    """
+
+    def __init__(self, max_parallel: int = TOOL_MAX_PARALLEL):
+        self.max_parallel = max(1, max_parallel)
+        self.calls = []
+        self._semaphore = None
+        self._lock = threading.Lock()
+        self._created = time.perf_counter()
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily on the loop that runs the agent
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_parallel)
+        return self._semaphore
+
+    def record(self, tool: str, started: float, finished: float, status: str):
+        with self._lock:
+            self.calls.append({"tool": tool, "started": started, "finished": finished, "status": status})
+
+    def summary(self) -> dict:
+        with self._lock:
+            calls = sorted(self.calls, key=lambda call: call["started"])
+
+        # Wall-clock time is the union of the call intervals
+        wall, current_start, current_end = 0.0, None, None
+        for call in calls:
+            if current_end is None or call["started"] > current_end:
+                if current_end is not None:
+                    wall += current_end - current_start
+                current_start, current_end = call["started"], call["finished"]
+            else:
+                current_end = max(current_end, call["finished"])
+        if current_end is not None:
+            wall += current_end - current_start
+
+        total = sum(call["finished"] - call["started"] for call in calls)
+        return {
+            "tool_calls": [
+                {
+                    "tool": call["tool"],
+                    "status": call["status"],
+                    "start_ms": round((call["started"] - self._created) * 1000, 1),
+                    "ms": round((call["finished"] - call["started"]) * 1000, 1),
+                }
+                for call in calls
+            ],
+            "tool_sum_ms": round(total * 1000, 1),
+            "tool_wall_ms": round(wall * 1000, 1),
+            "parallel_savings_ms": round((total - wall) * 1000, 1),
+        }
+
+
+_current_tracker = ContextVar("tool_run_tracker", default=None)
+
+
+def track_tool_runs(max_parallel: int = TOOL_MAX_PARALLEL) -> ToolRunTracker:
+    """Starts a tracker for the tool calls made from the current context (one chat request)."""
+    tracker = ToolRunTracker(max_parallel)
+    _current_tracker.set(tracker)
+    return tracker
+
+
+class ParallelAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor whose async path runs the independent tool calls of one
+    model step concurrently (LangChain gathers them), bounded by the request's
+    `ToolRunTracker`, with a timeout per call. A call that times out returns an
+    error observation so the model can fall back instead of the turn failing.
+    The timeout only cancels this request's wait: an upstream fetch it shares
+    with other requests through `ToolCache.get_or_fetch` runs on for them.
+    Observations are clipped to TOOL_OUTPUT_MAX_TOKENS.
+    """
+
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None) -> AgentStep:
+        tracker = _current_tracker.get()
+        timeout = tool_timeout(agent_action.tool)
+
+        async with tracker.semaphore if tracker else contextlib.nullcontext():
+            started = time.perf_counter()
+            status = "ok"
+            try:
+                step = await asyncio.wait_for(
+                    super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager),
+                    timeout,
+                )
+                if is_tool_error(step.observation):
+                    status = "error"
+                if isinstance(step.observation, str):
+                    # Every observation is re-sent on each later step, so keep it within budget
+                    step = AgentStep(action=agent_action, observation=clip_tool_output(step.observation))
+                return step
+            except asyncio.TimeoutError:
+                status = "timeout"
+                logger.warning(f"Tool '{agent_action.tool}' timed out after {timeout:.0f}s.")
+                return AgentStep(
+                    action=agent_action,
+                    observation=tool_error(f"{agent_action.tool} did not respond within {timeout:.0f} seconds."),
+                )
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                finished = time.perf_counter()
+                TOOL_SECONDS.observe(finished - started, tool=agent_action.tool, status=status)
+                logger.info(
+                    f"Tool '{agent_action.tool}' {status} in {(finished - started) * 1000:.1f}ms",
+                    extra={"stage": "tool", "tool": agent_action.tool, "status": status, "ms": round((finished - started) * 1000, 1)},
+                )
+                if tracker is not None:
+                    tracker.record(agent_action.tool, started, finished, status)
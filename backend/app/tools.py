@@ -2,18 +2,30 @@
 import os
 import logging
 import json
+import asyncio
 import requests
+import httpx
 from datetime import datetime, timedelta
 from urllib.parse import urlencode, quote_plus
 from langchain.tools import Tool
 from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from dotenv import load_dotenv
+from .http_client import get_with_retries, get_sync_session, run_sync, HTTP_TIMEOUT_SECONDS
+from .limits import upstream, offload
+from .cache import ToolCache
+from .index_store import CompactFAISSStore, has_compact_docstore, tune_index
+from .lazy import LazyResource
+from .embeddings import EmbeddingService
+from .locations import CanonicalLocation, LocationDemand, resolve_location, geocode_cache, OPENWEATHER_BASE_URL
+from .retrieval import parse_tool_input, search, format_results
+from .token_budget import compact_json, factor_common_fields, MARKET_MAX_RECORDS
+from .tool_runner import tool_error
+from .soil import has_soil_data
 load_dotenv()
 
 
 # --- 0. Setup Logging ---
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 from langchain_community.vectorstores import Chroma
@@ -43,212 +55,339 @@ logger = logging.getLogger(__name__)
 # These must match the settings used in your `build_index.py` script
 INDEX_PATH = "app/data/faiss_index"
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
-
-# --- Document Loader Function ---
-# This function is kept here so the separate `build_index.py` script can import and use it.
-# It is NOT used during the normal, fast startup of the application.
-def create_retrieval_tool():
-    """
-    Initializes a retrieval tool by LOADING a pre-built FAISS index from disk.
-    This function is designed to be very fast on application startup.
-    """
-    logger.info("Initializing retrieval tool by loading FAISS index...")
-
+# "compact" = memory-mapped index + SQLite docstore, "pickle" = LangChain's
+# index.pkl, "auto" = compact when docstore.sqlite has been exported.
+INDEX_FORMAT = os.getenv("INDEX_FORMAT", "auto")
+
+# --- Lazily Loaded Models ---
+# Nothing heavy is loaded at import time: the embedding model, the FAISS index
+# and the classifier are built on first use (or by the optional startup warm-up).
+def _load_embeddings():
+    # Initialize the same embedding model used to build the index
+    return HuggingFaceEmbeddings(model_name=MODEL_NAME)
+
+def _load_vector_store():
     # Check if the pre-built index directory exists
     if not os.path.isdir(INDEX_PATH):
         logger.error(f"FAISS index not found at '{INDEX_PATH}'.")
-        logger.error("Please run the `build_index.py` script first to create it.")
-        return Tool(
-            name="CropInfoRetriever",
-            func=lambda q: "❌ Error: The document database index is missing. Please ask the administrator to build it.",
-            description="Use for questions about crop cultivation, farming techniques, etc. Currently unavailable."
-        )
-
-    try:
-        # 1. Initialize the same embedding model used to build the index
-        embeddings = HuggingFaceEmbeddings(model_name=MODEL_NAME)
-        
-        # 2. Load the FAISS index from the local directory
+        logger.error("Please run `python -m app.vector_db` first to create it.")
+        raise FileNotFoundError(INDEX_PATH)
+
+    logger.info("Loading FAISS index...")
+    # Query embeddings go through the cached, batching service
+    embeddings = query_embeddings
+    use_compact = INDEX_FORMAT == "compact" or (INDEX_FORMAT == "auto" and has_compact_docstore(INDEX_PATH))
+    if use_compact:
+        # Memory-mapped index, chunks fetched lazily from SQLite: no unpickling
+        db = CompactFAISSStore(INDEX_PATH, embeddings)
+    else:
         db = FAISS.load_local(
             INDEX_PATH,
             embeddings,
             allow_dangerous_deserialization=True  # Required for loading FAISS indexes with LangChain
         )
-        retriever = db.as_retriever(search_kwargs={"k": 3})
-        logger.info("✅ FAISS index loaded successfully and retriever is ready.")
+    # nprobe / efSearch for approximate index types (FAISS_NPROBE, FAISS_EF_SEARCH)
+    tune_index(db.index)
+    logger.info(f"✅ FAISS index loaded successfully ({'compact' if use_compact else 'pickle'} format).")
+    return db
 
-    except Exception as e:
-        logger.error(f"Error loading FAISS vector store from disk: {e}", exc_info=True)
-        return Tool(
-            name="CropInfoRetriever",
-            func=lambda q: "❌ Error: Could not load the document database due to an internal error.",
-            description="Use for questions about crop cultivation, farming techniques, etc. Currently unavailable."
-        )
+def _load_soil_store():
+    from .soil import SoilStore
+    try:
+        return SoilStore()
+    except FileNotFoundError:
+        logger.error("Soil table not found. Please run `python -m app.vector_db` (or `python -m app.soil`) first.")
+        raise
+
+def _load_classifier():
+    # Imported here so torch/transformers are only pulled in when needed
+    from .inference import InferenceEngine
+    return InferenceEngine()
+
+embeddings_resource = LazyResource("embeddings", _load_embeddings)
+query_embeddings = EmbeddingService(embeddings_resource)
+vector_store_resource = LazyResource("faiss_index", _load_vector_store)
+classifier_resource = LazyResource("classifier", _load_classifier)
+soil_store_resource = LazyResource("soil_store", _load_soil_store)
+
+def create_retrieval_tool():
+    """
+    Creates the retrieval tool. The pre-built FAISS index is loaded from disk
+    on the first query, so creating the tool is instant.
+    """
+    def _load_db():
+        try:
+            return vector_store_resource.get(), None
+        except FileNotFoundError:
+            return None, tool_error("The document database index is missing. Please ask the administrator to build it.")
+        except Exception:
+            return None, tool_error("Could not load the document database due to an internal error.")
+
+    def _search_and_format(db, query: str, vector, options) -> str:
+        try:
+            results = search(db, vector, options)
+
+            # If the index finds results, format and return them
+            if results:
+                return format_results(results, query)
+
+            logger.warning(f"No results from FAISS for '{query}'.")
+            return "No relevant information found in the knowledge base."
+
+        except Exception as e:
+            logger.error(f"Error during retrieval for query '{query}': {e}", exc_info=True)
+            return tool_error("Searching the knowledge base failed.")
 
     # This is the actual function the LangChain agent will call
-    def retrieve_and_format(query: str) -> str:
+    def retrieve_and_format(tool_input: str) -> str:
         """
-        Queries the retriever and formats the output. Falls back to
-        SAMPLE_DOCS if no results are found in the main database.
+        Queries the index and formats the output.
         """
+        query, options = parse_tool_input(tool_input)
+        db, error = _load_db()
+        if error:
+            return error
         try:
-            # First, try the main retriever from the FAISS index
-            docs = retriever.get_relevant_documents(query)
-            
-            # If the main retriever finds results, format and return them
-            if docs:
-                formatted_output = "\n\n---\n\n".join([
-                    f"Source: {doc.metadata.get('source', 'N/A')}\n\nContent: {doc.page_content}"
-                    for doc in docs
-                ])
-                return formatted_output
-
-            # If no results from FAISS, check the fallback SAMPLE_DOCS
-            logger.warning(f"No results from FAISS for '{query}'. Checking fallback documents.")
-            
+            vector = query_embeddings.embed_query(query)
         except Exception as e:
-            logger.error(f"Error during retrieval for query '{query}': {e}", exc_info=True)
-            return "Sorry, I encountered an error while searching my knowledge base."
+            logger.error(f"Error embedding query '{query}': {e}", exc_info=True)
+            return tool_error("Searching the knowledge base failed.")
+        return _search_and_format(db, query, vector, options)
+
+    async def aretrieve_and_format(tool_input: str) -> str:
+        query, options = parse_tool_input(tool_input)
+        db, error = await offload("faiss", _load_db)
+        if error:
+            return error
+        try:
+            # Awaited outside the FAISS executor so concurrent queries can be
+            # coalesced into one embedding batch.
+            vector = await query_embeddings.aembed_query(query)
+        except Exception as e:
+            logger.error(f"Error embedding query '{query}': {e}", exc_info=True)
+            return tool_error("Searching the knowledge base failed.")
+        # FAISS search is CPU-bound; run it on the dedicated executor so the
+        # event loop stays responsive.
+        return await offload("faiss", _search_and_format, db, query, vector, options)
 
     # Create the final tool for the agent
     return Tool(
         name="CropInfoRetriever",
         func=retrieve_and_format,
-        description="Use this tool for any questions about crop cultivation, farming techniques, plant diseases, and agricultural practices. Provide the crop name or topic as input."
+        coroutine=aretrieve_and_format,
+        description=(
+            "Use this tool for any questions about crop cultivation, farming techniques, plant diseases, and agricultural practices. "
+            "Provide the crop name or topic as input. Optionally pass JSON such as "
+            '{"query": "...", "k": 5, "mmr": true, "filter": {"kind": "soil", "district": "Nadia"}} '
+            "to return more or more varied passages, or only soil data for a district."
+        )
     )
 
 
-# --- Tool Initialization ---
-# This line is executed when the module is imported.
-# It now runs the very fast `create_retrieval_tool` function.
-crop_info_tool = create_retrieval_tool()
-
 # --- 2. Tool-Specific Logic: Weather Retrieval ---
 # --- 2. Tool-Specific Logic: Weather Retrieval (Updated) ---
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
-WEATHER_DATA_FILE = "weather_data.json" # Renamed for clarity
-
-def get_weather_data(location: str) -> str:
-    """
-    Fetches and returns current and 5-day forecast weather data for a given location.
-    Data is stored in a JSON file, with a refresh policy to avoid repeated API calls.
-
-    Args:
-        location (str): The name of the city, e.g., "Kharagpur", or a coordinate string "lat,lon".
+WEATHER_CACHE_TTL_SECONDS = float(os.getenv("WEATHER_CACHE_TTL_SECONDS", "86400")) # 1 day
+WEATHER_CACHE_REQUIRE_TODAY = os.getenv("WEATHER_CACHE_REQUIRE_TODAY", "true").lower() == "true"
+
+def _has_today_forecast(data: dict) -> bool:
+    # Use cached data only if it contains today's forecast
+    if not WEATHER_CACHE_REQUIRE_TODAY:
+        return True
+    today_str = datetime.now().strftime('%Y-%m-%d')
+    return any(
+        f.get("date") == today_str
+        for f in data.get("five_day_forecast", [])
+    )
 
-    Returns:
-        str: A JSON string of the weather data, or an error message.
-    """
-    try:
-        # Load existing data or initialize an empty dictionary
-        if os.path.exists(WEATHER_DATA_FILE):
-            with open(WEATHER_DATA_FILE, 'r') as f:
-                weather_data_store = json.load(f)
+weather_cache = ToolCache(
+    "weather",
+    ttl_seconds=WEATHER_CACHE_TTL_SECONDS,
+    max_memory_entries=int(os.getenv("WEATHER_CACHE_MEMORY_ENTRIES", "256")),
+    max_store_entries=int(os.getenv("WEATHER_CACHE_STORE_ENTRIES", "5000")),
+    is_fresh=_has_today_forecast,
+)
+# The legacy weather_data.json is not imported: it is keyed by raw location
+# strings, which lookups by grid cell never hit, and its forecasts are stale.
+
+def _summarize_weather(current_data: dict, forecast_data: dict) -> dict:
+    daily_forecast = {}
+    for item in forecast_data['list']:
+        date_string = datetime.fromtimestamp(item['dt']).strftime('%Y-%m-%d')
+        if date_string not in daily_forecast:
+            daily_forecast[date_string] = {
+                "date": date_string,
+                "temp_max": item['main']['temp_max'],
+                "temp_min": item['main']['temp_min'],
+                "weather": item['weather'][0]['description'],
+                "pop": item.get('pop', 0)
+            }
         else:
-            weather_data_store = {}
-
-        today_str = datetime.now().strftime('%Y-%m-%d')
-
-        # Check if the location data is in the store and still fresh
-        if location in weather_data_store:
-            cached_data = weather_data_store[location]
-            timestamp = datetime.fromisoformat(cached_data.get('timestamp'))
-            data = cached_data.get('data', {})
-
-            has_today = any(
-                f.get("date") == today_str
-                for f in data.get("five_day_forecast", [])
+            daily_forecast[date_string]['temp_max'] = max(
+                daily_forecast[date_string]['temp_max'],
+                item['main']['temp_max']
             )
-
-            # Use cached data only if it contains today's forecast and is less than 1 day old
-            if (datetime.now() - timestamp).days < 1 and has_today:
-                return json.dumps(data, indent=2)
-
-        # If data is not fresh, incomplete, or doesn't exist, fetch new data
-        is_coords = ',' in location
-        if is_coords:
-            lat, lon = location.split(',')
-            geo_response = requests.get(
-                f"https://api.openweathermap.org/geo/1.0/reverse?lat={lat}&lon={lon}&limit=1&appid={WEATHER_API_KEY}"
+            daily_forecast[date_string]['temp_min'] = min(
+                daily_forecast[date_string]['temp_min'],
+                item['main']['temp_min']
             )
-            geo_data = geo_response.json()
-            if not geo_data:
-                return "Error: Could not determine city from coordinates."
-            city_name = geo_data[0]['name']
-        else:
-            city_name = location
-            
-        current_weather_url = f"https://api.openweathermap.org/data/2.5/weather?q={quote_plus(city_name)}&units=metric&appid={WEATHER_API_KEY}"
-        current_response = requests.get(current_weather_url)
-        current_response.raise_for_status()
-        current_data = current_response.json()
 
-        forecast_url = f"https://api.openweathermap.org/data/2.5/forecast?q={quote_plus(city_name)}&units=metric&appid={WEATHER_API_KEY}"
-        forecast_response = requests.get(forecast_url)
+    return {
+        "current_weather": {
+            "city": current_data.get('name'),
+            "temperature": current_data['main']['temp'],
+            "feels_like": current_data['main']['feels_like'],
+            "humidity": current_data['main']['humidity'],
+            "wind_speed": current_data['wind']['speed'],
+            "description": current_data['weather'][0]['description']
+        },
+        "five_day_forecast": list(daily_forecast.values())
+    }
+
+WEATHER_CURRENT_URL = f"{OPENWEATHER_BASE_URL}/data/2.5/weather"
+WEATHER_FORECAST_URL = f"{OPENWEATHER_BASE_URL}/data/2.5/forecast"
+
+# Background refresh of the most-requested locations' forecasts shortly before
+# they expire, so requests for them stay cache hits. Enable with WEATHER_PREFETCH_ENABLED=true.
+WEATHER_PREFETCH_ENABLED = os.getenv("WEATHER_PREFETCH_ENABLED", "false").lower() == "true"
+WEATHER_PREFETCH_INTERVAL_SECONDS = float(os.getenv("WEATHER_PREFETCH_INTERVAL_SECONDS", "600"))
+WEATHER_PREFETCH_TOP_N = int(os.getenv("WEATHER_PREFETCH_TOP_N", "20"))
+WEATHER_PREFETCH_MARGIN_SECONDS = float(os.getenv("WEATHER_PREFETCH_MARGIN_SECONDS", "3600"))
+
+location_demand = LocationDemand()
+
+async def _fetch_weather(location: CanonicalLocation) -> dict:
+    # Forecasts are fetched for the centre of the location's grid cell, so all
+    # aliases of a place share one upstream call and one cache entry.
+    params = {"lat": location.lat, "lon": location.lon, "units": "metric", "appid": WEATHER_API_KEY}
+    async with upstream("weather", tokens=2):
+        # Current weather and forecast are independent: fetch them concurrently.
+        current_response, forecast_response = await asyncio.gather(
+            get_with_retries(WEATHER_CURRENT_URL, params=params),
+            get_with_retries(WEATHER_FORECAST_URL, params=params),
+        )
+        current_response.raise_for_status()
         forecast_response.raise_for_status()
+        current_data = current_response.json()
         forecast_data = forecast_response.json()
 
-        daily_forecast = {}
-        for item in forecast_data['list']:
-            date_string = datetime.fromtimestamp(item['dt']).strftime('%Y-%m-%d')
-            if date_string not in daily_forecast:
-                daily_forecast[date_string] = {
-                    "date": date_string,
-                    "temp_max": item['main']['temp_max'],
-                    "temp_min": item['main']['temp_min'],
-                    "weather": item['weather'][0]['description'],
-                    "pop": item.get('pop', 0)
-                }
-            else:
-                daily_forecast[date_string]['temp_max'] = max(
-                    daily_forecast[date_string]['temp_max'],
-                    item['main']['temp_max']
-                )
-                daily_forecast[date_string]['temp_min'] = min(
-                    daily_forecast[date_string]['temp_min'],
-                    item['main']['temp_min']
-                )
-
-        processed_data = {
-            "current_weather": {
-                "city": current_data.get('name'),
-                "temperature": current_data['main']['temp'],
-                "feels_like": current_data['main']['feels_like'],
-                "humidity": current_data['main']['humidity'],
-                "wind_speed": current_data['wind']['speed'],
-                "description": current_data['weather'][0]['description']
-            },
-            "five_day_forecast": list(daily_forecast.values())
-        }
+    if location.name:
+        current_data["name"] = location.name
+    return _summarize_weather(current_data, forecast_data)
 
-        # Store the new data in the dictionary
-        weather_data_store[location] = {
-            "timestamp": datetime.now().isoformat(),
-            "data": processed_data
-        }
+async def aget_weather_data(location: str) -> str:
+    """
+    Fetches and returns current and 5-day forecast weather data for a given location.
+    The location is normalized to a grid cell first (place names are geocoded
+    once), and results are served from the forecast cache (memory, then SQLite)
+    keyed by that cell; concurrent lookups for the same cell share one upstream fetch.
 
-        # Save the updated dictionary to the JSON file
-        with open(WEATHER_DATA_FILE, 'w') as f:
-            json.dump(weather_data_store, f, indent=2)
-            
-        return json.dumps(processed_data, indent=2)
+    Args:
+        location (str): The name of the city, e.g., "Kharagpur", or a coordinate string "lat,lon".
 
-    except requests.exceptions.HTTPError as err:
-        return f"Error: Could not retrieve weather data. HTTP Error: {err.response.status_code} - {err.response.text}"
+    Returns:
+        str: A JSON string of the weather data, or an error message.
+    """
+    try:
+        canonical = await resolve_location(location, WEATHER_API_KEY)
+        location_demand.record(canonical)
+        data = await weather_cache.get_or_fetch(canonical.key, lambda: _fetch_weather(canonical))
+        return compact_json(data)
+
+    except LookupError as e:
+        return tool_error(str(e))
+    except httpx.HTTPStatusError as err:
+        return tool_error(f"Could not retrieve weather data. HTTP Error: {err.response.status_code} - {err.response.text}")
     except Exception as e:
-        return f"An unexpected error occurred: {str(e)}"
+        return tool_error(f"An unexpected error occurred: {str(e)}")
+
+async def prefetch_weather_periodically():
+    """Refreshes the hottest locations' forecasts before they expire."""
+    while True:
+        await asyncio.sleep(WEATHER_PREFETCH_INTERVAL_SECONDS)
+        refreshed = 0
+        for canonical in location_demand.hottest(WEATHER_PREFETCH_TOP_N):
+            # One bad location (or a store error) must not end the loop for the process
+            try:
+                age = await asyncio.to_thread(weather_cache.age, canonical.key)
+                if age is not None and age < WEATHER_CACHE_TTL_SECONDS - WEATHER_PREFETCH_MARGIN_SECONDS:
+                    continue
+                await weather_cache.get_or_fetch(canonical.key, lambda c=canonical: _fetch_weather(c), force=True)
+                refreshed += 1
+            except Exception as e:
+                logger.warning(f"Weather prefetch for {canonical.key} failed: {e}")
+        location_demand.decay()
+        if refreshed:
+            logger.info(f"Prefetched weather for {refreshed} hot locations.")
+
+def get_weather_data(location: str) -> str:
+    """Synchronous entry point for `aget_weather_data`."""
+    return run_sync(aget_weather_data, location)
 
 # --- 3. Tool-Specific Logic: Market Retrieval ---
 # --- 3. Tool-Specific Logic: Market Retrieval (Updated) ---
-MARKET_API_KEY = os.getenv("DATA_GOV_IN_API_KEY", "579b464db66ec23bdd000001798dfe5b454546066ddae0d79944e04d")
-MARKET_DATA_URL = "https://api.data.gov.in/resource/9ef84268-d588-465a-a308-a864a43d0070"
-MARKET_DATA_FILE = "market_data.json" # Renamed for clarity
+from .market_store import MarketStore, MARKET_API_KEY, MARKET_DATA_URL, FILTER_COLUMNS
+# "store" answers from the locally ingested price table, "live" queries
+# data.gov.in per question, "auto" uses the table while its last ingest is fresh.
+MARKET_SOURCE = os.getenv("MARKET_SOURCE", "auto")
+MARKET_DATA_FILE = "market_data.json" # Legacy JSON cache, imported into the cache store once
+MARKET_CACHE_TTL_SECONDS = float(os.getenv("MARKET_CACHE_TTL_SECONDS", "21600")) # 6 hours
+
+market_cache = ToolCache(
+    "market",
+    ttl_seconds=MARKET_CACHE_TTL_SECONDS,
+    max_memory_entries=int(os.getenv("MARKET_CACHE_MEMORY_ENTRIES", "256")),
+    max_store_entries=int(os.getenv("MARKET_CACHE_STORE_ENTRIES", "5000")),
+)
+market_cache.import_legacy_json(MARKET_DATA_FILE)
+market_store = MarketStore()
+
+async def _fetch_market(params: dict):
+    filters = {
+        "format": "json",
+        "api-key": MARKET_API_KEY,
+        "limit": 50,
+    }
+    
+    if 'commodity' in params: filters[f"filters[commodity]"] = params['commodity']
+    if 'state' in params: filters[f"filters[state]"] = params['state']
+    if 'district' in params: filters[f"filters[district]"] = params['district']
+    
+    url_with_params = f"{MARKET_DATA_URL}?{urlencode(filters, quote_via=quote_plus)}"
+    
+    async with upstream("market"):
+        response = await get_with_retries(url_with_params)
+    response.raise_for_status()
+    data = response.json()
+
+    if not data.get('records'):
+        # Empty results are not cached
+        return None
+
+    return [
+        {
+            "commodity": record.get("commodity", "N/A"),
+            "mandi": record.get("market", "N/A"),
+            "state": record.get("state", "N/A"),
+            "district": record.get("district", "N/A"),
+            "modal_price": record.get("modal_price", "N/A"),
+            "arrival_date": record.get("arrival_date", "N/A")
+        }
+        for record in data['records']
+    ]
 
-def get_market_data(query: str) -> str:
+def _arrival_sort_key(record: dict) -> str:
+    # dd/mm/yyyy -> yyyy-mm-dd so dates sort chronologically
+    parts = str(record.get("arrival_date", "")).split("/")
+    return "-".join(reversed(parts)) if len(parts) == 3 else ""
+
+async def aget_market_data(query: str) -> str:
     """
     Fetches and returns the latest market prices for a specific commodity, state, and district.
-    The query should be a JSON string with optional keys: 'commodity', 'state', 'district'.
-    The data is stored locally to prevent redundant API calls for recent queries.
+    The query should be a JSON string with optional keys: 'commodity', 'state', 'district',
+    'market', plus 'sort' ("price_desc", "price_asc", "market") and 'days' for the trend window.
+    Answers come from the local price table when it is fresh, otherwise from the
+    API through the market cache.
 
     Args:
         query (str): A JSON string like '{"commodity": "rice", "state": "West Bengal"}'.
@@ -259,143 +398,233 @@ def get_market_data(query: str) -> str:
     try:
         params = json.loads(query)
     except json.JSONDecodeError:
-        return "Error: Invalid JSON query format. Please provide a JSON string."
+        return tool_error("Invalid JSON query format. Please provide a JSON string.")
+    if not isinstance(params, dict):
+        return tool_error("Invalid JSON query format. Please provide a JSON object.")
+
+    if MARKET_SOURCE != "live":
+        try:
+            if MARKET_SOURCE == "store" or await asyncio.to_thread(market_store.is_fresh):
+                filters = {key: params[key] for key in FILTER_COLUMNS if params.get(key)}
+                result = await asyncio.to_thread(
+                    market_store.query,
+                    filters,
+                    days=int(params.get("days", 7)),
+                    sort=params.get("sort", "price_desc"),
+                    limit=MARKET_MAX_RECORDS,
+                )
+                if result:
+                    result.update(factor_common_fields(result.pop("records")))
+                    return compact_json(result)
+                if MARKET_SOURCE == "store":
+                    return "No market data found for the given criteria."
+        except (TypeError, ValueError):
+            return tool_error("'days' must be a number.")
 
     # Create a consistent, sortable key from the query parameters
-    sorted_params = sorted(params.items())
+    sorted_params = sorted(
+        (key, value.strip().lower() if isinstance(value, str) else value)
+        for key, value in params.items()
+        if key in ("commodity", "state", "district")
+    )
     query_key = json.dumps(sorted_params)
 
     try:
-        # Load existing data or initialize an empty dictionary
-        if os.path.exists(MARKET_DATA_FILE):
-            with open(MARKET_DATA_FILE, 'r') as f:
-                market_data_store = json.load(f)
-        else:
-            market_data_store = {}
-
-        # Check if the query data is in the store and is still fresh
-        if query_key in market_data_store:
-            cached_data = market_data_store[query_key]
-            timestamp = datetime.fromisoformat(cached_data.get('timestamp'))
-            if (datetime.now() - timestamp).total_seconds() < 21600: # 6 hours
-                return json.dumps(cached_data.get('data'))
-
-        # If data is not fresh or doesn't exist, fetch new data
-        filters = {
-            "format": "json",
-            "api-key": MARKET_API_KEY,
-            "limit": 50,
-        }
-        
-        if 'commodity' in params: filters[f"filters[commodity]"] = params['commodity']
-        if 'state' in params: filters[f"filters[state]"] = params['state']
-        if 'district' in params: filters[f"filters[district]"] = params['district']
-        
-        url_with_params = f"{MARKET_DATA_URL}?{urlencode(filters, quote_via=quote_plus)}"
-        
-        response = requests.get(url_with_params)
-        response.raise_for_status()
-        data = response.json()
-
-        if data.get('records'):
-            transformed_records = [
-                {
-                    "commodity": record.get("commodity", "N/A"),
-                    "mandi": record.get("market", "N/A"),
-                    "state": record.get("state", "N/A"),
-                    "district": record.get("district", "N/A"),
-                    "modal_price": record.get("modal_price", "N/A"),
-                    "arrival_date": record.get("arrival_date", "N/A")
-                }
-                for record in data['records']
-            ]
-            
-            # Store the new data in the dictionary
-            market_data_store[query_key] = {
-                "timestamp": datetime.now().isoformat(),
-                "data": transformed_records
-            }
-
-            # Save the updated dictionary to the JSON file
-            with open(MARKET_DATA_FILE, 'w') as f:
-                json.dump(market_data_store, f, indent=2)
-            
-            return json.dumps(transformed_records, indent=2)
-        else:
+        records = await market_cache.get_or_fetch(query_key, lambda: _fetch_market(params))
+        if not records:
             return "No market data found for the given criteria."
+        # Most recent arrivals first, capped at MARKET_MAX_RECORDS
+        records = sorted(records, key=_arrival_sort_key, reverse=True)[:MARKET_MAX_RECORDS]
+        return compact_json(factor_common_fields(records))
 
-    except requests.exceptions.HTTPError as err:
-        return f"Error: Could not retrieve market data. HTTP Error: {err.response.status_code}"
+    except httpx.HTTPStatusError as err:
+        return tool_error(f"Could not retrieve market data. HTTP Error: {err.response.status_code}")
     except Exception as e:
-        return f"An unexpected error occurred: {str(e)}"
+        return tool_error(f"An unexpected error occurred: {str(e)}")
+
+def get_market_data(query: str) -> str:
+    """Synchronous entry point for `aget_market_data`."""
+    return run_sync(aget_market_data, query)
 
 # --- 4. Initialize Tools ---
 crop_info_tool = create_retrieval_tool()
 weather_tool = Tool(
     name="WeatherInfo",
     func=get_weather_data,
-    description="Useful for fetching current and future weather conditions for a specific location. Input should be a string containing a location name (e.g., 'New Delhi' or '19.0760,72.8777')."
+    coroutine=aget_weather_data,
+    description="Useful for fetching current and future weather conditions for a specific location. Input should be a string containing a location name (e.g., 'New Delhi' or 'Kharagpur, West Bengal') or coordinates (e.g., '19.0760,72.8777')."
 )
 market_info_tool = Tool(
     name="MarketInfo",
     func=get_market_data,
-    description="Useful for finding the latest market prices for agricultural commodities. Input should be a JSON string with optional keys: 'commodity', 'state', and 'district'. For example, use '{\"commodity\": \"rice\", \"state\": \"West Bengal\"}' to get rice prices in West Bengal."
+    coroutine=aget_market_data,
+    description="Useful for finding the latest market prices for agricultural commodities. Input should be a JSON string with optional keys: 'commodity', 'state', 'district' and 'market', plus 'sort' ('price_desc', 'price_asc' or 'market') and 'days' (trend window, default 7). For example, use '{\"commodity\": \"rice\", \"state\": \"West Bengal\"}' to get rice prices in West Bengal. The answer includes min/max/median prices across mandis and the daily price trend."
 )
 
 
 # backend/app/tools.py
 from langchain.tools import tool
-from transformers import AutoImageProcessor, AutoModelForImageClassification
 from PIL import Image
-import torch, io, base64
+import io, base64
+from .imaging import decode_image, prepare_image, dhash
+from .uploads import get_prepared_image, content_hash_of
+from .image_cache import ClassificationCache
+from .classifier_backends import CLASSIFIER_BACKEND
 
-# Load the ViT model once at startup
-# Decode base64 → bytes → PIL
+# The MobileNet model is served by the micro-batching engine behind
+# `classifier_resource`: concurrent requests are queued and classified together
+# in batched forward passes.
 
-# feature_extractor = ViTFeatureExtractor.from_pretrained("app/crop_leaf_vit")
-# model = ViTForImageClassification.from_pretrained("app/crop_leaf_vit")
 
-processor = AutoImageProcessor.from_pretrained("app/mobilenet_plant_disease")
-model = AutoModelForImageClassification.from_pretrained("app/mobilenet_plant_disease")
+import requests
 
+def _load_leaf_image(image_path: str) -> Image.Image:
+    # Images uploaded through /chat were already decoded and downscaled at
+    # ingest: hand over the prepared 224px image instead of re-reading the file.
+    prepared = get_prepared_image(image_path)
+    if prepared is not None:
+        return prepared
 
-import requests
+    if image_path.startswith("http"):
+        response = get_sync_session().get(image_path, timeout=HTTP_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        image_bytes = response.content
+        return decode_image(image_bytes)
+
+    # Local file path (served by FastAPI static)
+    return decode_image(image_path.lstrip("/"))
+
+# Results are cached by image content hash (and perceptual hash for
+# near-duplicates), so re-sent photos skip the forward pass entirely.
+CLASSIFIER_MODEL_ID = f"mobilenet_plant_disease:{CLASSIFIER_BACKEND}"
+classification_cache = ClassificationCache()
+
+def _load_and_lookup(image_path: str) -> tuple:
+    """
+    Loads the image and checks the classification cache.
+
+    Returns:
+        tuple: (image, sha256 or None, perceptual hash, cached result or None)
+    """
+    pil_image = _load_leaf_image(image_path)
+    sha256 = content_hash_of(image_path)
+    phash = dhash(prepare_image(pil_image))
+
+    cached = classification_cache.get(sha256, CLASSIFIER_MODEL_ID) if sha256 else None
+    if cached is None:
+        cached = classification_cache.find_similar(phash, CLASSIFIER_MODEL_ID)
+    if cached is None:
+        classification_cache.record_miss()
+    return pil_image, sha256, phash, cached
+
+def _store_classification(sha256, phash: int, result: dict):
+    # Images without a content-addressed name are keyed by their perceptual hash
+    classification_cache.put(sha256 or f"phash:{phash:016x}", phash, CLASSIFIER_MODEL_ID, result)
 
 def crop_disease_classifier(image_path: str) -> str:
     """
     Classify crop leaf diseases from an uploaded image URL.
     """
     try:
-        if image_path.startswith("http"):
-            response = requests.get(image_path)
-            image_bytes = response.content
-        else:
-            # Local file path (served by FastAPI static)
-            with open(image_path.lstrip("/"), "rb") as f:
-                image_bytes = f.read()
+        pil_image, sha256, phash, result = _load_and_lookup(image_path)
 
-        pil_image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        if result is None:
+            result = classifier_resource.get().classify(pil_image)
+            _store_classification(sha256, phash, result)
+        predicted_label = result["label"]
 
-        inputs = processor(images=pil_image, return_tensors="pt")
-        with torch.no_grad():
-            outputs = model(**inputs)
+        return f"Detected disease: {predicted_label}"
 
-        logits = outputs.logits
-        predicted_class_idx = logits.argmax(-1).item()
-        predicted_label = model.config.id2label[predicted_class_idx]
+    except Exception as e:
+        return tool_error(f"crop_disease_classifier failed: {str(e)}")
+
+async def aclassify_image(image_path: str) -> dict:
+    """
+    Decodes the image on the classifier executor and awaits the batched
+    forward pass without blocking the event loop.
+
+    Returns:
+        dict: `label`, `score` and `top_k` predictions.
+    """
+    pil_image, sha256, phash, result = await offload("classifier", _load_and_lookup, image_path)
+
+    if result is None:
+        engine = await classifier_resource.aget()
+        result = await asyncio.wrap_future(engine.submit(pil_image))
+        await asyncio.to_thread(_store_classification, sha256, phash, result)
+    return result
+
+async def acrop_disease_classifier(image_path: str) -> str:
+    """
+    Async variant of crop_disease_classifier (see aclassify_image).
+    """
+    try:
+        result = await aclassify_image(image_path)
+        predicted_label = result["label"]
 
         return f"Detected disease: {predicted_label}"
 
     except Exception as e:
-        return f"Error in crop_disease_classifier: {str(e)}"
+        return tool_error(f"crop_disease_classifier failed: {str(e)}")
 
 
 crop_disease_classifier = Tool(
     name="crop_disease_classifier",
     func=crop_disease_classifier,
+    coroutine=acrop_disease_classifier,
     description="Classifies crop leaf diseases from an uploaded image. Input should be a base64 encoded string of the image data.",
 )
 
 
+# --- 6. Tool-Specific Logic: Soil Lookup ---
+# Per-district N/P/K/pH averages answered from the structured soil table
+# instead of a similarity search over soil sentences.
+def get_soil_data(district: str) -> str:
+    """Looks up the average soil nutrients of a district."""
+    try:
+        payload = json.loads(district)
+        if isinstance(payload, dict):
+            district = payload.get("district", "")
+    except (json.JSONDecodeError, TypeError):
+        pass
+
+    try:
+        store = soil_store_resource.get()
+    except FileNotFoundError:
+        return tool_error("The soil database is missing. Please ask the administrator to build it.")
+    except Exception:
+        return tool_error("Could not load the soil database due to an internal error.")
+
+    record, match = store.lookup(district)
+    if record is None:
+        suggestions = store.suggestions(district)
+        hint = f" Closest districts: {', '.join(suggestions)}." if suggestions else ""
+        return f"No soil data found for '{district}'.{hint}"
+
+    result = {key: round(value, 2) if isinstance(value, float) else value for key, value in record.items()}
+    result["match"] = match
+    return compact_json(result)
+
+async def aget_soil_data(district: str) -> str:
+    # Lookups are in-memory; only the first call loads the table from disk.
+    if soil_store_resource.ready:
+        return get_soil_data(district)
+    return await asyncio.to_thread(get_soil_data, district)
+
+soil_info_tool = Tool(
+    name="SoilInfo",
+    func=get_soil_data,
+    coroutine=aget_soil_data,
+    description="Returns the average soil nitrogen (N), phosphorous (P), potassium (K) and pH of an Indian district. Input should be the district name, e.g. 'Paschim Medinipur'; minor misspellings are tolerated."
+)
+
+# Offered to the agent only when the soil table has been built (python -m app.vector_db);
+# otherwise every call would just report the table as missing.
+SOIL_INFO_ENABLED = has_soil_data()
+if not SOIL_INFO_ENABLED:
+    logger.info("Soil table not built; the SoilInfo tool is disabled.")
+
 
-all_tools = [crop_info_tool, weather_tool, market_info_tool,crop_disease_classifier]
\ No newline at end of file
+all_tools = [crop_info_tool, weather_tool, market_info_tool, crop_disease_classifier]
+if SOIL_INFO_ENABLED:
+    all_tools.append(soil_info_tool)
\ No newline at end of file
@@ -0,0 +1,251 @@
+# backend/app/uploads.py
+import os
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import anyio
+from fastapi import UploadFile
+from PIL import Image
+
+from .imaging import decode_image, prepare_image, dhash
+from .limits import offload
+
+# --- Basic Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+UPLOAD_DIR = "uploads"
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 256 * 1024
+THUMBNAIL_SUFFIX = ".thumb.png"
+PREPARED_CACHE_ENTRIES = int(os.getenv("PREPARED_CACHE_ENTRIES", "64"))
+# Retention policy for UPLOAD_DIR: files older than UPLOAD_RETENTION_DAYS are
+# removed, then the least recently used ones until the total fits UPLOAD_MAX_TOTAL_BYTES.
+UPLOAD_RETENTION_DAYS = float(os.getenv("UPLOAD_RETENTION_DAYS", "30"))
+UPLOAD_MAX_TOTAL_BYTES = int(os.getenv("UPLOAD_MAX_TOTAL_BYTES", str(2 * 1024 * 1024 * 1024)))
+UPLOAD_PRUNE_INTERVAL_SECONDS = float(os.getenv("UPLOAD_PRUNE_INTERVAL_SECONDS", "3600"))
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class InvalidImage(Exception):
+    pass
+
+
+@dataclass
+class StoredUpload:
+    file_name: str
+    path: str
+    url: str
+    size_bytes: int
+    thumbnail: Image.Image
+    sha256: str
+    phash: int
+    duplicate: bool = False
+
+
+class PreparedImageCache:
+    """
+    Small LRU of decoded, classifier-ready 224px images keyed by upload file
+    name, so `crop_disease_classifier` gets the image in-process instead of
+    re-reading and re-decoding the original from disk.
+    """
+
+    def __init__(self, max_entries: int = PREPARED_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, file_name: str, image: Image.Image):
+        with self._lock:
+            self._images[file_name] = image
+            self._images.move_to_end(file_name)
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+
+    def get(self, file_name: str):
+        with self._lock:
+            image = self._images.get(file_name)
+            if image is not None:
+                self._images.move_to_end(file_name)
+            return image
+
+
+prepared_images = PreparedImageCache()
+
+
+def thumbnail_path(path: str) -> str:
+    return os.path.splitext(path)[0] + THUMBNAIL_SUFFIX
+
+
+async def _stream_to_disk(upload: UploadFile, tmp_path: str) -> tuple:
+    """
+    Writes the upload in chunks with async file I/O, enforcing MAX_UPLOAD_BYTES
+    and hashing the content on the way.
+
+    Returns:
+        tuple: (size in bytes, sha256 hex digest)
+    """
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        async with await anyio.open_file(tmp_path, "wb") as f:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadTooLarge(f"Image exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit.")
+                digest.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size, digest.hexdigest()
+
+
+def _make_thumbnail(path: str) -> Image.Image:
+    try:
+        thumbnail = prepare_image(decode_image(path))
+    except Exception as e:
+        raise InvalidImage(f"Uploaded file is not a readable image: {e}")
+    thumbnail.save(thumbnail_path(path), format="PNG")
+    return thumbnail
+
+
+def _load_thumbnail(path: str):
+    try:
+        with Image.open(thumbnail_path(path)) as f:
+            return f.convert("RGB")
+    except FileNotFoundError:
+        # Never written, or pruned: the caller rebuilds it
+        return None
+
+
+async def save_upload(upload: UploadFile, upload_dir: str = UPLOAD_DIR) -> StoredUpload:
+    """
+    Streams an uploaded image to `upload_dir` under its content hash, then
+    immediately downscales it into a 224px classifier-ready thumbnail stored
+    next to the original and kept in memory for the classifier. A photo that
+    was already uploaded is stored once, and its thumbnail is reused.
+
+    Raises:
+        UploadTooLarge: if the upload exceeds MAX_UPLOAD_BYTES.
+        InvalidImage: if the upload cannot be decoded as an image.
+    """
+    file_ext = (os.path.splitext(upload.filename or "")[1] or ".png").lower()
+    tmp_path = os.path.join(upload_dir, f"{uuid.uuid4()}.part")
+
+    size, sha256 = await _stream_to_disk(upload, tmp_path)
+    file_name = f"{sha256}{file_ext}"
+    path = os.path.join(upload_dir, file_name)
+
+    duplicate = os.path.exists(path)
+    # Always move the new copy into place: for a re-sent photo the bytes are
+    # identical and the fresh mtime keeps it from retention. This is also
+    # safe if prune_uploads removes the original in the meantime.
+    os.replace(tmp_path, path)
+    thumbnail = None
+    if duplicate:
+        thumbnail = prepared_images.get(file_name) or await offload("classifier", _load_thumbnail, path)
+    if thumbnail is None:
+        try:
+            thumbnail = await offload("classifier", _make_thumbnail, path)
+        except InvalidImage:
+            os.remove(path)
+            raise
+
+    prepared_images.put(file_name, thumbnail)
+    return StoredUpload(
+        file_name=file_name,
+        path=path,
+        url=f"/uploads/{file_name}",
+        size_bytes=size,
+        thumbnail=thumbnail,
+        sha256=sha256,
+        phash=dhash(thumbnail),
+        duplicate=duplicate,
+    )
+
+
+def content_hash_of(image_ref: str):
+    """Returns the sha256 encoded in a content-addressed upload reference, or None."""
+    stem = os.path.splitext(os.path.basename(image_ref.split("?", 1)[0]))[0]
+    if len(stem) == 64 and all(c in "0123456789abcdef" for c in stem):
+        return stem
+    return None
+
+
+def prune_uploads(
+    upload_dir: str = UPLOAD_DIR,
+    max_age_days: float = UPLOAD_RETENTION_DAYS,
+    max_total_bytes: int = UPLOAD_MAX_TOTAL_BYTES,
+) -> dict:
+    """
+    Applies the retention policy to `upload_dir`. Originals and their
+    thumbnails are removed together; stale `.part` files are cleaned up too.
+
+    Returns:
+        dict: number of removed files and bytes freed.
+    """
+    now = time.time()
+    groups = {}
+    removed, freed = 0, 0
+    for entry in os.scandir(upload_dir):
+        if not entry.is_file():
+            continue
+        stat = entry.stat()
+        if entry.name.endswith(".part"):
+            if now - stat.st_mtime > 3600:
+                os.remove(entry.path)
+                removed += 1
+                freed += stat.st_size
+            continue
+        stem = entry.name[: -len(THUMBNAIL_SUFFIX)] if entry.name.endswith(THUMBNAIL_SUFFIX) else os.path.splitext(entry.name)[0]
+        group = groups.setdefault(stem, {"paths": [], "size": 0, "mtime": 0.0})
+        group["paths"].append(entry.path)
+        group["size"] += stat.st_size
+        group["mtime"] = max(group["mtime"], stat.st_mtime)
+
+    cutoff = now - max_age_days * 86400
+    total = sum(g["size"] for g in groups.values())
+    for stem, group in sorted(groups.items(), key=lambda item: item[1]["mtime"]):
+        if group["mtime"] >= cutoff and total <= max_total_bytes:
+            break
+        for path in group["paths"]:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        total -= group["size"]
+        freed += group["size"]
+
+    if removed:
+        logger.info(f"Upload retention removed {removed} files ({freed / 1e6:.1f} MB) from '{upload_dir}'.")
+    return {"removed_files": removed, "freed_bytes": freed}
+
+
+def get_prepared_image(image_ref: str):
+    """
+    Returns the prepared 224px image for an upload reference such as
+    "/uploads/<name>.jpg", from memory or from its stored thumbnail, or None.
+    """
+    file_name = os.path.basename(image_ref.split("?", 1)[0])
+    image = prepared_images.get(file_name)
+    if image is not None:
+        return image
+
+    image = _load_thumbnail(os.path.join(UPLOAD_DIR, file_name))
+    if image is not None:
+        prepared_images.put(file_name, image)
+    return image
@@ -14,62 +14,56 @@ from langchain_community.document_loaders import (
 import pandas as pd
 # from app.tools import load_documents_from_directories # Import the loader from your existing file
 import os
+import json
+import time
+import glob
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from langchain_community.docstore.in_memory import InMemoryDocstore
+import numpy as np
+from .index_store import export_compact_docstore, create_index, INDEX_TYPE, INDEX_TYPES
+from .soil import SOIL_CSV_DIR, SOIL_DB_PATH, read_soil_csvs, aggregate_soil, build_soil_store
 # --- Configuration ---
-INDEX_PATH = "faiss_index"
+# Same location `tools.create_retrieval_tool` loads the index from
+INDEX_PATH = os.path.join(os.path.dirname(__file__), "data", "faiss_index")
+MANIFEST_FILE = "manifest.json"
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))
+SOIL_SOURCE_KEY = "csvs/soil"
 
 # Setup logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 def load_soil_documents():
     """
-    Loads soil CSVs from 'data/soil_csvs' and converts each row to a Document.
+    Loads soil CSVs from 'data/csvs' and converts each district's averages to a Document.
     """
-    soil_folder = os.path.join(os.path.dirname(__file__), "data", "csvs")
-    if not os.path.exists(soil_folder):
-        logger.warning(f"No soil data folder found at '{soil_folder}'")
+    soil_files = _soil_files()
+    if not soil_files:
+        logger.warning(f"No soil CSV files found in '{SOIL_CSV_DIR}'.")
         return []
 
-    all_files = [os.path.join(soil_folder, f) for f in os.listdir(soil_folder) if f.endswith(".csv")]
-    if not all_files:
-        logger.warning("No soil CSV files found.")
+    df = aggregate_soil(read_soil_csvs(soil_files))
+    if df.empty:
         return []
 
-    dfs = []
-    for file in all_files:
-        try:
-            df = pd.read_csv(file)
-            dfs.append(df)
-            logger.info(f"Loaded {len(df)} soil rows from '{file}'")
-        except Exception as e:
-            logger.error(f"Failed to read '{file}': {e}")
-
-    if not dfs:
-        return []
-
-    df = pd.concat(dfs, ignore_index=True)
-    required_columns = ["district", "Nitrogen", "Phosphorous", "Potassium", "pH"]
-    for col in required_columns:
-        if col not in df.columns:
-            raise ValueError(f"Missing required column: {col}")
-
-    # Average multiple rows per district
-    df = df.groupby("district", as_index=False).mean()
-
-    documents = []
-    for _, row in df.iterrows():
-        content = f"Soil data for {row['district']}: N={row['Nitrogen']}, P={row['Phosphorous']}, K={row['Potassium']}, pH={row['pH']}"
-        metadata = {
-            "district": row["district"],
-            "N": row["Nitrogen"],
-            "P": row["Phosphorous"],
-            "K": row["Potassium"],
-            "pH": row["pH"]
-        }
-        documents.append(Document(page_content=content, metadata=metadata))
-
-    return documents
+    # Vectorized: build all sentences and metadata dicts column-wise
+    contents = (
+        "Soil data for " + df["district"].astype(str)
+        + ": N=" + df["Nitrogen"].astype(str)
+        + ", P=" + df["Phosphorous"].astype(str)
+        + ", K=" + df["Potassium"].astype(str)
+        + ", pH=" + df["pH"].astype(str)
+    )
+    metadatas = df.rename(columns={"Nitrogen": "N", "Phosphorous": "P", "Potassium": "K"})[
+        ["district", "N", "P", "K", "pH"]
+    ].to_dict("records")
+    return [Document(page_content=content, metadata=metadata) for content, metadata in zip(contents, metadatas)]
 
 def load_documents_from_directories():
     """
@@ -104,37 +98,214 @@ def load_documents_from_directories():
     return all_docs
 
 
-def build_index():
+def _data_path() -> str:
+    return os.path.join(os.path.dirname(__file__), "data")
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _chunk_id_prefix(source_key: str, digest: str) -> str:
+    # Path and content both: two files with identical bytes must not share docstore ids
+    return hashlib.sha256(f"{source_key}\0{digest}".encode()).hexdigest()[:16]
+
+def _pdf_files() -> list:
+    return sorted(glob.glob(os.path.join(_data_path(), "pdfs", "**", "*.pdf"), recursive=True))
+
+def _soil_files() -> list:
+    return sorted(glob.glob(os.path.join(SOIL_CSV_DIR, "*.csv")))
+
+def scan_sources() -> dict:
+    """
+    Returns `{source_key: content_hash}` for every indexable source. The soil
+    CSVs are aggregated together by district, so they form a single source.
+    """
+    base = _data_path()
+    sources = {os.path.relpath(path, base): _file_hash(path) for path in _pdf_files()}
+    soil_files = _soil_files()
+    if soil_files:
+        combined = hashlib.sha256("".join(_file_hash(path) for path in soil_files).encode())
+        sources[SOIL_SOURCE_KEY] = combined.hexdigest()
+    return sources
+
+def load_source(source_key: str) -> list:
+    """Loads the documents of a single source returned by `scan_sources`."""
+    if source_key == SOIL_SOURCE_KEY:
+        return load_soil_documents()
+    path = os.path.join(_data_path(), source_key)
+    return PyPDFLoader(path).load()
+
+def _load_manifest(index_path: str):
+    path = os.path.join(index_path, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+def _save_manifest(index_path: str, manifest: dict):
+    path = os.path.join(index_path, MANIFEST_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+# --- Parallel Embedding ---
+# Each worker process loads its own copy of the embedding model once.
+_worker_embeddings = None
+
+def _init_embed_worker(model_name: str, threads: int):
+    global _worker_embeddings
+    import torch
+    torch.set_num_threads(threads)
+    _worker_embeddings = HuggingFaceEmbeddings(model_name=model_name)
+
+def _embed_batch(texts: list) -> list:
+    return _worker_embeddings.embed_documents(texts)
+
+def embed_texts(texts: list, embeddings: HuggingFaceEmbeddings, batch_size: int = EMBED_BATCH_SIZE, workers: int = EMBED_WORKERS) -> list:
     """
-    Loads documents, creates embeddings, builds a FAISS index, 
-    and saves it to disk. This is a one-time setup process.
+    Embeds `texts` in batches of `batch_size`, spread across `workers` processes
+    when `workers > 1`. The output order matches the input order.
+    """
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if workers <= 1 or len(batches) <= 1:
+        return [vector for batch in batches for vector in embeddings.embed_documents(batch)]
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # Spawn, not fork: the parent already holds torch and its thread pools
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_embed_worker,
+        initargs=(MODEL_NAME, threads),
+    ) as pool:
+        return [vector for batch in pool.map(_embed_batch, batches) for vector in batch]
+
+def build_index(full: bool = False, batch_size: int = EMBED_BATCH_SIZE, workers: int = EMBED_WORKERS, index_path: str = INDEX_PATH, index_type: str = INDEX_TYPE) -> dict:
+    """
+    Builds or incrementally updates the FAISS index on disk.
+
+    A manifest of source content hashes is stored next to the index. Only new
+    or changed sources are loaded, split and embedded; chunks of changed or
+    deleted sources are removed from the existing index. `full=True` (or a
+    missing manifest / changed embedding model or index type) rebuilds from scratch.
+
+    `index_type` selects the FAISS index ("flat", "ivf-flat", "hnsw", "ivf-pq");
+    IVF and PQ quantizers are trained on the corpus during a full build.
+
+    Returns:
+        dict: per-stage timings in seconds plus counts of processed sources and chunks.
     """
     logger.info("Starting index build process...")
+    timings = {"load": 0.0, "split": 0.0, "embed": 0.0, "index": 0.0}
+    settings = {
+        "model": MODEL_NAME, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP,
+        "index_type": index_type, "chunk_ids": "source",
+    }
 
-    # 1. Load documents from your data directories
-    logger.info("Loading documents...")
-    docs = load_soil_documents()
-    docs_to_process = load_documents_from_directories()+docs
-    if not docs_to_process:
-        logger.error("No documents found. Aborting index creation.")
-        return
+    manifest = None if full else _load_manifest(index_path)
+    # Manifests written before index types existed describe flat indexes. Older
+    # manifests also lack "chunk_ids": their content-only ids could collide, so rebuild.
+    if manifest and {"index_type": "flat", **manifest.get("settings", {})} != settings:
+        logger.info("Embedding model, chunking settings or index type changed; doing a full rebuild.")
+        manifest = None
+    incremental = manifest is not None and os.path.exists(os.path.join(index_path, "index.faiss"))
+    previous = manifest["sources"] if incremental else {}
+
+    # 1. Work out which sources need (re-)processing
+    current = scan_sources()
+    changed = [key for key, digest in current.items() if previous.get(key, {}).get("hash") != digest]
+    removed = [key for key in previous if key not in current or key in changed]
+    logger.info(
+        f"{len(current)} sources found: {len(changed)} new/changed, "
+        f"{len([k for k in previous if k not in current])} deleted."
+    )
 
-    # 2. Split the documents into chunks
-    logger.info(f"Splitting {len(docs_to_process)} documents into chunks...")
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
-    split_docs = splitter.split_documents(docs_to_process)
-    logger.info(f"Documents split into {len(split_docs)} chunks.")
+    # The structured soil table behind the SoilInfo tool follows the same CSVs
+    if SOIL_SOURCE_KEY in current and (SOIL_SOURCE_KEY in changed or not os.path.exists(SOIL_DB_PATH)):
+        build_soil_store(_soil_files())
 
-    # 3. Initialize the embedding model
+    built_type = manifest.get("built_index_type", "flat") if incremental else index_type
+    if incremental and removed and built_type != "flat":
+        # IVF ids are not compacted on removal and HNSW cannot remove at all,
+        # so LangChain's position bookkeeping only survives deletes on flat indexes.
+        logger.info(f"'{built_type}' indexes cannot delete vectors in place; doing a full rebuild.")
+        incremental, previous = False, {}
+        changed, removed = list(current), []
+
+    if incremental and not changed and not removed:
+        logger.info("✅ FAISS index is already up to date.")
+        return {**timings, "sources": 0, "chunks": 0}
+
+    # 2. Load the documents of new/changed sources in parallel
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(8, max(1, len(changed)))) as pool:
+        loaded = dict(zip(changed, pool.map(load_source, changed)))
+    timings["load"] = time.perf_counter() - started
+
+    # 3. Split the documents into chunks with stable, per-source ids
+    started = time.perf_counter()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    texts, metadatas, ids = [], [], []
+    new_sources = {}
+    for key in changed:
+        chunks = splitter.split_documents(loaded[key])
+        chunk_ids = [f"{_chunk_id_prefix(key, current[key])}-{i}" for i in range(len(chunks))]
+        new_sources[key] = {"hash": current[key], "chunk_ids": chunk_ids}
+        texts.extend(chunk.page_content for chunk in chunks)
+        metadatas.extend(chunk.metadata for chunk in chunks)
+        ids.extend(chunk_ids)
+    timings["split"] = time.perf_counter() - started
+    logger.info(f"{len(changed)} sources split into {len(texts)} chunks.")
+
+    if not incremental and not texts:
+        logger.error("No documents found. Aborting index creation.")
+        return {**timings, "sources": 0, "chunks": 0}
+
+    # 4. Embed the new chunks in batches
+    started = time.perf_counter()
     logger.info(f"Initializing embedding model: {MODEL_NAME}")
     embeddings = HuggingFaceEmbeddings(model_name=MODEL_NAME)
+    vectors = embed_texts(texts, embeddings, batch_size=batch_size, workers=workers) if texts else []
+    timings["embed"] = time.perf_counter() - started
+
+    # 5. Merge into the existing index (or create a new one) and save it
+    started = time.perf_counter()
+    if incremental:
+        db = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+        stale_ids = [chunk_id for key in removed for chunk_id in previous[key]["chunk_ids"]]
+        if stale_ids:
+            db.delete(stale_ids)
+        if texts:
+            db.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+    else:
+        index, built_type = create_index(index_type, np.asarray(vectors, dtype=np.float32))
+        db = FAISS(embeddings, index, InMemoryDocstore(), {})
+        db.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+    db.save_local(index_path)
+    # Lazily readable docstore used by the compact (memory-mapped) loading path
+    export_compact_docstore(db, index_path)
+
+    sources = {key: value for key, value in previous.items() if key in current and key not in changed}
+    sources.update(new_sources)
+    _save_manifest(index_path, {"settings": settings, "built_index_type": built_type, "sources": sources})
+    timings["index"] = time.perf_counter() - started
 
-    # 4. Create FAISS index from documents and save it
-    logger.info("Creating FAISS vector store... This may take a while.")
-    db = FAISS.from_documents(split_docs, embeddings)
-    db.save_local(INDEX_PATH)
-    
-    logger.info(f"✅ FAISS index has been successfully created and saved to '{INDEX_PATH}'")
+    logger.info(
+        "Stage timings: " + ", ".join(f"{stage}={seconds:.2f}s" for stage, seconds in timings.items())
+    )
+    logger.info(f"✅ FAISS index has been successfully {'updated' if incremental else 'created'} and saved to '{index_path}'")
+    return {**timings, "sources": len(changed), "chunks": len(texts)}
 
 if __name__ == "__main__":
-    build_index()
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Build or incrementally update the FAISS knowledge base index.")
+    parser.add_argument("--full", action="store_true", help="Rebuild the whole index from scratch.")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks per embedding batch.")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS, help="Embedding worker processes.")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=INDEX_TYPE, help="FAISS index type.")
+    args = parser.parse_args()
+    build_index(full=args.full, batch_size=args.batch_size, workers=args.workers, index_type=args.index_type)
@@ -0,0 +1,97 @@
+# backend/benchmarks/chat_load.py
+"""
+Concurrent load test for the /chat endpoint.
+
+Fires `--requests` chat calls at a running backend with `--concurrency` calls in
+flight and reports throughput and latency percentiles. To compare the blocking
+and the async pipeline, run it once against a server started from each revision
+with identical settings:
+
+    cd backend
+    python -m app.main                      # in another terminal
+    python benchmarks/chat_load.py --concurrency 1 --requests 20
+    python benchmarks/chat_load.py --concurrency 20 --requests 200
+"""
+import time
+import asyncio
+import argparse
+import statistics
+
+import httpx
+
+DEFAULT_QUERIES = [
+    "What is the weather in Kharagpur this week?",
+    "Latest market price of rice in West Bengal",
+    "How do I control late blight in potato?",
+    "Best fertilizer for paddy in monsoon",
+]
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _one_request(client: httpx.AsyncClient, url: str, i: int, queries: list) -> tuple:
+    data = {"session_id": f"load-test-{i}", "text": queries[i % len(queries)]}
+    started = time.perf_counter()
+    try:
+        response = await client.post(url, data=data)
+        ok = response.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    return ok, (time.perf_counter() - started) * 1000
+
+
+async def run_load_test(base_url: str, concurrency: int, total: int, queries: list = None) -> dict:
+    """
+    Sends `total` requests to `<base_url>/chat` with at most `concurrency` in flight.
+
+    Returns:
+        dict: throughput and latency summary for the run.
+    """
+    queries = queries or DEFAULT_QUERIES
+    semaphore = asyncio.Semaphore(concurrency)
+    url = f"{base_url.rstrip('/')}/chat"
+
+    async with httpx.AsyncClient(timeout=None) as client:
+        async def bounded(i):
+            async with semaphore:
+                return await _one_request(client, url, i, queries)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(bounded(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies = [ms for ok, ms in results if ok]
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "succeeded": len(latencies),
+        "failed": total - len(latencies),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "mean_ms": round(statistics.mean(latencies), 1) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for /chat.")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=100)
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_load_test(args.url, args.concurrency, args.requests))
+    for key, value in summary.items():
+        print(f"{key:>15}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# backend/benchmarks/classifier_backends.py
+"""
+Accuracy parity and speed of the disease classifier backends.
+
+Runs every available backend (torch, onnx, onnx-int8) over a local sample set
+of leaf photos and reports, per backend:
+
+    top1_agree   share of images whose top-1 label matches the PyTorch model
+    max_prob_dp  largest absolute difference in any class probability vs PyTorch
+    p50_ms/img   per-image latency at batch size 1
+    imgs/s       throughput at --batch-size
+    model_MB     size of the model file on disk
+    rss_MB       resident memory added by loading the backend
+
+Export the ONNX variants first:
+
+    cd backend
+    python -m app.classifier_backends export --calibration-dir uploads
+    python benchmarks/classifier_backends.py --images uploads
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import statistics
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.classifier_backends import (  # noqa: E402
+    BACKENDS,
+    MODEL_PATH,
+    ONNX_FILE,
+    ONNX_INT8_FILE,
+    load_backend,
+    preprocess,
+)
+from app.imaging import decode_image  # noqa: E402
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def model_size_mb(name: str) -> float:
+    if name == "torch":
+        files = glob.glob(os.path.join(MODEL_PATH, "*.safetensors")) + glob.glob(os.path.join(MODEL_PATH, "*.bin"))
+    else:
+        files = [os.path.join(MODEL_PATH, ONNX_INT8_FILE if name == "onnx-int8" else ONNX_FILE)]
+    return sum(os.path.getsize(f) for f in files if os.path.exists(f)) / 1e6
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    probs = np.exp(logits)
+    return probs / probs.sum(axis=-1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare classifier backends.")
+    parser.add_argument("--images", default="uploads", help="Directory of sample leaf images.")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    paths = sorted(
+        p for p in glob.glob(os.path.join(args.images, "*"))
+        if not p.endswith((".part", ".thumb.png"))
+    )[: args.limit]
+    if not paths:
+        sys.exit(f"No sample images found in '{args.images}'.")
+    pixels = preprocess([decode_image(p) for p in paths])
+    print(f"{len(paths)} sample images from '{args.images}'\n")
+
+    reference = None
+    print(f"{'backend':>10} {'top1_agree':>11} {'max_prob_dp':>12} {'p50_ms/img':>11} {'imgs/s':>8} {'model_MB':>9} {'rss_MB':>7}")
+    for name in BACKENDS:
+        rss_before = rss_mb()
+        try:
+            backend = load_backend(name, threads=os.cpu_count())
+        except (FileNotFoundError, ImportError) as e:
+            print(f"{name:>10}  skipped: {e}")
+            continue
+        rss_added = rss_mb() - rss_before
+
+        probs = softmax(np.concatenate([
+            backend.forward(pixels[i:i + args.batch_size]) for i in range(0, len(pixels), args.batch_size)
+        ]))
+        if reference is None:
+            reference = probs
+        agree = float(np.mean(probs.argmax(-1) == reference.argmax(-1)))
+        max_dp = float(np.abs(probs - reference).max())
+
+        single = []
+        for i in range(len(pixels)):
+            started = time.perf_counter()
+            backend.forward(pixels[i:i + 1])
+            single.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        for _ in range(args.repeats):
+            for i in range(0, len(pixels), args.batch_size):
+                backend.forward(pixels[i:i + args.batch_size])
+        throughput = args.repeats * len(pixels) / (time.perf_counter() - started)
+
+        print(
+            f"{name:>10} {agree:>11.3f} {max_dp:>12.4f} {statistics.median(single):>11.2f} "
+            f"{throughput:>8.1f} {model_size_mb(name):>9.1f} {rss_added:>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# backend/benchmarks/fakes.py
+"""
+Offline stand-in for Gemini: a deterministic tool-calling chat model.
+
+On the first agent step it requests the tools a real model would pick for the
+input (crop_disease_classifier for an uploaded image, WeatherInfo for weather
+questions, MarketInfo for prices, SoilInfo for soil, CropInfoRetriever
+otherwise), all in one step so they run concurrently; once tool results are in
+the scratchpad it writes a final answer from them. Each call sleeps for
+`latency_ms` (plus `ms_per_1k_tokens` per 1000 prompt tokens) so the agent
+loop sees realistic model latency, and reports token usage like Gemini does.
+"""
+import re
+import json
+import time
+import asyncio
+import itertools
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+_IMAGE = re.compile(r"\[Image available at: (\S+)\]")
+_LOCATION = re.compile(r"User's location: (.+)")
+_COMMODITIES = ("rice", "paddy", "wheat", "potato", "onion", "tomato", "jute", "mustard")
+_call_ids = itertools.count(1)
+
+
+def _estimate_tokens(messages) -> int:
+    return max(1, sum(len(str(message.content)) for message in messages) // 4)
+
+
+class FakeToolCallingModel(BaseChatModel):
+    latency_ms: float = 300.0
+    ms_per_1k_tokens: float = 50.0
+    tool_names: list = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-tool-calling"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"tool_names": [tool.name for tool in tools]})
+
+    def _plan_tool_calls(self, text: str) -> list:
+        lowered = text.lower()
+        calls = []
+
+        def call(name, value):
+            if name in self.tool_names:
+                calls.append({"name": name, "args": {"__arg1": value}, "id": f"call_{next(_call_ids)}"})
+
+        image = _IMAGE.search(text)
+        if image:
+            call("crop_disease_classifier", image.group(1))
+        if any(word in lowered for word in ("weather", "rain", "forecast", "temperature")):
+            location = _LOCATION.search(text)
+            call("WeatherInfo", location.group(1).strip() if location else "Kharagpur")
+        if any(word in lowered for word in ("price", "market", "mandi")):
+            commodity = next((c for c in _COMMODITIES if c in lowered), "rice")
+            call("MarketInfo", json.dumps({"commodity": commodity, "state": "West Bengal"}))
+        if "soil" in lowered:
+            call("SoilInfo", "Paschim Medinipur")
+        if not calls and not image:
+            question = text.split("\n", 1)[-1].strip() or text
+            call("CropInfoRetriever", json.dumps({"query": question}))
+        return calls
+
+    def _respond(self, messages) -> AIMessage:
+        last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+        tool_results = [m for m in messages[last_human + 1:] if isinstance(m, ToolMessage)]
+        prompt_tokens = _estimate_tokens(messages)
+
+        calls = []
+        if self.tool_names and not tool_results and last_human >= 0:
+            calls = self._plan_tool_calls(str(messages[last_human].content))
+        if calls:
+            message = AIMessage(content="", tool_calls=calls)
+        else:
+            summary = "; ".join(f"{m.name}: {str(m.content)[:80]}" for m in tool_results) or "general advice"
+            message = AIMessage(content=f"Here is what I found. {summary}")
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": max(1, len(str(message.content)) // 4) + 20 * len(calls),
+            "total_tokens": prompt_tokens + max(1, len(str(message.content)) // 4) + 20 * len(calls),
+        }
+        return message
+
+    def _delay(self, messages) -> float:
+        return (self.latency_ms + self.ms_per_1k_tokens * _estimate_tokens(messages) / 1000) / 1000
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._delay(messages))
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._delay(messages))
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+
+def install_fake_llm(main_module, latency_ms: float = 300.0, ms_per_1k_tokens: float = 50.0):
+    """
+    Swaps Gemini out of an imported `app.main` for `FakeToolCallingModel`,
+    rebuilding the agent with the module's own prompt, tools and executor class.
+    """
+    from langchain.agents import create_tool_calling_agent
+
+    llm = FakeToolCallingModel(latency_ms=latency_ms, ms_per_1k_tokens=ms_per_1k_tokens)
+    executor = main_module.agent_executor
+    main_module.llm = llm
+    main_module.agent_executor = type(executor)(
+        agent=create_tool_calling_agent(llm, main_module.tools, main_module.prompt),
+        tools=main_module.tools,
+        handle_parsing_errors=True,
+        return_intermediate_steps=True,
+    )
+    return llm
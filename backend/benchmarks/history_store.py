@@ -0,0 +1,81 @@
+# backend/benchmarks/history_store.py
+"""
+Memory and latency of the session history backends over many sessions.
+
+Simulates `--sessions` farmers having `--turns` exchanges each (interleaved,
+like real traffic) and reports, every `--report-every` sessions, the traced
+Python heap, process RSS and per-operation latency. With bounded stores the
+memory column should stay flat once `HISTORY_MAX_SESSIONS` is reached.
+
+    cd backend
+    python benchmarks/history_store.py --backend memory --sessions 20000
+    python benchmarks/history_store.py --backend sqlite --sessions 20000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import resource
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.history import InMemoryHistoryStore, SQLiteHistoryStore, to_agent_messages  # noqa: E402
+
+QUESTION = "What is the best fertilizer schedule for paddy during the monsoon in Paschim Medinipur?"
+ANSWER = "Apply a basal dose of NPK followed by two top dressings of urea. " * 8
+
+
+def rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark session history backends.")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--max-sessions", type=int, default=2000)
+    parser.add_argument("--report-every", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.backend == "sqlite":
+        db_path = os.path.join(tempfile.mkdtemp(), "history.db")
+        store = SQLiteHistoryStore(path=db_path)
+    else:
+        store = InMemoryHistoryStore(max_sessions=args.max_sessions)
+
+    tracemalloc.start()
+    load_ms, append_ms = [], []
+    print(f"{'sessions':>9} {'heap_MB':>8} {'rss_MB':>8} {'load_p50':>9} {'append_p50':>11} {'stored':>8}")
+    for i in range(args.sessions):
+        session_id = f"session-{i}"
+        for _ in range(args.turns):
+            # Revisit a recent session now and then, like a farmer coming back
+            target = session_id if random.random() > 0.2 else f"session-{random.randint(max(0, i - 50), i)}"
+            started = time.perf_counter()
+            to_agent_messages(store.load(target))
+            load_ms.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            store.append(target, QUESTION, ANSWER)
+            append_ms.append((time.perf_counter() - started) * 1000)
+
+        if (i + 1) % args.report_every == 0:
+            heap_mb = tracemalloc.get_traced_memory()[0] / 1e6
+            load_ms.sort()
+            append_ms.sort()
+            stats = store.stats()
+            print(
+                f"{i + 1:>9} {heap_mb:>8.1f} {rss_mb():>8.1f} "
+                f"{load_ms[len(load_ms) // 2]:>8.3f}ms {append_ms[len(append_ms) // 2]:>10.3f}ms "
+                f"{stats['sessions']:>8}"
+            )
+            load_ms, append_ms = [], []
+
+
+if __name__ == "__main__":
+    main()
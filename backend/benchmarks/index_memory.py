@@ -0,0 +1,119 @@
+# backend/benchmarks/index_memory.py
+"""
+Per-worker memory of the FAISS index under each way of opening it.
+
+Builds a synthetic index of every INDEX_TYPE, then opens it in several
+processes at once (like uvicorn workers) with each read mode and reports,
+per worker, after a round of searches has touched the whole index:
+
+    rss_MB      resident memory added by opening + searching
+    private_MB  memory only this worker holds (what N workers multiply)
+    shared_MB   pages shared with the other workers (the page cache)
+    pss_MB      proportional set size added (shared pages split across workers)
+
+    cd backend
+    python benchmarks/index_memory.py --vectors 200000 --workers 4
+"""
+import os
+import sys
+import tempfile
+import argparse
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss  # noqa: E402
+import numpy as np  # noqa: E402
+
+from app.index_store import INDEX_TYPES, create_index  # noqa: E402
+
+DIM = 384  # all-MiniLM-L6-v2
+MODES = {"heap": 0, "mmap": faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY}
+if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+    MODES["mmap-ifc"] = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+
+
+def smaps_mb() -> dict:
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+        "shared": fields["Shared_Clean"] + fields["Shared_Dirty"],
+    }
+
+
+def _worker(path: str, flags: int, queries: np.ndarray, barrier, results):
+    faiss.omp_set_num_threads(1)
+    before = smaps_mb()
+    try:
+        index = faiss.read_index(path, flags) if flags else faiss.read_index(path)
+    except RuntimeError as e:
+        results.put({"error": str(e).splitlines()[0]})
+        barrier.abort()
+        return
+    if hasattr(index, "nprobe"):
+        index.nprobe = index.nlist  # visit every list so all codes are paged in
+    index.search(queries, 10)
+    # Measure while every worker still has the index open
+    barrier.wait()
+    after = smaps_mb()
+    results.put({key: after[key] - before[key] for key in after})
+    barrier.wait()
+
+
+def measure(path: str, flags: int, workers: int, queries: np.ndarray) -> dict:
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=_worker, args=(path, flags, queries, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    errors = [s["error"] for s in samples if "error" in s]
+    if errors:
+        return {"error": errors[0]}
+    return {key: sum(s[key] for s in samples) / len(samples) for key in samples[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory of the FAISS index by read mode.")
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.vectors, DIM), dtype=np.float32)
+    queries = rng.standard_normal((32, DIM), dtype=np.float32)
+    print(f"faiss {faiss.__version__}, {args.vectors} x {DIM} vectors ({vectors.nbytes / 2**20:.0f} MB raw), {args.workers} workers")
+    print(f"{'index':>9} {'mode':>9} {'file_MB':>8} {'rss_MB':>8} {'private_MB':>11} {'shared_MB':>10} {'pss_MB':>8}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for index_type in args.types:
+            index, built = create_index(index_type, vectors)
+            index.add(vectors)
+            path = os.path.join(tmp, f"{index_type}.faiss")
+            faiss.write_index(index, path)
+            del index
+            file_mb = os.path.getsize(path) / 2**20
+            for mode, flags in MODES.items():
+                row = measure(path, flags, args.workers, queries)
+                if "error" in row:
+                    print(f"{built:>9} {mode:>9} {file_mb:>8.1f}   unsupported: {row['error'][:60]}")
+                    continue
+                print(
+                    f"{built:>9} {mode:>9} {file_mb:>8.1f} {row['rss']:>8.1f} {row['private']:>11.1f} "
+                    f"{row['shared']:>10.1f} {row['pss']:>8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# backend/benchmarks/index_recall.py
+"""
+Recall@k vs latency vs memory of the FAISS index types.
+
+Takes the vectors of the built knowledge-base index, optionally grows them into
+a larger synthetic corpus (`--scale`, jittered copies) to mimic more state-level
+PDFs, and builds every index type from `app.index_store.create_index` over the
+same data. Exact flat search is the ground truth. For each index type and
+search setting it reports:
+
+    recall@k   share of the exact top-k neighbours the index returns
+    p50_ms     single-query search latency
+    qps        throughput of one batched search over all queries
+    size_MB    serialized index size (what is mmapped / held in RAM)
+    build_s    training + add time
+
+    cd backend
+    python -m app.vector_db --full
+    python benchmarks/index_recall.py --scale 20 --k 3
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.index_store import FAISS_FILE, create_index, tune_index  # noqa: E402
+from app.vector_db import INDEX_PATH  # noqa: E402
+
+NPROBE_SWEEP = (1, 4, 16, 64)
+EF_SEARCH_SWEEP = (16, 64, 256)
+
+
+def load_corpus(index_path: str, scale: int, noise: float, rng) -> np.ndarray:
+    index = tune_index(faiss.read_index(os.path.join(index_path, FAISS_FILE)))
+    vectors = index.reconstruct_n(0, index.ntotal)
+    if scale > 1:
+        copies = [vectors] + [vectors + rng.normal(0, noise, vectors.shape) for _ in range(scale - 1)]
+        vectors = np.vstack(copies)
+    return normalize(vectors)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def measure(index, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    single = []
+    for query in queries[:200]:
+        started = time.perf_counter()
+        index.search(query.reshape(1, -1), k)
+        single.append((time.perf_counter() - started) * 1000)
+    started = time.perf_counter()
+    _, found = index.search(queries, k)
+    elapsed = time.perf_counter() - started
+    return {
+        "recall": recall_at_k(found, truth),
+        "p50_ms": statistics.median(single),
+        "qps": len(queries) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare FAISS index types against exact search.")
+    parser.add_argument("--index-path", default=INDEX_PATH)
+    parser.add_argument("--scale", type=int, default=1, help="Grow the corpus with jittered copies.")
+    parser.add_argument("--noise", type=float, default=0.02)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    corpus = load_corpus(args.index_path, args.scale, args.noise, rng)
+    sample = corpus[rng.choice(len(corpus), size=min(args.queries, len(corpus)), replace=False)]
+    queries = normalize(sample + rng.normal(0, args.noise, sample.shape))
+    print(f"{len(corpus)} vectors of dim {corpus.shape[1]}, {len(queries)} queries, k={args.k}\n")
+
+    exact = faiss.IndexFlatL2(corpus.shape[1])
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"{'index':>9} {'param':>12} {'recall@k':>9} {'p50_ms':>8} {'qps':>9} {'size_MB':>8} {'build_s':>8}")
+    for index_type in ("flat", "ivf-flat", "hnsw", "ivf-pq"):
+        started = time.perf_counter()
+        try:
+            index, built_type = create_index(index_type, corpus)
+        except ValueError as e:
+            print(f"{index_type:>9}  skipped: {e}")
+            continue
+        if built_type != index_type:
+            print(f"{index_type:>9}  skipped: corpus too small to train (try --scale)")
+            continue
+        index.add(corpus)
+        build_s = time.perf_counter() - started
+        size_mb = len(faiss.serialize_index(index)) / 1e6
+
+        if index_type in ("ivf-flat", "ivf-pq"):
+            settings = [(f"nprobe={n}", {"nprobe": n}) for n in NPROBE_SWEEP]
+        elif index_type == "hnsw":
+            settings = [(f"efSearch={ef}", {"ef_search": ef}) for ef in EF_SEARCH_SWEEP]
+        else:
+            settings = [("exact", {})]
+
+        for label, params in settings:
+            tune_index(index, **params)
+            r = measure(index, queries, truth, args.k)
+            print(
+                f"{index_type:>9} {label:>12} {r['recall']:>9.3f} {r['p50_ms']:>8.3f} "
+                f"{r['qps']:>9.0f} {size_mb:>8.2f} {build_s:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
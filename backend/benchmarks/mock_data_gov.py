@@ -0,0 +1,99 @@
+# backend/benchmarks/mock_data_gov.py
+"""
+Local stand-in for the data.gov.in daily mandi-price resource.
+
+Serves a deterministic synthetic dataset with the same paging (`offset`,
+`limit`), filters (`filters[commodity]`, ...) and response shape (`total`,
+`count`, `records` with dd/mm/yyyy dates and string prices) as the real API,
+with optional injected latency and error rate. Use it to exercise the market
+ingest and MarketInfo offline:
+
+    cd backend
+    uvicorn benchmarks.mock_data_gov:app --port 8090
+    python -m app.market_store ingest --base-url http://127.0.0.1:8090/resource/mock
+    MARKET_DATA_URL=http://127.0.0.1:8090/resource/mock MARKET_SOURCE=store python -m app.main
+
+Settings: MOCK_MARKET_RECORDS (default 5000), MOCK_MARKET_DAYS (7),
+MOCK_LATENCY_MS (0), MOCK_ERROR_RATE (0.0, share of 503 responses).
+"""
+import os
+import random
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+MOCK_MARKET_RECORDS = int(os.getenv("MOCK_MARKET_RECORDS", "5000"))
+MOCK_MARKET_DAYS = int(os.getenv("MOCK_MARKET_DAYS", "7"))
+MOCK_LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "0"))
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+
+STATES = {
+    "West Bengal": ["Paschim Medinipur", "Nadia", "Bankura", "Hooghly"],
+    "Odisha": ["Cuttack", "Balasore", "Sambalpur"],
+    "Bihar": ["Patna", "Gaya", "Muzaffarpur"],
+    "Punjab": ["Ludhiana", "Amritsar", "Bathinda"],
+}
+COMMODITIES = {"Rice": 2800, "Wheat": 2300, "Potato": 1400, "Onion": 2100, "Tomato": 1800, "Jute": 5000, "Mustard": 5400}
+
+
+def make_dataset(count: int = MOCK_MARKET_RECORDS, days: int = MOCK_MARKET_DAYS, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    today = datetime.now().date()
+    markets = [
+        (state, district, f"{district} Mandi {i + 1}")
+        for state, districts in STATES.items()
+        for district in districts
+        for i in range(3)
+    ]
+    records = []
+    for i in range(count):
+        state, district, market = markets[i % len(markets)]
+        commodity, base = list(COMMODITIES.items())[(i // len(markets)) % len(COMMODITIES)]
+        day = today - timedelta(days=(i // (len(markets) * len(COMMODITIES))) % days)
+        modal = base * rng.uniform(0.85, 1.15)
+        records.append({
+            "state": state,
+            "district": district,
+            "market": market,
+            "commodity": commodity,
+            "variety": f"Variety {(i // (len(markets) * len(COMMODITIES) * days)) + 1}",
+            "grade": "FAQ",
+            "arrival_date": day.strftime("%d/%m/%Y"),
+            "min_price": str(round(modal * 0.9)),
+            "max_price": str(round(modal * 1.1)),
+            "modal_price": str(round(modal)),
+        })
+    return records
+
+
+DATASET = make_dataset()
+app = FastAPI(title="data.gov.in stand-in")
+
+
+@app.get("/resource/{resource_id}")
+async def resource(resource_id: str, request: Request):
+    if MOCK_LATENCY_MS:
+        await asyncio.sleep(MOCK_LATENCY_MS / 1000)
+    if MOCK_ERROR_RATE and random.random() < MOCK_ERROR_RATE:
+        return JSONResponse({"error": "Service Unavailable"}, status_code=503)
+
+    params = request.query_params
+    records = DATASET
+    for key, value in params.items():
+        if key.startswith("filters[") and key.endswith("]"):
+            field = key[len("filters["):-1]
+            records = [r for r in records if r.get(field, "").lower() == value.lower()]
+
+    offset = int(params.get("offset", 0))
+    limit = int(params.get("limit", 10))
+    page = records[offset:offset + limit]
+    return {
+        "index_name": resource_id,
+        "total": len(records),
+        "count": len(page),
+        "offset": offset,
+        "limit": limit,
+        "records": page,
+    }
@@ -0,0 +1,73 @@
+# backend/benchmarks/mock_openweather.py
+"""
+Local stand-in for the OpenWeatherMap endpoints used by WeatherInfo:
+`/geo/1.0/direct`, `/data/2.5/weather` and `/data/2.5/forecast`.
+
+Any place name geocodes to a stable pseudo-random point in India and the
+forecast covers the next five days in 3-hour steps, so the weather cache's
+"has today's forecast" check passes. Optional injected latency and error rate:
+
+    cd backend
+    uvicorn benchmarks.mock_openweather:app --port 8091
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8091 python -m app.main
+
+Settings: MOCK_LATENCY_MS (default 0), MOCK_ERROR_RATE (0.0, share of 503 responses).
+"""
+import os
+import time
+import random
+import asyncio
+import hashlib
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+MOCK_LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "0"))
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+
+app = FastAPI(title="OpenWeatherMap stand-in")
+
+
+def _seed(*parts) -> int:
+    return int(hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()[:8], 16)
+
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    if MOCK_LATENCY_MS:
+        await asyncio.sleep(MOCK_LATENCY_MS / 1000)
+    if MOCK_ERROR_RATE and random.random() < MOCK_ERROR_RATE:
+        return JSONResponse({"cod": 503, "message": "Service Unavailable"}, status_code=503)
+    return await call_next(request)
+
+
+@app.get("/geo/1.0/direct")
+async def geocode(q: str, limit: int = 1):
+    rng = random.Random(_seed(q.lower()))
+    name = q.split(",")[0].strip().title()
+    return [{"name": name, "state": "West Bengal", "country": "IN",
+             "lat": round(rng.uniform(8.0, 32.0), 4), "lon": round(rng.uniform(70.0, 92.0), 4)}]
+
+
+def _conditions(rng: random.Random) -> dict:
+    temp = rng.uniform(22, 36)
+    return {
+        "main": {"temp": round(temp, 1), "feels_like": round(temp + 2, 1), "humidity": rng.randint(40, 95),
+                 "temp_min": round(temp - 2, 1), "temp_max": round(temp + 2, 1)},
+        "weather": [{"description": rng.choice(["clear sky", "scattered clouds", "light rain", "overcast clouds"])}],
+        "wind": {"speed": round(rng.uniform(0.5, 8), 1)},
+        "pop": round(rng.random(), 2),
+    }
+
+
+@app.get("/data/2.5/weather")
+async def current(lat: float, lon: float):
+    rng = random.Random(_seed(lat, lon, int(time.time() // 3600)))
+    return {"name": None, "coord": {"lat": lat, "lon": lon}, **_conditions(rng)}
+
+
+@app.get("/data/2.5/forecast")
+async def forecast(lat: float, lon: float):
+    rng = random.Random(_seed(lat, lon, "forecast"))
+    start = int(time.time()) // 10800 * 10800
+    return {"cnt": 40, "list": [{"dt": start + i * 10800, **_conditions(rng)} for i in range(40)]}
@@ -0,0 +1,42 @@
+# backend/benchmarks/offline_server.py
+"""
+Runs the real FastAPI app from `app.main` with Gemini replaced by the fake
+tool-calling model (see benchmarks/fakes.py). Point the weather and market
+tools at the local stand-ins through the environment:
+
+    cd backend
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8091 \
+    MARKET_DATA_URL=http://127.0.0.1:8090/resource/mock \
+    python -m benchmarks.offline_server --port 8000 --llm-latency-ms 300
+
+`python benchmarks/run.py load` does all of this for you.
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.main copies GEMINI_API_KEY into GOOGLE_API_KEY at import time; the fake never calls out.
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+os.environ.setdefault("WEATHER_API_KEY", "offline")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve app.main with a fake Gemini.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-ms-per-1k-tokens", type=float, default=50.0)
+    args = parser.parse_args()
+
+    import uvicorn
+    import app.main as main_module
+    from benchmarks.fakes import install_fake_llm
+
+    install_fake_llm(main_module, args.llm_latency_ms, args.llm_ms_per_1k_tokens)
+    uvicorn.run(main_module.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
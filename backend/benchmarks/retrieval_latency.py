@@ -0,0 +1,91 @@
+# backend/benchmarks/retrieval_latency.py
+"""
+Latency of CropInfoRetriever under concurrent queries.
+
+Runs the async retrieval path in-process at 1, 10 and 100 concurrent queries,
+once with cold caches (distinct queries) and once warm (the same queries
+again), and reports latency percentiles, throughput and how many queries the
+embedding service coalesced per model call. Compare with batching disabled:
+
+    cd backend
+    python benchmarks/retrieval_latency.py
+    EMBED_MAX_BATCH_SIZE=1 python benchmarks/retrieval_latency.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.tools import crop_info_tool, query_embeddings, vector_store_resource  # noqa: E402
+from benchmarks.chat_load import percentile  # noqa: E402
+
+TOPICS = [
+    "late blight in potato", "paddy fertilizer schedule", "wheat rust control",
+    "drip irrigation for tomato", "soil pH for mustard", "organic pest control in brinjal",
+    "jute retting", "maize sowing depth", "nitrogen deficiency symptoms", "mango flowering",
+]
+
+
+def make_queries(count: int, offset: int) -> list:
+    # Distinct texts so the cold pass really misses the embedding cache
+    return [f"{TOPICS[i % len(TOPICS)]} (case {offset + i})" for i in range(count)]
+
+
+async def run_level(concurrency: int, queries: list, tool_input: dict) -> dict:
+    async def one(query: str) -> float:
+        started = time.perf_counter()
+        await crop_info_tool.coroutine(json.dumps({**tool_input, "query": query}))
+        return (time.perf_counter() - started) * 1000
+
+    before = query_embeddings.get_stats()
+    started = time.perf_counter()
+    latencies = []
+    for i in range(0, len(queries), concurrency):
+        latencies.extend(await asyncio.gather(*(one(q) for q in queries[i:i + concurrency])))
+    elapsed = time.perf_counter() - started
+    after = query_embeddings.get_stats()
+
+    batches = after["batches"] - before["batches"]
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "qps": len(queries) / elapsed,
+        "model_calls": batches,
+        "avg_batch": (after["embedded"] - before["embedded"]) / batches if batches else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark CropInfoRetriever latency.")
+    parser.add_argument("--levels", default="1,10,100", help="Comma-separated concurrency levels.")
+    parser.add_argument("--rounds", type=int, default=3, help="Waves of queries per level.")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--mmr", action="store_true")
+    args = parser.parse_args()
+
+    vector_store_resource.get()
+    await crop_info_tool.coroutine("warm up")
+    tool_input = {"k": args.k, "mmr": args.mmr}
+
+    print(f"{'conc':>5} {'cache':>5} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'qps':>8} {'calls':>6} {'batch':>6}")
+    offset = 0
+    for concurrency in (int(level) for level in args.levels.split(",")):
+        queries = make_queries(concurrency * args.rounds, offset)
+        offset += len(queries)
+        for label in ("cold", "warm"):
+            r = await run_level(concurrency, queries, tool_input)
+            print(
+                f"{concurrency:>5} {label:>5} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+                f"{r['qps']:>8.1f} {r['model_calls']:>6} {r['avg_batch']:>6.1f}"
+            )
+    print(f"\nEmbedding service: {query_embeddings.get_stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
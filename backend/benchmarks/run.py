@@ -0,0 +1,442 @@
+# backend/benchmarks/run.py
+"""
+Single entry point for the backend benchmarks; runs fully offline.
+
+    load     boots app.main with a fake Gemini (benchmarks/fakes.py) against
+             local OpenWeatherMap and data.gov.in stand-ins with injected
+             latency, drives /chat with a mixed text/weather/market/image
+             workload at increasing concurrency and reports p50/p95/p99,
+             throughput and server RSS per level and per request kind.
+    micro    in-process component timings: FAISS retrieval, classifier
+             forward pass, tool cache read/write.
+
+The older single-purpose scripts run from here too (arguments are passed through):
+chat-load, startup, history, classifiers, retrieval, index-recall.
+
+    cd backend
+    python benchmarks/run.py load --levels 1,5,20,50 --requests 100 --llm-latency-ms 300
+    python benchmarks/run.py load --mix text=1 --weather-latency-ms 0 --json load.json
+    python benchmarks/run.py micro --only cache,classifier
+    python benchmarks/run.py history --backend sqlite --sessions 20000
+
+`load` needs the FAISS index (python -m app.vector_db) for CropInfoRetriever
+answers and the classifier model for image requests; without them those tools
+return errors quickly, which skews the latencies of those request kinds.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import runpy
+import tempfile
+import threading
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+from benchmarks.chat_load import percentile  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Existing scripts, runnable as `run.py <name> [their arguments]`
+SCRIPTS = {
+    "chat-load": "benchmarks.chat_load",
+    "startup": "benchmarks.startup_time",
+    "history": "benchmarks.history_store",
+    "classifiers": "benchmarks.classifier_backends",
+    "retrieval": "benchmarks.retrieval_latency",
+    "index-recall": "benchmarks.index_recall",
+}
+
+CROP_QUESTIONS = [
+    "How do I control late blight in potato?",
+    "Best fertilizer schedule for paddy in monsoon",
+    "When should I sow mustard?",
+    "How to manage stem borer in rice?",
+    "Drip irrigation spacing for tomato",
+    "What causes yellow leaves in wheat?",
+]
+WEATHER_QUESTIONS = ["What is the weather this week?", "Will it rain in the next few days?", "Weather forecast for spraying"]
+MARKET_QUESTIONS = ["Latest mandi price of {c}", "What is the market price of {c} today?"]
+COMMODITIES = ["rice", "wheat", "potato", "onion", "tomato", "jute", "mustard"]
+PLACES = ["Kharagpur", "Midnapore", "Bankura", "Nadia", "Hooghly", "Cuttack", "Balasore", "Patna", "Ludhiana", "22.34,87.23"]
+
+
+# --- Process helpers ---
+def rss_mb(pid: int) -> float:
+    """Resident set size of a process in MB (Linux /proc)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class RssSampler:
+    """Samples a process's RSS in a background thread and keeps the peak."""
+
+    def __init__(self, pid: int, interval: float = 0.25):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_mb(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def start_process(args: list, env: dict, log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, *args], cwd=BACKEND_DIR, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+async def wait_until(url: str, ready, timeout: float, process: subprocess.Popen):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=5) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode}; see its log")
+            try:
+                response = await client.get(url)
+                if response.status_code == 200 and ready(response):
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"{url} not ready after {timeout:.0f}s")
+
+
+# --- Load test ---
+def make_images(count: int, seed: int = 1) -> list:
+    """Distinct synthetic leaf-sized JPEGs; repeats in the workload exercise the classification cache."""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        pixels = rng.integers(0, 255, size=(480, 640, 3), dtype=np.uint8)
+        pixels[..., 1] = np.maximum(pixels[..., 1], 120)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=85)
+        images.append(buffer.getvalue())
+    return images
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in ("text", "weather", "market", "image"):
+            raise argparse.ArgumentTypeError(f"Unknown request kind '{kind}'")
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+
+def make_workload(count: int, mix: dict, images: list, seed: int) -> list:
+    """Returns `(kind, form_data, files)` tuples in a reproducible random order."""
+    rng = random.Random(seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    workload = []
+    for i, kind in enumerate(kinds):
+        data = {"session_id": f"bench-{seed}-{i % 50}", "use_cache": "false"}
+        files = None
+        if kind == "text":
+            data["text"] = rng.choice(CROP_QUESTIONS)
+        elif kind == "weather":
+            data["text"] = rng.choice(WEATHER_QUESTIONS)
+            data["location"] = rng.choice(PLACES)
+        elif kind == "market":
+            data["text"] = rng.choice(MARKET_QUESTIONS).format(c=rng.choice(COMMODITIES))
+        else:
+            # Half the photos come without text, which the fast-path router answers directly
+            if rng.random() < 0.5:
+                data["text"] = "What disease does this leaf have?"
+            files = {"image": ("leaf.jpg", rng.choice(images), "image/jpeg")}
+        if rng.random() < 0.3 and "location" not in data:
+            data["location"] = rng.choice(PLACES)
+        workload.append((kind, data, files))
+    return workload
+
+
+async def run_level(base_url: str, concurrency: int, workload: list) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        async def one(kind, data, files):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post("/chat", data=data, files=files)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                return kind, ok, (time.perf_counter() - started) * 1000
+
+        return await asyncio.gather(*(one(*request) for request in workload))
+
+
+def summarize(results: list, elapsed: float) -> dict:
+    latencies = [ms for _, ok, ms in results if ok]
+    return {
+        "requests": len(results),
+        "failed": len(results) - len(latencies),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "mean_ms": round(statistics.mean(latencies), 1) if latencies else 0.0,
+    }
+
+
+async def load_test(args) -> dict:
+    port = args.port
+    base_url = f"http://127.0.0.1:{port}"
+    workdir = tempfile.mkdtemp(prefix="agri-bench-")
+    mock_env = {"MOCK_ERROR_RATE": str(args.error_rate)}
+    server_env = {
+        "OPENWEATHER_BASE_URL": f"http://127.0.0.1:{port + 91}",
+        "MARKET_DATA_URL": f"http://127.0.0.1:{port + 90}/resource/mock",
+        "MARKET_SOURCE": "live",
+        # Fresh caches and stores per run, outside the working tree
+        "CACHE_DB_PATH": os.path.join(workdir, "cache.db"),
+        "MARKET_DB_PATH": os.path.join(workdir, "market.db"),
+        "HISTORY_BACKEND": "memory",
+        "HISTORY_SUMMARIZE": "false",
+        "SEMANTIC_CACHE_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+    }
+    processes = [
+        start_process(
+            ["-m", "uvicorn", "benchmarks.mock_openweather:app", "--port", str(port + 91), "--log-level", "warning"],
+            {**mock_env, "MOCK_LATENCY_MS": str(args.weather_latency_ms)},
+            os.path.join(workdir, "mock_openweather.log"),
+        ),
+        start_process(
+            ["-m", "uvicorn", "benchmarks.mock_data_gov:app", "--port", str(port + 90), "--log-level", "warning"],
+            {**mock_env, "MOCK_LATENCY_MS": str(args.market_latency_ms)},
+            os.path.join(workdir, "mock_data_gov.log"),
+        ),
+    ]
+    server = start_process(
+        ["-m", "benchmarks.offline_server", "--port", str(port),
+         "--llm-latency-ms", str(args.llm_latency_ms), "--llm-ms-per-1k-tokens", str(args.llm_ms_per_1k_tokens)],
+        server_env,
+        os.path.join(workdir, "server.log"),
+    )
+    processes.append(server)
+    print(f"Logs and stores in {workdir}")
+
+    try:
+        started = time.perf_counter()
+        await wait_until(f"{base_url}/health", lambda r: r.json().get("ready"), args.startup_timeout, server)
+        print(f"Server ready in {time.perf_counter() - started:.1f}s, RSS {rss_mb(server.pid):.0f} MB\n")
+
+        images = make_images(args.distinct_images)
+        report = {"settings": vars(args), "levels": []}
+        print(f"{'conc':>5} {'kind':>8} {'reqs':>5} {'fail':>5} {'rps':>7} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'rss_MB':>7}")
+        for level, concurrency in enumerate(int(c) for c in args.levels.split(",")):
+            workload = make_workload(args.requests, args.mix, images, seed=level)
+            with RssSampler(server.pid) as sampler:
+                level_started = time.perf_counter()
+                results = await run_level(base_url, concurrency, workload)
+                elapsed = time.perf_counter() - level_started
+
+            overall = {**summarize(results, elapsed), "concurrency": concurrency, "rss_peak_mb": round(sampler.peak, 1)}
+            overall["kinds"] = {
+                kind: summarize([r for r in results if r[0] == kind], elapsed) for kind in args.mix
+            }
+            report["levels"].append(overall)
+            print(
+                f"{concurrency:>5} {'all':>8} {overall['requests']:>5} {overall['failed']:>5} {overall['rps']:>7} "
+                f"{overall['p50_ms']:>8} {overall['p95_ms']:>8} {overall['p99_ms']:>8} {overall['rss_peak_mb']:>7}"
+            )
+            for kind, r in overall["kinds"].items():
+                print(f"{'':>5} {kind:>8} {r['requests']:>5} {r['failed']:>5} {'':>7} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}")
+
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            report["cache_stats"] = (await client.get("/cache/stats")).json()
+            report["token_stats"] = (await client.get("/tokens/stats")).json()
+            report["router_stats"] = (await client.get("/router/stats")).json()
+        hit_ratios = {name: s.get("hit_ratio") for name, s in report["cache_stats"].items() if isinstance(s, dict) and "hit_ratio" in s}
+        print(f"\nCache hit ratios: {hit_ratios}")
+        print(f"Tokens per request: {report['token_stats'].get('avg_input_tokens_per_request')} in, "
+              f"{report['token_stats'].get('avg_steps_per_request')} steps")
+        print(f"Fast path: {report['router_stats'].get('routed_fraction', 0):.0%} of requests, "
+              f"~{report['router_stats'].get('saved_ms_total', 0) / 1000:.1f}s saved "
+              f"(ROUTER_ENABLED=false on the server for an agent-only baseline)")
+        return report
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+# --- Micro-benchmarks ---
+def _timed(fn, repeats: int) -> list:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _row(name: str, timings: list) -> dict:
+    return {
+        "benchmark": name,
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "ops_per_s": round(1000 / statistics.mean(timings), 1) if statistics.mean(timings) else 0.0,
+    }
+
+
+def micro_cache(repeats: int) -> list:
+    """Tool cache: SQLite write, memory-tier read and store-tier read of a weather-sized payload."""
+    from app.cache import SQLiteStore, ToolCache
+
+    path = os.path.join(tempfile.mkdtemp(prefix="agri-bench-"), "cache.db")
+    store = SQLiteStore(path)
+    cache = ToolCache("bench", ttl_seconds=3600, store=store)
+    payload = {
+        "current_weather": {"city": "Kharagpur", "temperature": 31.2, "humidity": 78, "description": "light rain"},
+        "five_day_forecast": [{"date": f"2025-08-{d:02d}", "temp_max": 33.1, "temp_min": 26.4, "pop": 0.6} for d in range(18, 23)],
+    }
+    keys = [f"22.{i % 100},87.{i // 100}" for i in range(repeats)]
+
+    counter = iter(range(repeats))
+    writes = _timed(lambda: cache.set(keys[next(counter)], payload), repeats)
+    counter = iter(range(repeats))
+    memory_reads = _timed(lambda: cache.get(keys[next(counter)]), repeats)
+    cold = ToolCache("bench", ttl_seconds=3600, store=store)
+    counter = iter(range(repeats))
+    store_reads = _timed(lambda: cold.get(keys[next(counter)]), repeats)
+    return [_row("cache.write", writes), _row("cache.read.memory", memory_reads), _row("cache.read.store", store_reads)]
+
+
+def micro_classifier(repeats: int) -> list:
+    """Forward pass of the configured classifier backend at batch sizes 1, 8 and 32."""
+    import numpy as np
+    from app.classifier_backends import load_backend
+
+    backend = load_backend()
+    rows = []
+    for batch_size in (1, 8, 32):
+        pixels = np.random.default_rng(0).standard_normal((batch_size, 3, 224, 224)).astype(np.float32)
+        backend.forward(pixels)
+        row = _row(f"classifier.forward.b{batch_size}", _timed(lambda: backend.forward(pixels), max(3, repeats // batch_size)))
+        row["imgs_per_s"] = round(row["ops_per_s"] * batch_size, 1)
+        rows.append(row)
+    return rows
+
+
+def micro_retrieval(repeats: int) -> list:
+    """CropInfoRetriever end to end (embedding + FAISS search + formatting), sequential and 10 at a time."""
+    from app.tools import crop_info_tool, vector_store_resource
+    from benchmarks.retrieval_latency import make_queries
+
+    vector_store_resource.get()
+
+    async def run():
+        await crop_info_tool.coroutine("warm up")
+        rows = []
+        for concurrency, offset in ((1, 0), (10, repeats)):
+            queries = make_queries(repeats, offset)
+            timings = []
+
+            async def one(query):
+                started = time.perf_counter()
+                await crop_info_tool.coroutine(query)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            for i in range(0, len(queries), concurrency):
+                await asyncio.gather(*(one(q) for q in queries[i:i + concurrency]))
+            rows.append(_row(f"retrieval.c{concurrency}", timings))
+        return rows
+
+    return asyncio.run(run())
+
+
+MICRO = {"cache": micro_cache, "classifier": micro_classifier, "retrieval": micro_retrieval}
+
+
+def micro(args) -> dict:
+    rows = []
+    print(f"{'benchmark':>24} {'p50_ms':>9} {'p95_ms':>9} {'ops/s':>9}")
+    for name in args.only.split(","):
+        try:
+            results = MICRO[name](args.repeats)
+        except (FileNotFoundError, ImportError, OSError) as e:
+            print(f"{name:>24}  skipped: {e}")
+            continue
+        for row in results:
+            print(f"{row['benchmark']:>24} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['ops_per_s']:>9}")
+        rows.extend(results)
+    return {"micro": rows}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in SCRIPTS:
+        module = SCRIPTS[sys.argv[1]]
+        sys.argv = [module] + sys.argv[2:]
+        runpy.run_module(module, run_name="__main__")
+        return
+
+    parser = argparse.ArgumentParser(description="Offline backend benchmarks.", epilog=f"Also: {', '.join(SCRIPTS)}")
+    subparsers = parser.add_subparsers(dest="suite", required=True)
+
+    load = subparsers.add_parser("load", help="End-to-end /chat load test against local stand-ins.")
+    load.add_argument("--levels", default="1,5,20,50", help="Comma-separated concurrency levels.")
+    load.add_argument("--requests", type=int, default=100, help="Requests per level.")
+    load.add_argument("--mix", type=parse_mix, default=parse_mix("text=0.4,weather=0.25,market=0.2,image=0.15"))
+    load.add_argument("--llm-latency-ms", type=float, default=300.0)
+    load.add_argument("--llm-ms-per-1k-tokens", type=float, default=50.0)
+    load.add_argument("--weather-latency-ms", type=float, default=150.0)
+    load.add_argument("--market-latency-ms", type=float, default=400.0)
+    load.add_argument("--error-rate", type=float, default=0.0, help="Share of 503s from the stand-ins.")
+    load.add_argument("--distinct-images", type=int, default=8)
+    load.add_argument("--port", type=int, default=8700)
+    load.add_argument("--startup-timeout", type=float, default=300.0)
+    load.add_argument("--json", help="Also write the full report to this file.")
+
+    micro_parser = subparsers.add_parser("micro", help="Component micro-benchmarks.")
+    micro_parser.add_argument("--only", default=",".join(MICRO))
+    micro_parser.add_argument("--repeats", type=int, default=200)
+    micro_parser.add_argument("--json", help="Also write the results to this file.")
+
+    args = parser.parse_args()
+    report = asyncio.run(load_test(args)) if args.suite == "load" else micro(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
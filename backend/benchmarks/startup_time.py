@@ -0,0 +1,66 @@
+# backend/benchmarks/startup_time.py
+"""
+Import-to-ready latency of the backend.
+
+Each run starts a fresh interpreter (so nothing is cached in-process), imports
+`app.main` and then loads every lazily initialized model/index. Reported:
+
+    import_s   time until `app.main` is importable (what a uvicorn worker waits for)
+    ready_s    time until every model/index is loaded (what /health "ready" means)
+
+    cd backend
+    python benchmarks/startup_time.py --runs 3
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+PROBE = """
+import json, os, time
+os.environ["MODEL_WARMUP"] = "false"
+started = time.perf_counter()
+import app.main
+from app.lazy import warm_up, readiness
+imported = time.perf_counter()
+warm_up()
+ready = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - started,
+    "ready_s": ready - started,
+    "models": readiness(),
+}))
+"""
+
+
+def measure_once(backend_dir: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=backend_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    # The app logs to stderr; the last stdout line is the probe's JSON.
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure backend import-to-ready latency.")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = [measure_once(backend_dir) for _ in range(args.runs)]
+
+    for key in ("import_s", "ready_s"):
+        values = [r[key] for r in results]
+        print(f"{key:>9}: median {statistics.median(values):.3f}s  min {min(values):.3f}s  max {max(values):.3f}s")
+    for name, status in results[-1]["models"].items():
+        print(f"{name:>12}: {status['state']} in {status['load_seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
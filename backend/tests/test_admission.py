@@ -0,0 +1,129 @@
+# backend/tests/test_admission.py
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionController, Overloaded, HIGH, LOW, request_priority
+
+
+async def settle():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_request_priority():
+    assert request_priority("Weather in Kharagpur?", has_image=False) == HIGH
+    assert request_priority("Weather in Kharagpur?", has_image=True) == LOW
+    assert request_priority("x" * 5000, has_image=False) == LOW
+
+
+def test_freed_slots_go_to_high_priority_waiters_first():
+    controller = AdmissionController(max_concurrency=1, max_queue=4, max_wait_seconds=5)
+    admitted = []
+
+    async def request(name, priority):
+        ticket = await controller.acquire(priority)
+        admitted.append(name)
+        return ticket
+
+    async def scenario():
+        first = await controller.acquire(HIGH)
+        low_1 = asyncio.ensure_future(request("low-1", LOW))
+        high_1 = asyncio.ensure_future(request("high-1", HIGH))
+        low_2 = asyncio.ensure_future(request("low-2", LOW))
+        await settle()
+        assert controller.get_stats()["queued"] == {HIGH: 1, LOW: 2}
+        first.release()
+        first.release()  # idempotent
+        await settle()
+        assert admitted == ["high-1"]
+        high_1.result().release()
+        await settle()
+        low_1.result().release()
+        await settle()
+        low_2.result().release()
+        assert controller.active == 0
+
+    asyncio.run(scenario())
+    assert admitted == ["high-1", "low-1", "low-2"]
+
+
+def test_full_queue_refuses_low_and_displaces_for_high():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, max_wait_seconds=5)
+
+    async def scenario():
+        await controller.acquire(LOW)
+        queued_low = asyncio.ensure_future(controller.acquire(LOW))
+        await settle()
+
+        with pytest.raises(Overloaded) as refused:
+            await controller.acquire(LOW)
+        assert refused.value.reason == "queue_full"
+        assert refused.value.retry_after >= 1
+
+        queued_high = asyncio.ensure_future(controller.acquire(HIGH))
+        await settle()
+        with pytest.raises(Overloaded) as displaced:
+            await queued_low
+        assert displaced.value.reason == "displaced"
+        assert controller.get_stats()["queued"] == {HIGH: 1, LOW: 0}
+        queued_high.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_waiter_times_out_and_leaves_the_queue():
+    controller = AdmissionController(max_concurrency=1, max_queue=4, max_wait_seconds=0.05)
+
+    async def scenario():
+        ticket = await controller.acquire(HIGH)
+        with pytest.raises(Overloaded) as timed_out:
+            await controller.acquire(LOW)
+        assert timed_out.value.reason == "timeout"
+        assert controller.queue_depth == 0
+        ticket.release()
+        assert controller.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    controller = AdmissionController(max_concurrency=1, max_queue=4, max_wait_seconds=5)
+
+    async def scenario():
+        ticket = await controller.acquire(HIGH)
+        gone = asyncio.ensure_future(controller.acquire(HIGH))
+        next_in_line = asyncio.ensure_future(controller.acquire(LOW))
+        await settle()
+        gone.cancel()
+        await settle()
+        assert controller.get_stats()["queued"] == {HIGH: 0, LOW: 1}
+        ticket.release()
+        await settle()
+        next_in_line.result().release()
+        assert controller.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_slot_granted_to_a_cancelled_waiter_is_not_lost():
+    controller = AdmissionController(max_concurrency=1, max_queue=4, max_wait_seconds=5)
+
+    async def scenario():
+        ticket = await controller.acquire(HIGH)
+        gone = asyncio.ensure_future(controller.acquire(HIGH))
+        next_in_line = asyncio.ensure_future(controller.acquire(LOW))
+        await settle()
+        # The slot is granted to `gone`, whose client disconnects before it runs
+        ticket.release()
+        gone.cancel()
+        await settle()
+        if not gone.cancelled():
+            # Python < 3.12: wait_for returns the already-granted slot despite
+            # the cancellation, and the caller releases it as usual
+            gone.result().release()
+            await settle()
+        next_in_line.result().release()
+        assert controller.active == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,70 @@
+# backend/tests/test_cache.py
+import asyncio
+
+import pytest
+
+from app.cache import SQLiteStore, ToolCache
+
+
+def make_cache(tmp_path) -> ToolCache:
+    return ToolCache("test", ttl_seconds=60, store=SQLiteStore(str(tmp_path / "cache.db")))
+
+
+def slow_fetch(calls: list, delay: float = 0.2):
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return {"temperature": 31}
+    return fetch
+
+
+def test_owner_timeout_does_not_cancel_coalesced_waiter(tmp_path):
+    # The request that started the fetch hits its per-tool timeout
+    # (asyncio.wait_for, as in ParallelAgentExecutor); the second request
+    # waiting on the same key must still get the result.
+    cache = make_cache(tmp_path)
+    calls = []
+
+    async def scenario():
+        owner = asyncio.ensure_future(asyncio.wait_for(cache.get_or_fetch("kharagpur", slow_fetch(calls)), 0.05))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(cache.get_or_fetch("kharagpur", slow_fetch(calls)))
+        with pytest.raises(asyncio.TimeoutError):
+            await owner
+        return await waiter
+
+    assert asyncio.run(scenario()) == {"temperature": 31}
+    assert len(calls) == 1
+    assert cache.get("kharagpur") == {"temperature": 31}
+
+
+def test_waiter_timeout_does_not_cancel_owner(tmp_path):
+    cache = make_cache(tmp_path)
+    calls = []
+
+    async def scenario():
+        owner = asyncio.ensure_future(cache.get_or_fetch("patna", slow_fetch(calls)))
+        await asyncio.sleep(0.01)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(cache.get_or_fetch("patna", slow_fetch(calls)), 0.05)
+        return await owner
+
+    assert asyncio.run(scenario()) == {"temperature": 31}
+    assert len(calls) == 1
+
+
+def test_fetch_error_reaches_every_waiter_and_is_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream down")
+
+    async def scenario():
+        return await asyncio.gather(
+            cache.get_or_fetch("cuttack", failing), cache.get_or_fetch("cuttack", failing), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.get("cuttack") is None
@@ -0,0 +1,96 @@
+# backend/tests/test_embeddings.py
+import time
+import asyncio
+import threading
+
+import pytest
+
+from app.embeddings import EmbeddingService
+
+
+class FakeModel:
+    """Stands in for the MiniLM model: slow, and records each batch it embeds."""
+
+    def __init__(self, delay: float = 0.1, fail_on: str = None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        time.sleep(self.delay)
+        if self.fail_on in texts:
+            raise RuntimeError("model failed")
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class FakeResource:
+    def __init__(self, model):
+        self.model = model
+
+    def get(self):
+        return self.model
+
+
+def make_service(**model_args) -> EmbeddingService:
+    return EmbeddingService(FakeResource(FakeModel(**model_args)), max_wait_ms=20)
+
+
+def test_identical_and_distinct_queries_share_one_batch():
+    service = make_service()
+
+    async def scenario():
+        return await asyncio.gather(
+            service.aembed_query("Late blight"), service.aembed_query("late  blight"), service.aembed_query("rust")
+        )
+
+    first, second, third = asyncio.run(scenario())
+    assert first == second == [11.0, 1.0]
+    assert third == [4.0, 1.0]
+    assert service.model_resource.model.batches == [["late blight", "rust"]]
+    # Served from the cache afterwards
+    assert service.embed_query("LATE BLIGHT") == [11.0, 1.0]
+    assert service.get_stats()["cache_hits"] == 1
+
+
+def test_cancelled_caller_does_not_break_others_or_the_batcher():
+    service = make_service(delay=0.2)
+
+    async def scenario():
+        waiter = asyncio.ensure_future(service.aembed_query("wheat rust"))
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(service.aembed_query("wheat rust"), 0.05)
+        shared = await waiter
+        unrelated = await asyncio.wait_for(service.aembed_query("paddy"), 2)
+        return shared, unrelated
+
+    shared, unrelated = asyncio.run(scenario())
+    assert shared == [10.0, 1.0]
+    assert unrelated == [5.0, 1.0]
+    assert service._scheduler.is_alive()
+
+
+def test_failed_batch_reaches_its_callers_and_the_batcher_keeps_running():
+    service = make_service(delay=0.01, fail_on="bad")
+    with pytest.raises(RuntimeError):
+        service.embed_query("bad")
+    # Not cached, not left pending: the next query is embedded normally
+    assert service.embed_query("good") == [4.0, 1.0]
+    assert service._pending == {}
+
+
+def test_sync_callers_from_threads_are_batched():
+    service = make_service(delay=0.05)
+    results = {}
+
+    def worker(text):
+        results[text] = service.embed_query(text)
+
+    threads = [threading.Thread(target=worker, args=(f"crop {i}",)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert len(results) == 5
+    assert sum(len(batch) for batch in service.model_resource.model.batches) == 5
+    assert len(service.model_resource.model.batches) < 5
@@ -0,0 +1,99 @@
+# backend/tests/test_history.py
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from app.history import (
+    InMemoryHistoryStore, SQLiteHistoryStore, SessionHistory, summarize_overflow, to_agent_messages,
+)
+
+
+class FakeLLM:
+    """Answers every prompt with a fixed summary after `delay` seconds."""
+
+    def __init__(self, delay: float = 0.05, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.prompts = []
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return AIMessage(content="Farmer grows paddy in Nadia.")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteHistoryStore(str(tmp_path / "history.db"))
+    return InMemoryHistoryStore()
+
+
+def fill(store, session_id: str, count: int, start: int = 0):
+    for i in range(start, start + count):
+        store.append(session_id, f"question {i}", f"answer {i}")
+
+
+def test_only_the_newest_turns_within_the_turn_limit_are_sent():
+    history = SessionHistory(turns=[(f"q{i}", f"a{i}") for i in range(10)])
+    messages = to_agent_messages(history, max_turns=3, max_tokens=1000)
+    assert [m.content for m in messages] == ["q7", "a7", "q8", "a8", "q9", "a9"]
+
+
+def test_token_budget_drops_older_turns_and_counts_the_summary():
+    turns = [("q" * 40, "a" * 400), ("q" * 40, "a" * 40)]  # 110 and 20 tokens
+    history = SessionHistory(turns=turns, summary="s" * 40)  # 10 tokens
+    messages = to_agent_messages(history, max_turns=6, max_tokens=100)
+    assert isinstance(messages[0], SystemMessage)
+    assert [type(m) for m in messages[1:]] == [HumanMessage, AIMessage]
+    assert messages[2].content == "a" * 40
+
+
+def test_latest_exchange_is_kept_with_a_long_answer_cut_to_fit():
+    long_answer = " ".join(["word"] * 500)
+    history = SessionHistory(turns=[("How do I treat rust?", long_answer)])
+    messages = to_agent_messages(history, max_turns=6, max_tokens=50)
+    assert messages[0].content == "How do I treat rust?"
+    assert messages[1].content.endswith(" …")
+    assert len(messages[1].content) < 50 * 4
+
+
+def test_concurrent_summarizations_of_a_session_make_one_llm_call(store):
+    fill(store, "s1", 8)
+    llm = FakeLLM()
+
+    async def scenario():
+        return await asyncio.gather(*(summarize_overflow(store, "s1", llm, max_turns=4) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert results.count("Farmer grows paddy in Nadia.") == 1
+    assert len(llm.prompts) == 1
+    history = store.load("s1")
+    assert history.summary == "Farmer grows paddy in Nadia."
+    assert [u for u, _ in history.turns] == [f"question {i}" for i in range(4, 8)]
+
+
+def test_turns_added_during_summarization_are_kept(store):
+    fill(store, "s1", 8)
+
+    async def scenario():
+        task = asyncio.ensure_future(summarize_overflow(store, "s1", FakeLLM(delay=0.1), max_turns=4))
+        await asyncio.sleep(0.03)
+        fill(store, "s1", 2, start=8)
+        return await task
+
+    asyncio.run(scenario())
+    assert [u for u, _ in store.load("s1").turns] == [f"question {i}" for i in range(4, 10)]
+
+
+def test_short_history_or_failed_llm_call_changes_nothing(store):
+    fill(store, "s1", 6)
+    assert asyncio.run(summarize_overflow(store, "s1", FakeLLM(), max_turns=4)) is None  # overflow of 2 < 4
+    fill(store, "s1", 2, start=6)
+    assert asyncio.run(summarize_overflow(store, "s1", FakeLLM(error=RuntimeError("quota")), max_turns=4)) is None
+    history = store.load("s1")
+    assert history.summary == ""
+    assert len(history.turns) == 8
@@ -0,0 +1,83 @@
+# backend/tests/test_inference.py
+import time
+import threading
+
+import numpy as np
+import pytest
+
+from app import inference
+
+
+class FakeBackend:
+    """Scores image `i` highest for label `i % 3`, and records each batch size."""
+
+    name = "fake"
+    id2label = {0: "healthy", 1: "late_blight", 2: "rust"}
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def forward(self, pixel_values: np.ndarray) -> np.ndarray:
+        self.batch_sizes.append(len(pixel_values))
+        time.sleep(0.02)
+        return np.eye(3, dtype=np.float32)[pixel_values[:, 0].astype(int) % 3] * 5
+
+
+def fake_preprocess(images: list, model_path: str) -> np.ndarray:
+    if "corrupt" in images:
+        raise ValueError("cannot identify image file")
+    return np.array([[image] for image in images], dtype=np.float32)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    backend = FakeBackend()
+    monkeypatch.setattr(inference, "load_backend", lambda name, path, threads: backend)
+    monkeypatch.setattr(inference, "preprocess", fake_preprocess)
+    engine = inference.InferenceEngine(max_batch_size=8, max_wait_ms=50, num_workers=1, top_k=2)
+    yield engine
+    engine.shutdown()
+
+
+def submit_together(engine, images: list) -> list:
+    futures = [None] * len(images)
+
+    def worker(i):
+        futures[i] = engine.submit(images[i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(images))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return futures
+
+
+def test_concurrent_images_are_classified_in_one_batch(engine):
+    futures = submit_together(engine, [0, 1, 2, 4])
+    results = [future.result(timeout=5) for future in futures]
+
+    assert [r["label"] for r in results] == ["healthy", "late_blight", "rust", "late_blight"]
+    assert len(results[0]["top_k"]) == 2
+    assert engine.backend.batch_sizes == [4]
+    stats = engine.get_stats()
+    assert stats["completed"] == 4 and stats["batches"] == 1
+
+
+def test_bad_image_fails_alone_after_per_image_retry(engine):
+    futures = submit_together(engine, [0, "corrupt", 2])
+
+    assert futures[0].result(timeout=5)["label"] == "healthy"
+    assert futures[2].result(timeout=5)["label"] == "rust"
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=5)
+    stats = engine.get_stats()
+    assert stats["completed"] == 2 and stats["failed"] == 1
+
+
+def test_cancelled_request_does_not_stop_the_engine(engine):
+    cancelled, kept = submit_together(engine, [1, 2])
+    cancelled.cancel()
+
+    assert kept.result(timeout=5)["label"] == "rust"
+    assert engine.classify(0, timeout=5)["label"] == "healthy"
@@ -0,0 +1,114 @@
+# backend/tests/test_market_store.py
+import time
+import socket
+import asyncio
+import threading
+from datetime import datetime
+
+import pytest
+import uvicorn
+
+from app.http_client import aclose_async_client
+from app.market_store import MarketStore, ingest
+from benchmarks import mock_data_gov
+
+
+class ConcurrencyProbe:
+    """ASGI wrapper recording the most requests the mock served at once."""
+
+    def __init__(self, app):
+        self.app = app
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture(scope="module")
+def mock_api():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    probe = ConcurrencyProbe(mock_data_gov.app)
+    server = uvicorn.Server(uvicorn.Config(probe, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not server.started and time.time() < deadline:
+        time.sleep(0.02)
+    yield f"http://127.0.0.1:{port}/resource/mock", probe
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+def run_ingest(store, base_url, **kwargs) -> dict:
+    async def main():
+        try:
+            return await ingest(store, base_url=base_url, api_key="test", **kwargs)
+        finally:
+            await aclose_async_client()
+
+    return asyncio.run(main())
+
+
+@pytest.fixture(scope="module")
+def ingested(mock_api, tmp_path_factory):
+    base_url, probe = mock_api
+    store = MarketStore(str(tmp_path_factory.mktemp("market") / "market.db"))
+    probe.peak = 0
+    mock_data_gov.MOCK_LATENCY_MS = 20  # so concurrent page requests overlap
+    try:
+        result = run_ingest(store, base_url, page_size=500, concurrency=2)
+    finally:
+        mock_data_gov.MOCK_LATENCY_MS = 0
+    return store, result, probe.peak
+
+
+def test_ingest_pages_through_the_whole_dataset(ingested):
+    store, result, _ = ingested
+    assert result["pages"] == 10
+    assert result["records"] == len(mock_data_gov.DATASET)
+    stats = store.get_stats()
+    assert stats["rows"] == len(mock_data_gov.DATASET)
+    assert stats["days"] == mock_data_gov.MOCK_MARKET_DAYS
+    assert store.is_fresh()
+
+
+def test_ingest_keeps_only_the_worker_pool_in_flight(ingested):
+    _, _, peak = ingested
+    assert peak == 2
+
+
+def test_query_answers_from_the_latest_day_case_insensitively(ingested):
+    store, _, _ = ingested
+    answer = store.query({"commodity": "rice", "state": "west bengal"}, days=7, sort="price_asc", limit=5)
+
+    assert answer["latest_date"] == datetime.now().strftime("%Y-%m-%d")
+    assert answer["summary"]["mandis"] == 12  # 4 districts x 3 mandis in the mock
+    assert len(answer["trend"]) == mock_data_gov.MOCK_MARKET_DAYS
+    prices = [record["modal_price"] for record in answer["records"]]
+    assert len(prices) == 5 and prices == sorted(prices)
+    assert {record["state"] for record in answer["records"]} == {"West Bengal"}
+
+
+def test_query_filters_by_district_and_misses_cleanly(ingested):
+    store, _, _ = ingested
+    answer = store.query({"commodity": "Potato", "district": "Nadia"})
+    assert {record["district"] for record in answer["records"]} == {"Nadia"}
+    assert store.query({"commodity": "Saffron"}) == {}
+
+
+def test_failed_ingest_is_recorded_and_not_trusted(mock_api, tmp_path):
+    base_url, _ = mock_api
+    store = MarketStore(str(tmp_path / "market.db"))
+    with pytest.raises(Exception):
+        run_ingest(store, base_url.replace("/resource/mock", "/missing"))
+    assert not store.is_fresh()
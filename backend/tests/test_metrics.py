@@ -0,0 +1,33 @@
+# backend/tests/test_metrics.py
+import json
+import logging
+
+from app import metrics
+
+
+def test_configure_logging_replaces_an_earlier_root_handler(monkeypatch, capsys):
+    # A library (or an import-time basicConfig) got to the root logger first
+    logging.basicConfig(level=logging.WARNING, force=True)
+    monkeypatch.setattr(metrics, "LOG_FORMAT", "json")
+    monkeypatch.setattr(metrics, "LOG_LEVEL", "INFO")
+    try:
+        metrics.configure_logging()
+        metrics.start_trace("trace-123")
+        logging.getLogger("agri.test").info("weather fetched", extra={"ms": 12.5})
+
+        entry = json.loads(capsys.readouterr().err.strip().splitlines()[-1])
+        assert entry["trace_id"] == "trace-123"
+        assert entry["message"] == "weather fetched"
+        assert entry["ms"] == 12.5
+    finally:
+        logging.basicConfig(level=logging.WARNING, force=True)
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("agri_test_seconds", "Test histogram.", ("tool",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, tool="WeatherInfo")
+    histogram.observe(0.5, tool="WeatherInfo")
+    lines = histogram.render()
+    assert 'agri_test_seconds_bucket{tool="WeatherInfo",le="0.1"} 1' in lines
+    assert 'agri_test_seconds_bucket{tool="WeatherInfo",le="1.0"} 2' in lines
+    assert 'agri_test_seconds_count{tool="WeatherInfo"} 2' in lines
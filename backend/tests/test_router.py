@@ -0,0 +1,101 @@
+# backend/tests/test_router.py
+import asyncio
+
+import pytest
+
+from app import router
+
+
+class Ready:
+    ready = True
+
+
+class NotReady:
+    ready = False
+
+
+@pytest.fixture
+def intent(monkeypatch):
+    """Stands in for the embedding classifier; records the texts it is asked about."""
+    calls = []
+    result = {"value": ("weather", 0.8, 0.2)}
+
+    async def classify_intent(text):
+        calls.append(text)
+        return result["value"]
+
+    monkeypatch.setattr(router, "classify_intent", classify_intent)
+    monkeypatch.setattr(router, "embeddings_resource", Ready())
+    return calls, result
+
+
+def route(text, image_url=None, location=None):
+    return asyncio.run(router.route(text, image_url, location))
+
+
+@pytest.mark.parametrize("text, place", [
+    ("Weather in Kharagpur?", "Kharagpur"),
+    ("will it rain in Paschim Medinipur tomorrow", "Paschim Medinipur"),
+    ("temperature at Cuttack right now", "Cuttack"),
+    ("is it going to rain this week", None),
+    ("weather for me", None),
+])
+def test_extract_place(text, place):
+    assert router.extract_place(text) == place
+
+
+def test_image_without_text_is_classified_directly(intent):
+    decision = route("", image_url="/uploads/leaf.jpg")
+    assert (decision.intent, decision.argument) == ("classify", "/uploads/leaf.jpg")
+    assert route("what is wrong with this leaf?", image_url="/uploads/leaf.jpg") is None
+
+
+@pytest.mark.parametrize("text", [
+    "market price of rice in Bankura",
+    "should I spray fungicide before the rain in Nadia",
+    "how do I control late blight in potato",
+    "weather " + "very " * 15 + "in Patna",
+    "कोलकाता में मौसम कैसा है",
+])
+def test_rules_send_other_requests_to_the_agent_without_the_classifier(intent, text):
+    calls, _ = intent
+    assert route(text) is None
+    assert calls == []
+
+
+def test_plain_weather_question_is_routed_with_its_place(intent):
+    decision = route("weather in Kharagpur today", location="Patna")
+    assert (decision.intent, decision.argument) == ("weather", "Kharagpur")
+
+
+def test_weather_question_without_a_place_uses_the_request_location(intent):
+    assert route("will it rain tomorrow", location="Bankura").argument == "Bankura"
+    assert route("will it rain tomorrow") is None
+
+
+def test_classifier_must_be_confident_and_clear_of_the_agent_examples(intent):
+    _, result = intent
+    result["value"] = ("agent", 0.9, 0.3)
+    assert route("weather in Patna") is None
+    result["value"] = ("weather", router.ROUTER_MIN_SIMILARITY - 0.01, 0.3)
+    assert route("weather in Patna") is None
+    result["value"] = ("weather", 0.9, router.ROUTER_MARGIN - 0.01)
+    assert route("weather in Patna") is None
+
+
+def test_model_is_never_loaded_on_the_request_path(intent, monkeypatch):
+    calls, _ = intent
+    monkeypatch.setattr(router, "embeddings_resource", NotReady())
+    assert route("weather in Patna") is None
+    assert calls == []
+
+
+def test_router_stats_estimate_saved_latency():
+    stats = router.RouterStats()
+    stats.record_agent(3000.0, ["WeatherInfo"])
+    stats.record_agent(5000.0, ["WeatherInfo", "MarketInfo"])
+    stats.record_routed("weather", 200.0)
+    snapshot = stats.get_stats()
+    assert snapshot["routed_fraction"] == round(1 / 3, 3)
+    assert snapshot["by_intent"]["weather"]["agent_baseline_ms"] == 3000.0
+    assert snapshot["saved_ms_total"] == 2800.0
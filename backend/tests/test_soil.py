@@ -0,0 +1,54 @@
+# backend/tests/test_soil.py
+import pytest
+
+from app.soil import SoilStore, build_soil_store, district_key, has_soil_data
+
+CSV = """district,Nitrogen,Phosphorous,Potassium,pH,Crop
+Paschim Medinipur,80,40,40,6.0,Rice
+paschim medinipur district,100,50,60,6.4,Rice
+Purba Medinipur,70,35,45,6.8,Jute
+Nadia,90,42,43,7.1,Wheat
+Bankura,60,30,30,5.5,Rice
+"""
+
+
+@pytest.fixture
+def store(tmp_path):
+    csv_path = tmp_path / "soil.csv"
+    csv_path.write_text(CSV)
+    db_path = str(tmp_path / "soil.sqlite")
+    assert build_soil_store([str(csv_path)], db_path) == 4
+    return SoilStore(db_path)
+
+
+def test_district_key_normalizes_spelling_variants():
+    assert district_key("  Paschim-Medinipur District ") == "paschim medinipur"
+
+
+def test_spelling_variants_are_averaged_into_one_district(store):
+    record, match = store.lookup("PASCHIM MEDINIPUR")
+    assert match == "exact"
+    assert record["samples"] == 2
+    assert (record["N"], record["K"], record["pH"]) == (90.0, 50.0, 6.2)
+
+
+def test_unique_prefix_and_close_misspelling_match(store):
+    assert store.lookup("nad") == (store.lookup("Nadia")[0], "prefix")
+    record, match = store.lookup("Bankra")
+    assert (record["district"], match) == ("Bankura", "fuzzy")
+
+
+def test_ambiguous_or_unknown_district_is_not_guessed(store):
+    # Both Medinipurs share the prefix "p", and nothing resembles "Ludhiana"
+    assert store.lookup("p")[0] is None
+    assert store.lookup("Ludhiana") == (None, None)
+    assert store.lookup("") == (None, None)
+    assert "Paschim Medinipur" in store.suggestions("Medinipur")
+
+
+def test_has_soil_data(tmp_path, store):
+    assert not has_soil_data(str(tmp_path / "missing.sqlite"))
+    empty = str(tmp_path / "empty.sqlite")
+    build_soil_store([], empty)
+    assert not has_soil_data(empty)
+    assert has_soil_data(str(tmp_path / "soil.sqlite"))
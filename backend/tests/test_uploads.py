@@ -0,0 +1,58 @@
+# backend/tests/test_uploads.py
+import os
+import time
+
+from app.uploads import THUMBNAIL_SUFFIX, prune_uploads
+
+DAY = 86400
+
+
+def make_upload(upload_dir, stem: str, age_seconds: float, size: int = 1000) -> list:
+    """Writes an original and its thumbnail, both last modified `age_seconds` ago."""
+    paths = [upload_dir / f"{stem}.jpg", upload_dir / f"{stem}{THUMBNAIL_SUFFIX}"]
+    mtime = time.time() - age_seconds
+    for path in paths:
+        path.write_bytes(b"x" * size)
+        os.utime(path, (mtime, mtime))
+    return paths
+
+
+def test_expired_uploads_are_removed_with_their_thumbnails(tmp_path):
+    old = make_upload(tmp_path, "old", 40 * DAY)
+    recent = make_upload(tmp_path, "recent", 1 * DAY)
+
+    result = prune_uploads(str(tmp_path), max_age_days=30, max_total_bytes=10**9)
+
+    assert result == {"removed_files": 2, "freed_bytes": 2000}
+    assert not any(path.exists() for path in old)
+    assert all(path.exists() for path in recent)
+
+
+def test_least_recently_used_uploads_go_until_the_total_fits(tmp_path):
+    oldest = make_upload(tmp_path, "a", 3 * DAY)
+    middle = make_upload(tmp_path, "b", 2 * DAY)
+    newest = make_upload(tmp_path, "c", 1 * DAY)
+
+    # 6000 bytes stored; 4000 allowed
+    result = prune_uploads(str(tmp_path), max_age_days=30, max_total_bytes=4000)
+
+    assert result["freed_bytes"] == 2000
+    assert not any(path.exists() for path in oldest)
+    assert all(path.exists() for path in middle + newest)
+
+
+def test_only_stale_partial_uploads_are_cleaned_up(tmp_path):
+    stale, fresh = tmp_path / "stale.jpg.part", tmp_path / "fresh.jpg.part"
+    for path, age in ((stale, 2 * 3600), (fresh, 60)):
+        path.write_bytes(b"x" * 10)
+        os.utime(path, (time.time() - age,) * 2)
+
+    prune_uploads(str(tmp_path), max_age_days=30, max_total_bytes=10**9)
+
+    assert not stale.exists()
+    assert fresh.exists()
+
+
+def test_nothing_to_prune(tmp_path):
+    make_upload(tmp_path, "recent", 60)
+    assert prune_uploads(str(tmp_path), max_age_days=30, max_total_bytes=10**9) == {"removed_files": 0, "freed_bytes": 0}